@@ -1,6 +1,33 @@
 from movie import Movie
+from movie_changes import (
+    ChangeLog, InvalidMovieError, MOVIE_DATA_HEADER, get_change_log_path, get_change_version, get_changed_movie,
+    get_movie_fields, get_movie_json
+)
+from movie_store import MovieStore
+from runtime_buckets import RuntimeBuckets
+from sales_cube import SalesCube
+from series_index import SeriesIndex
+from snapshot import get_snapshot_path, read_snapshot
+from top_sellers import TopSellers
 
 import csv
+import hashlib
+import os
+import threading
+import time
+import traceback
+
+
+# rows of a .csv converted at a time when streaming it, only this many Movies exist at once
+CHUNK_SIZE = 50000
+
+# changes logged before they get written into the .csv
+COMPACT_AFTER_CHANGES = 100
+
+# called with (dataset before, dataset after, row of the movie) whenever a dataset cache applies a change, whether
+# this process logged it or read it back from another one, so caches kept per dataset can hold on to what the change
+# didn't touch
+change_listeners = []
 
 
 class DataHelper:
@@ -10,23 +37,347 @@ class DataHelper:
 
     def retrieve_movies(self, movie_data):
         with open(movie_data) as file:
-            reader = csv.reader(file)
-            # skip first row
-            next(reader, None)
-            # insert each row into hashmap
-            for row in reader:
-
-                self.movies.append(Movie(
-                    row[0],
-                    row[1],
-                    row[2],
-                    row[3],
-                    row[4],
-                    row[5],
-                    row[6],
-                    row[7],
-                    row[8],
-                    row[9],
-                ))
+            return self.parse_movies(file)
 
+    # converts each row of an open .csv file into a Movie
+    def parse_movies(self, file):
+        # start with an empty list so a reused helper doesn't keep appending the same rows
+        self.movies = [movie for movies in self.iter_movie_chunks(file) for movie in movies]
         return self.movies
+
+    # converts rows of an open .csv file into Movies a chunk at a time, yields a list of Movies for each chunk
+    def iter_movie_chunks(self, file, chunk_size=CHUNK_SIZE):
+        reader = csv.reader(file)
+        # skip first row
+        next(reader, None)
+        movies = []
+        for row in reader:
+
+            movies.append(Movie(
+                row[0],
+                row[1],
+                row[2],
+                row[3],
+                row[4],
+                row[5],
+                row[6],
+                row[7],
+                row[8],
+                row[9],
+            ))
+            if len(movies) == chunk_size:
+                yield movies
+                movies = []
+
+        if movies:
+            yield movies
+
+
+# loaded copy of the dataset, never modified after creation so it can be shared between requests/threads
+class Dataset:
+
+    def __init__(self, version, store, cube=None, series=None, top_sellers=None):
+        # hash of the .csv contents the movies were parsed from
+        self.version = version
+        # movies as columns, either parsed from the .csv or mapped from its compiled snapshot
+        self.store = store
+        # sales totals per genre/month/rating so predictions don't have to scan the movies
+        # streamed datasets already built their cube chunk by chunk
+        self.cube = cube if cube is not None else SalesCube.from_store(self.store)
+        # movies in each series so series lookups don't have to check every title
+        self.series = series if series is not None else SeriesIndex(self.store)
+        # top sellers per month/genre/rating/distributor/year, each list is sorted the first time it's asked for
+        self.top_sellers = top_sellers if top_sellers is not None else TopSellers(self.store)
+        # sales by runtime are only worked out the first time they're asked for, then kept with this version
+        self.runtime_buckets = None
+        self.runtime_buckets_lock = threading.Lock()
+
+    def get_runtime_buckets(self):
+        with self.runtime_buckets_lock:
+            if self.runtime_buckets is None:
+                self.runtime_buckets = RuntimeBuckets.from_store(self.store)
+            return self.runtime_buckets
+
+    # new dataset with a change from the change log applied, this one is left as it is
+    # the cube and indexes are patched for the one movie instead of being built again
+    def apply_change(self, change):
+        row = change["row"]
+        if row > len(self.store):
+            raise ValueError('row %d is past the end of the dataset' % row)
+        store = self.store.updated(row, MovieStore([Movie(*change["movie"])], build_indexes=False))
+        return Dataset(get_change_version(self.version, change), store, self.cube.updated(self.store, store, row),
+                       self.series.updated(store, row), self.top_sellers.updated(store, row))
+
+
+# keeps one loaded dataset per .csv file for the whole process
+# the file is only parsed again when its contents change on disk, changes logged through the movie api are
+# applied on top of it one movie at a time
+class DatasetCache:
+
+    def __init__(self, movie_data):
+        self.movie_data = movie_data
+        self.dataset = None
+        # (mtime, size) of the file when it was last checked
+        self.file_stats = None
+        # hash of the .csv contents the dataset was loaded from, the dataset's own version also covers its changes
+        self.file_version = None
+        self.change_log = ChangeLog(get_change_log_path(movie_data))
+        # (mtime, size) of the change log when it was last read and where to read the next changes from
+        self.change_log_stats = None
+        self.change_log_offset = 0
+        # changes in the log that haven't been written into the .csv yet
+        self.logged_changes = 0
+        self.compacting = False
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.changes = 0
+        self.compactions = 0
+        # where the current dataset was loaded from and how fast
+        self.last_load = None
+
+    # check_file False skips looking at the .csv once a dataset is loaded, only changes logged through the movie api
+    # are picked up, the .csv is only looked at again when another process compacted the log into it (or something
+    # calls this with check_file True, like the pre-fork server's parent process)
+    def get_dataset(self, check_file=True):
+        if not check_file:
+            with self.lock:
+                if self.dataset is not None and self.read_change_log():
+                    self.hits += 1
+                    return self.dataset
+
+        file_stats = get_file_stats(self.movie_data)
+
+        with self.lock:
+            # cheap check first, stat() is enough when nothing has touched the file
+            # changes another process logged are picked up without reading the .csv again
+            if self.dataset is not None and file_stats == self.file_stats:
+                self.read_change_log()
+                self.hits += 1
+                return self.dataset
+
+            version = get_file_version(self.movie_data)
+
+            # file was touched but contents are the same, keep current dataset
+            if self.dataset is not None and version == self.file_version:
+                self.file_stats = file_stats
+                self.read_change_log()
+                self.hits += 1
+                return self.dataset
+
+            if self.dataset is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+
+            # build the new dataset completely before swapping it in, requests still holding the
+            # old one keep using it untouched
+            # compiled snapshot skips parsing completely, only used if it was made from these exact contents
+            start = time.perf_counter()
+            store = read_snapshot(get_snapshot_path(self.movie_data), version)
+            if store is not None:
+                self.dataset = Dataset(version, store)
+                source = 'snapshot'
+            else:
+                self.dataset = read_dataset(self.movie_data)
+                source = 'csv'
+            self.file_stats = file_stats
+            self.file_version = self.dataset.version
+            self.last_load = get_load_stats(source, len(self.dataset.store), time.perf_counter() - start)
+
+            # changes logged since the .csv was last written go on top
+            self.change_log_stats = None
+            self.change_log_offset = 0
+            self.logged_changes = 0
+            self.read_change_log()
+
+            return self.dataset
+
+    # applies changes logged since the log was last read, has to be called holding the lock
+    # returns False when the log was compacted into a newer .csv, the .csv has to be loaded again to see those changes
+    def read_change_log(self):
+        change_log_stats = self.change_log.get_stats()
+        if change_log_stats == self.change_log_stats:
+            return True
+        changes, self.change_log_offset = self.change_log.read(self.file_version, self.change_log_offset)
+        if changes is None:
+            return False
+        for change in changes:
+            previous_dataset = self.dataset
+            self.dataset = previous_dataset.apply_change(change)
+            notify_change_listeners(previous_dataset, self.dataset, change["row"])
+        self.change_log_stats = change_log_stats
+        self.logged_changes += len(changes)
+        return True
+
+    # lays the movie api fields over the movie in row, or adds a movie made from them on the end when row is None
+    # the change is written to the change log first so it survives restarts and other processes pick it up
+    # returns (dataset before, dataset after, row of the movie), row past the end raises IndexError and fields that
+    # don't make a valid movie raise InvalidMovieError
+    def apply_change(self, row, fields, compact_after=COMPACT_AFTER_CHANGES):
+        with self.change_log.locked():
+            # changes other processes logged come first, reloads the .csv if one of them compacted the log into it
+            # nothing else can log a change while the log lock is held so this stays the latest dataset
+            previous_dataset = self.get_dataset()
+            if row is None:
+                row = len(previous_dataset.store)
+                current_movie = None
+            elif row >= len(previous_dataset.store):
+                raise IndexError('no movie in row %d' % row)
+            else:
+                # fields that aren't given keep the values of the latest version of the movie, not of whatever
+                # version the process handling the request happens to have
+                current_movie = get_movie_json(previous_dataset.store.row(row))
+            movie, errors = get_changed_movie(fields, current_movie)
+            if errors:
+                raise InvalidMovieError(errors)
+            if movie.rank is None:
+                movie.rank = row
+
+            change = {"row": row, "movie": get_movie_fields(movie)}
+            dataset = previous_dataset.apply_change(change)
+            # written and synced to disk without the dataset lock, requests reading the dataset don't wait for it
+            change_log_offset = self.change_log.append(self.file_version, change)
+            change_log_stats = self.change_log.get_stats()
+
+            with self.lock:
+                # a request may have read the change back from the log already, which made the same dataset
+                if self.dataset is previous_dataset:
+                    self.dataset = dataset
+                    self.change_log_offset = change_log_offset
+                    self.change_log_stats = change_log_stats
+                    self.logged_changes += 1
+                    notify_change_listeners(previous_dataset, dataset, row)
+                self.changes += 1
+
+                if self.logged_changes >= compact_after and not self.compacting:
+                    self.compacting = True
+                    threading.Thread(target=self.compact, daemon=True).start()
+
+        return previous_dataset, dataset, row
+
+    # writes the current dataset into the .csv and starts an empty change log on top of it
+    # the dataset in memory already has every change so it stays as it is, only the .csv it's tracked against moves
+    def compact(self):
+        try:
+            with self.change_log.locked():
+                with self.lock:
+                    self.read_change_log()
+                    dataset = self.dataset
+                # slow part runs without the dataset lock so requests carry on, the log lock keeps changes out
+                temporary_path = self.movie_data + '.tmp'
+                write_movie_data(temporary_path, dataset.store)
+                version = get_file_version(temporary_path)
+
+                # swapped in holding the dataset lock so nothing sees the new .csv before it's tracked
+                with self.lock:
+                    os.replace(temporary_path, self.movie_data)
+                    self.change_log.reset(version)
+                    self.file_stats = get_file_stats(self.movie_data)
+                    self.file_version = version
+                    self.change_log_stats = self.change_log.get_stats()
+                    self.change_log_offset = 0
+                    self.logged_changes = 0
+                    self.compactions += 1
+        except Exception:
+            traceback.print_exc()
+        finally:
+            with self.lock:
+                self.compacting = False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "changes": self.changes,
+                "logged_changes": self.logged_changes,
+                "compactions": self.compactions,
+                "last_load": self.last_load,
+                "version": self.dataset.version if self.dataset is not None else None
+            }
+
+
+def notify_change_listeners(previous_dataset, dataset, row):
+    for listener in change_listeners:
+        try:
+            listener(previous_dataset, dataset, row)
+        except Exception:
+            # a cache that couldn't keep up only loses what it held, the change itself is already applied
+            traceback.print_exc()
+
+
+# dataset version is the hash of the .csv contents
+# hashed a block at a time so the file never has to be held in memory
+def get_file_version(movie_data):
+    file_hash = hashlib.sha1()
+    with open(movie_data, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+# streams a .csv into a dataset, parsed rows are only ever held a chunk at a time
+# the sales cube is updated as each chunk comes in and the columns are joined once at the end, a column at a time
+# with each chunk's copy dropped as it's joined so the columns aren't all held twice
+def read_dataset(movie_data, chunk_size=CHUNK_SIZE):
+    file_hash = hashlib.sha1()
+    cube = SalesCube()
+    stores = []
+    with open(movie_data, 'rb') as file:
+        for movies in DataHelper().iter_movie_chunks(read_hashed_lines(file, file_hash), chunk_size):
+            store = MovieStore(movies, build_indexes=False)
+            cube.add_store(store)
+            stores.append(store)
+
+    # version is the hash of exactly what was parsed even if the file changed since it was last checked
+    return Dataset(file_hash.hexdigest(), MovieStore.concatenate(stores, release_parts=True), cube)
+
+
+# decoded lines of a file opened in binary, adding every line to the hash as it's read
+def read_hashed_lines(file, file_hash):
+    for line in file:
+        file_hash.update(line)
+        yield line.decode()
+
+
+# writes every movie in the store to a .csv the same way the dataset is laid out
+def write_movie_data(movie_data, store):
+    with open(movie_data, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(MOVIE_DATA_HEADER)
+        for row in range(len(store)):
+            writer.writerow(get_movie_fields(store.row(row)))
+
+
+def get_load_stats(source, rows, seconds):
+    return {
+        "source": source,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0
+    }
+
+
+def get_file_stats(movie_data):
+    file_stats = os.stat(movie_data)
+    return file_stats.st_mtime_ns, file_stats.st_size
+
+
+# one cache per .csv path, shared by every request in the process
+dataset_caches = {}
+dataset_caches_lock = threading.Lock()
+
+
+def get_dataset_cache(movie_data):
+    with dataset_caches_lock:
+        if movie_data not in dataset_caches:
+            dataset_caches[movie_data] = DatasetCache(movie_data)
+        return dataset_caches[movie_data]
+
+
+# returns the shared dataset for the .csv file, loading it on first use or when the file changes
+def load_dataset(movie_data, check_file=True):
+    return get_dataset_cache(movie_data).get_dataset(check_file)
@@ -1,120 +1,523 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, abort, g, jsonify, render_template, request, stream_with_context, url_for
+import cProfile
+import hmac
+import mimetypes
 from itertools import islice
-import matplotlib.pyplot as plt
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import safe_join
+import os
+import sys
+import threading
+import time
 import numpy as np
 
-from movie import Movie
 import utils
 
-from DataHelper import DataHelper
+from chart_cache import ChartCache, get_chart_key
+import charts
+from DataHelper import change_listeners, get_dataset_cache, load_dataset
+from http_cache import (
+    COMPRESSIBLE_MIMETYPES, ENCODINGS, IMMUTABLE_MAX_AGE, CompressedVariants, FileVersions, get_etag,
+    get_response_encoding, get_variant_etag
+)
+from metrics import Metrics, get_server_timing, stage, start_recording, stop_recording
+from movie_store import GENRES, MONTHS, SALES_TYPES
+from movie_changes import InvalidMovieError, get_movie_json
+from prediction import (
+    get_rating_sales_comparison, get_scenario_data_errors, is_rating_comparison_affected, is_scenario_affected,
+    predict_movie, project_sales, validate_scenario
+)
+from prediction_cache import PredictionCache, get_scenario_key
+from profiles import ProfileStore, get_profile_text
+from runtime_buckets import BUCKET_MINUTES
+from top_sellers import TOP_SELLER_FILTERS
+from sales_cube import RATINGS, WORLD_SALES
+
+# when the app started loading (once its modules are imported), startup time reported after warm-up counts from here
+app_loading_started = time.perf_counter()
 
 app = Flask(__name__)
 app.secret_key = "&SuperSecretKey%!"
+# compiled templates are kept in the temp directory so new workers don't have to compile them again
+app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache())
+# .csv the dataset is loaded from, shared by all requests and only re-read when it changes
+# MOVIE_DATA environment variable points the app at a different .csv (like one from generate_movie_data.py)
+app.config['MOVIE_DATA'] = os.environ.get('MOVIE_DATA', "movie_data.csv")
+# reload the dataset as soon as a request notices the .csv changed
+# the pre-fork server turns this off and reloads in its parent process instead, its workers still pick up changes
+# logged through /api/movies on their own
+app.config['DATASET_AUTO_RELOAD'] = True
+# movies added/updated through /api/movies are logged next to the .csv, after this many the log is written into it
+app.config['CHANGE_LOG_COMPACT_AFTER'] = 100
+# movies can only be added/updated through /api/movies when this is on, and only by requests with the token in an
+# Authorization: Bearer <token> header, writes end up in the .csv on disk
+app.config['MOVIE_WRITES_ENABLED'] = False
+app.config['MOVIE_WRITE_TOKEN'] = os.environ.get('MOVIE_WRITE_TOKEN')
+# how many movies a sales search shows per page, and the most a request can ask for
+app.config['SEARCH_PAGE_SIZE'] = 100
+app.config['SEARCH_MAX_PAGE_SIZE'] = 1000
+# template output pieces collected before a streamed page sends a chunk
+app.config['TEMPLATE_STREAM_BUFFER'] = 64
+# most top selling movies a search or /api/movies/top can ask for
+app.config['TOP_MOVIES_MAX_COUNT'] = 100
+# most memory rendered prediction charts can take up before older ones are dropped
+app.config['CHART_CACHE_BYTES'] = 64 * 1024 * 1024
+# most memory gzip/brotli copies of pages, json and static files can take up
+app.config['COMPRESSED_CACHE_BYTES'] = 16 * 1024 * 1024
+# worker processes that render charts in parallel, and seconds a request waits for its charts
+app.config['CHART_WORKERS'] = min(os.cpu_count() or 1, 4)
+app.config['CHART_TIMEOUT'] = 10
+# how many recent prediction scenarios are remembered, and for how many seconds
+app.config['PREDICTION_CACHE_SIZE'] = 1024
+app.config['PREDICTION_CACHE_TTL'] = 60 * 60
+# address and worker processes of the pre-fork server (serve.py), and how often it checks the .csv for changes
+app.config['SERVER_HOST'] = os.environ.get('HOST', '127.0.0.1')
+app.config['SERVER_PORT'] = int(os.environ.get('PORT', 5000))
+app.config['SERVER_WORKERS'] = os.cpu_count() or 1
+app.config['DATA_RELOAD_INTERVAL'] = 5
+# most scenarios the batch prediction api scores in one request
+app.config['BATCH_PREDICTION_LIMIT'] = 100000
+# time every request and its stages for /metrics, and add a Server-Timing header with the stages to responses
+app.config['METRICS_ENABLED'] = True
+app.config['SERVER_TIMING'] = False
+# lets a request ask for a full call profile with an X-Profile: 1 header or ?profile=1
+# only turn on where it's needed (like staging), profiles are listed at /admin/profiles
+app.config['PROFILING_ENABLED'] = False
+# how many of the most recent profiles are kept
+app.config['PROFILE_HISTORY'] = 20
 
 
 # data source: https://www.kaggle.com/sanjeetsinghnaik/top-1000-highest-grossing-movies
 
 
+# rendered prediction charts shared by all requests, the pre-fork server gives it a directory its workers share
+chart_cache = ChartCache(app.config['CHART_CACHE_BYTES'])
+# pool that renders charts off the request thread
+chart_renderer = charts.ChartRenderer(app.config['CHART_WORKERS'], app.config['CHART_TIMEOUT'])
+# results of recent prediction scenarios, with the keys of their charts
+prediction_cache = PredictionCache(app.config['PREDICTION_CACHE_SIZE'], app.config['PREDICTION_CACHE_TTL'])
+# key the placeholder image is cached under for charts that couldn't be rendered
+PLACEHOLDER_CHART_KEY = 'unavailable'
+# charts shown with a prediction, the names their keys are kept under
+PREDICTION_CHARTS = ('GenreSales', 'SeriesSales', 'MonthSales', 'RatingSales')
+# request counts and latencies shown at /metrics
+metrics = Metrics()
+# recent request profiles
+profile_store = ProfileStore(app.config['PROFILE_HISTORY'])
+# seconds each warm-up step took and the total startup time, filled in by warm_up()
+startup_timings = {}
+
+
+# does everything the first requests would otherwise have to before the app starts taking traffic
+# loads the dataset and its aggregates, draws the descriptive charts, starts the chart workers with their
+# font caches ready and compiles every template
+# the pre-fork server warms up before forking without starting the chart workers (each worker starts its own),
+# only the placeholder chart is drawn so the workers inherit it
+def warm_up(renderer=None, start_chart_workers=True):
+    step_started = time.perf_counter()
+
+    def finish_step(step):
+        nonlocal step_started
+        now = time.perf_counter()
+        startup_timings[step] = now - step_started
+        step_started = now
+
+    dataset = get_dataset()
+    finish_step('dataset')
+    if start_chart_workers:
+        chart_renderer.warm_up()
+    else:
+        chart_renderer.get_placeholder()
+    finish_step('chart_workers')
+    generate_descriptive_charts(dataset, renderer)
+    finish_step('descriptive_charts')
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    finish_step('templates')
+
+    startup_timings['total'] = time.perf_counter() - app_loading_started
+    print('started in %.2fs (%s)' % (startup_timings['total'], ', '.join(
+        '%s %.2fs' % (step, seconds) for step, seconds in startup_timings.items() if step != 'total')))
+    return startup_timings
+
+
+# starts timing the request and its stages, nothing is recorded when metrics are turned off
+@app.before_request
+def start_request_timing():
+    if not app.config['METRICS_ENABLED'] and not app.config['SERVER_TIMING']:
+        return
+    g.request_start = time.perf_counter()
+    g.stages_token = start_recording()
+
+
+@app.after_request
+def record_request_timing(response):
+    if 'request_start' not in g:
+        return response
+
+    seconds = time.perf_counter() - g.request_start
+    stages = stop_recording(g.pop('stages_token'))
+    # streamed pages are still being rendered, they're recorded once the last chunk is sent (finish_streamed_request)
+    # the Server-Timing header has to go out first so it only has the stages up to here
+    if g.get('streamed'):
+        g.streamed_stages = stages
+        g.streamed_status = response.status_code
+    elif app.config['METRICS_ENABLED']:
+        record_request_metrics(response.status_code, seconds, stages)
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = get_server_timing(stages, seconds)
+    return response
+
+
+def record_request_metrics(status, seconds, stages):
+    # route pattern instead of the url so chart keys etc. don't each get their own label
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.observe_request(route, request.method, status, seconds, stages)
+
+
+# profiles the request when profiling is turned on and the request asks for it
+@app.before_request
+def start_request_profile():
+    if not app.config['PROFILING_ENABLED']:
+        return
+    if request.headers.get('X-Profile') != '1' and request.args.get('profile') != '1':
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler is already running on this thread
+        return
+    g.profiler = profiler
+    g.profile_start = time.perf_counter()
+
+
+@app.after_request
+def store_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+
+    # streamed pages keep profiling until the last chunk is sent, their profile is added under this id then
+    if g.get('streamed'):
+        g.streamed_profiler = profiler
+        g.streamed_profile_id = profile_store.reserve_id()
+        response.headers['X-Profile-Id'] = str(g.streamed_profile_id)
+        return response
+
+    profiler.disable()
+    profile_id = profile_store.add(request.method, request.full_path.rstrip('?'),
+                                   time.perf_counter() - g.profile_start, profiler)
+    response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+
+# makes sure the profiler is stopped when the view raised and after_request never ran
+@app.teardown_request
+def stop_request_profile(error):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+# recent profiles, newest first
+# under the pre-fork server every worker keeps its own profiles, only the answering worker's are listed
+@app.route('/admin/profiles')
+def list_profiles():
+    if not app.config['PROFILING_ENABLED']:
+        abort(404)
+    profiles = profile_store.list()
+    for profile in profiles:
+        profile["download"] = url_for('download_profile', profile_id=profile["id"])
+        profile["summary"] = url_for('get_profile_summary', profile_id=profile["id"])
+    return jsonify(profiles=profiles)
+
+
+# raw pstats file of a profile, opens with pstats.Stats(), snakeviz or flameprof
+@app.route('/admin/profiles/<int:profile_id>.prof')
+def download_profile(profile_id):
+    profile = profile_store.get(profile_id) if app.config['PROFILING_ENABLED'] else None
+    if profile is None:
+        abort(404)
+    return Response(profile["stats"], mimetype='application/octet-stream', headers={
+        'Content-Disposition': 'attachment; filename=profile-%d.prof' % profile_id
+    })
+
+
+# functions of a profile sorted by cumulative time (or ?sort=tottime etc.)
+@app.route('/admin/profiles/<int:profile_id>.txt')
+def get_profile_summary(profile_id):
+    profile = profile_store.get(profile_id) if app.config['PROFILING_ENABLED'] else None
+    if profile is None:
+        abort(404)
+    sort = request.args.get('sort', 'cumulative')
+    try:
+        text = get_profile_text(profile, sort)
+    except KeyError:
+        abort(400)
+    return Response(text, mimetype='text/plain')
+
+
+# counters and latency histograms in Prometheus text format
+# under the pre-fork server these are the numbers of whichever worker answered, not totals over every worker
+@app.route('/metrics')
+def get_metrics():
+    if not app.config['METRICS_ENABLED']:
+        abort(404)
+
+    dataset_stats = get_dataset_cache(app.config['MOVIE_DATA']).stats()
+    chart_stats = chart_cache.stats()
+    prediction_stats = prediction_cache.stats()
+    compressed_stats = compressed_variants.stats()
+    text = metrics.render([
+        ('movie_dataset_loads_total', 'Times the dataset was loaded for the first time.', dataset_stats["misses"]),
+        ('movie_dataset_reloads_total', 'Times the dataset was loaded again after the .csv changed.',
+         dataset_stats["reloads"]),
+        ('movie_dataset_changes_total', 'Movies added or updated through the movie api.', dataset_stats["changes"]),
+        ('movie_dataset_compactions_total', 'Times the change log was written into the .csv.',
+         dataset_stats["compactions"]),
+        ('movie_chart_cache_hits_total', 'Chart images served from the chart cache.', chart_stats["hits"]),
+        ('movie_chart_cache_misses_total', 'Chart images that were not in the chart cache.', chart_stats["misses"]),
+        ('movie_chart_cache_evictions_total', 'Chart images dropped to stay under the byte budget.',
+         chart_stats["evictions"]),
+        ('movie_prediction_cache_hits_total', 'Predictions answered from the prediction cache.',
+         prediction_stats["hits"]),
+        ('movie_prediction_cache_misses_total', 'Predictions that had to be calculated.', prediction_stats["misses"]),
+        ('movie_compressed_cache_hits_total', 'Responses sent from an already compressed copy.',
+         compressed_stats["hits"]),
+        ('movie_compressed_cache_misses_total', 'Responses that had to be compressed.', compressed_stats["misses"]),
+        ('movie_charts_rendered_total', 'Charts rendered by the chart workers.', chart_renderer.rendered),
+        ('movie_charts_failed_total', 'Charts that failed or timed out while rendering.', chart_renderer.failed)
+    ], [
+        ('movie_startup_seconds', 'Seconds from loading the app to the end of warm-up.',
+         startup_timings.get('total', 0.0))
+    ])
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+
+# gets the shared dataset for the configured .csv
+def get_dataset():
+    with stage('dataset'):
+        return load_dataset(app.config['MOVIE_DATA'], app.config['DATASET_AUTO_RELOAD'])
+
+
+# gets the shared column store of the dataset for the configured .csv
+def get_movie_store():
+    return get_dataset().store
+
+
+# gzip/brotli copies of responses with an etag, compressed once and sent many times
+compressed_variants = CompressedVariants(app.config['COMPRESSED_CACHE_BYTES'])
+# contents and content hashes of static files and templates, read again only when they change on disk
+file_versions = FileVersions()
+
+
+# 304 response if the browser already has the response with this etag (in any encoding), None if it has to be sent
+def get_not_modified(etag, immutable=False):
+    for variant_etag in [etag] + [get_variant_etag(etag, encoding) for encoding in ENCODINGS]:
+        if request.if_none_match.contains(variant_etag):
+            response = Response(status=304)
+            response.set_etag(variant_etag)
+            response.vary.add('Accept-Encoding')
+            set_cache_control(response, immutable)
+            return response
+    return None
+
+
+# response with a strong etag and Cache-Control, compressed when it's worth it and the browser takes it
+def make_cached_response(body, mimetype, etag, immutable=False):
+    encoding = get_response_encoding(request.accept_encodings, mimetype, len(body))
+    if encoding:
+        body = compressed_variants.get(etag, encoding, body)
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(get_variant_etag(etag, encoding))
+    if encoding:
+        response.content_encoding = encoding
+    if mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+    set_cache_control(response, immutable)
+    return response
+
+
+# immutable urls change whenever their contents do so browsers can keep them for good,
+# everything else can be kept but has to be checked with its etag before it's used again
+def set_cache_control(response, immutable):
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+
+# content hash of a file in static/, None if there isn't one
+def get_static_version(filename):
+    path = safe_join(app.static_folder, filename)
+    static_file = file_versions.get(path) if path else None
+    return static_file[0] if static_file else None
+
+
+# static files are served from memory with their content hash as the etag
+# url_for('static', ...) adds the hash as ?v= so those urls can be kept by the browser for good
+def send_static_file(filename):
+    path = safe_join(app.static_folder, filename)
+    static_file = file_versions.get(path) if path else None
+    if static_file is None:
+        abort(404)
+    version, contents = static_file
+
+    immutable = request.args.get('v') == version
+    not_modified = get_not_modified(version, immutable)
+    if not_modified is not None:
+        return not_modified
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return make_cached_response(contents, mimetype, version, immutable)
+
+
+app.view_functions['static'] = send_static_file
+
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = get_static_version(values['filename'])
+        if version is not None:
+            values['v'] = version
+
+
+# json response from a GET api that only changes with the dataset, etag is made from the dataset version and url
+def make_json_response(etag, **fields):
+    return make_cached_response(jsonify(**fields).get_data(), 'application/json', etag)
+
+
 # gets dataset from .csv, generates descriptive data charts, then loads the main page consisting of
 # static data, interactive search, and predictive algorithm inputs for the user
 @app.route('/')
 def main_prediction_page():
-    # get dataset, convert each to Movie class to pass to chart generation functions
-    data_helper = DataHelper()
-    movie_list = data_helper.retrieve_movies("movie_data.csv")
-
-    # have to make our graphs look nice
-    plt.style.use('ggplot')
-
-    # generate data for descriptive graphs and save as .png
-    generate_sales_by_genre_chart(movie_list)
-    generate_rank_by_genre_chart(movie_list)
-    generate_sales_by_rating(movie_list)
-    generate_sales_by_month(movie_list)
-    # render page that contains all generated graphs, interactive search, and input form for prediction
-    return render_template('main_page.html')
-
+    # charts only get redrawn if the dataset changed since they were last generated
+    generate_descriptive_charts(get_dataset())
 
-# retrieves list of movies with user specified sales type between a min and max value
-def search_movies_by_sales(sales_type, minimum_sales, maximum_sales):
-    # get dataset, convert each to Movie class to pass to chart generation functions
-    data_helper = DataHelper()
-    movie_list = data_helper.retrieve_movies("movie_data.csv")
+    # page only changes with its template and the static files it links to
+    template_file = file_versions.get(os.path.join(app.root_path, app.template_folder, 'main_page.html'))
+    etag = get_etag('main_page.html', template_file[0] if template_file else None, *(
+        get_static_version(filename) for filename in DESCRIPTIVE_CHART_FILES + ('styles/main_page.css',)))
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
 
-    matching_movies = []
-    for movie in movie_list:
-        if sales_type == 'Domestic':
-            # check min/max sales
-            if maximum_sales > int(movie.domestic_sales) > minimum_sales:
-                matching_movies.append(movie)
-        if sales_type == 'International':
-            # check min/max sales
-            if maximum_sales > int(movie.international_sales) > minimum_sales:
-                matching_movies.append(movie)
-        if sales_type == 'World':
-            # check min/max sales
-            if maximum_sales > int(movie.world_sales) > minimum_sales:
-                matching_movies.append(movie)
-
-    return matching_movies
+    # render page that contains all generated graphs, interactive search, and input form for prediction
+    with stage('template'):
+        page = render_template('main_page.html')
+    return make_cached_response(page.encode(), 'text/html', etag)
+
+
+# files in static/ the descriptive charts are saved to
+DESCRIPTIVE_CHART_FILES = ('genre_sales.png', 'genre_ranks.png', 'rating_sales.png', 'sales_months.png')
+
+# dataset version the descriptive charts in static/ were last generated from
+descriptive_charts_version = None
+# chart key of the data each chart file was last drawn from
+descriptive_chart_keys = {}
+descriptive_charts_lock = threading.Lock()
+
+
+# generates data for descriptive graphs and saves as .png, only once for each version of the dataset
+# renderer can be given to draw them somewhere other than the shared chart workers
+def generate_descriptive_charts(dataset, renderer=None):
+    global descriptive_charts_version
+
+    with descriptive_charts_lock:
+        if descriptive_charts_version == dataset.version:
+            return
+
+        with stage('chart_data'):
+            chart_jobs = [
+                (charts.generate_sales_by_genre_chart, (get_genre_sales_percentages(dataset.cube),)),
+                (charts.generate_rank_by_genre_chart, (get_genre_rank_points(dataset.cube),)),
+                (charts.generate_sales_by_rating, (get_rating_percentages(dataset.cube),)),
+                (charts.generate_sales_by_month, (get_month_sales(dataset.cube),))
+            ]
+        # only charts whose data changed get drawn again, adding one movie often leaves some of them the same
+        changed_charts = []
+        for file_name, chart_job in zip(DESCRIPTIVE_CHART_FILES, chart_jobs):
+            chart_key = get_chart_key(file_name, chart_job[1])
+            if descriptive_chart_keys.get(file_name) != chart_key:
+                changed_charts.append((file_name, chart_key, chart_job))
+        # charts are drawn at the same time, a chart that fails keeps its previous image
+        with stage('charts'):
+            images = (renderer or chart_renderer).render_all([chart_job for _, _, chart_job in changed_charts])
+        # have to save image to static directory to be accessible in flask env
+        # it will update images with same name
+        with stage('chart_files'):
+            for (file_name, chart_key, _), image in zip(changed_charts, images):
+                if image is not None:
+                    # swapped in whole so a request never reads half an image, pre-fork workers each draw the
+                    # charts of changes they pick up so every process writes its own temporary file
+                    chart_path = os.path.join(app.static_folder, file_name)
+                    temporary_path = '%s.%d.tmp' % (chart_path, os.getpid())
+                    with open(temporary_path, 'wb') as file:
+                        file.write(image)
+                    os.replace(temporary_path, chart_path)
+                    descriptive_chart_keys[file_name] = chart_key
+
+        # try again next request if any chart didn't render
+        if None in images:
+            return
+        descriptive_charts_version = dataset.version
+
+
+# retrieves one page of movies with user specified sales type between a min and max value
+# movies are ordered from highest to lowest sales, returns the page and how many movies matched in total
+def search_movies_by_sales(sales_type, minimum_sales, maximum_sales, cursor=0, limit=None):
+    store = get_movie_store()
+    page_rows, total_movies = get_sales_page(store, sales_type, minimum_sales, maximum_sales, cursor, limit)
+
+    return store.rows(page_rows), total_movies
+
+
+# row ids of one page of movies with sales between a min and max value and how many movies matched in total
+def get_sales_page(store, sales_type, minimum_sales, maximum_sales, cursor=0, limit=None):
+    # unknown sales type has nothing to match
+    if store.sales(sales_type) is None:
+        return [], 0
+
+    # binary search the sorted sales for the first and last matching movie
+    start, end = store.sales_range(sales_type, minimum_sales, maximum_sales)
+    page_start = min(start + cursor, end)
+    page_end = end if limit is None else min(page_start + limit, end)
+
+    return store.sales_order[sales_type][page_start:page_end], end - start
+
+
+# retrieves the movies with the highest sales of the sales type that match every filter, highest first
+# filters are fields from TOP_SELLER_FILTERS, e.g. month='Dec', genre='Action'
+def search_top_movies(sales_type, limit, **filters):
+    dataset = get_dataset()
+
+    return dataset.store.rows(dataset.top_sellers.top(sales_type, limit, filters))
 
 
 # retrieves movie with highest world sales released in user specified month
 def search_top_movie_in_month(release_month):
-    # get dataset, convert each to Movie class to pass to chart generation functions
-    data_helper = DataHelper()
-    movie_list = data_helper.retrieve_movies("movie_data.csv")
-
-    # create blank movie variable for initial comparison and then compare following movies to current top movie
-    top_movie = Movie("", "", "", "", 0, 0, 0, "", "", "")
-
-    # iterate through dataset to compare and find movie
-    for movie in movie_list:
-        if release_month in movie.release_date:
-            if int(movie.world_sales) > int(top_movie.world_sales):
-                top_movie = Movie(
-                    movie.rank,
-                    movie.title,
-                    movie.distributor,
-                    movie.release_date,
-                    movie.domestic_sales,
-                    movie.international_sales,
-                    movie.world_sales,
-                    movie.genre,
-                    movie.runtime,
-                    movie.rating
-                )
-
-    return top_movie
+    top_movies = search_top_movies('World', 1, month=release_month)
+
+    return top_movies[0] if top_movies else None
 
 
 # retrieves movie with highest world sales released in user specified genre
 def search_genre_top_sales(search_genre):
-    # get dataset, convert each to Movie class to pass to chart generation functions
-    data_helper = DataHelper()
-    movie_list = data_helper.retrieve_movies("movie_data.csv")
-
-    # create blank movie variable for initial comparison and then compare following movies to current top movie
-    top_movie = Movie("", "", "", "", 0, 0, 0, "", "", "")
-
-    # iterate through dataset to compare and find movie
-    for movie in movie_list:
-        if search_genre in movie.genre:
-            if int(movie.world_sales) > int(top_movie.world_sales):
-                top_movie = Movie(
-                    movie.rank,
-                    movie.title,
-                    movie.distributor,
-                    movie.release_date,
-                    movie.domestic_sales,
-                    movie.international_sales,
-                    movie.world_sales,
-                    movie.genre,
-                    movie.runtime,
-                    movie.rating
-                )
-
-    return top_movie
+    top_movies = search_top_movies('World', 1, genre=search_genre)
+
+    return top_movies[0] if top_movies else None
+
+
+# gets whole number form input, default if it's missing or not a number
+def get_form_int(name, default):
+    try:
+        return int(request.form.get(name, default))
+    except ValueError:
+        return default
 
 
 # gets user inputs, searches dataset for needed data, navigates to search result display page
@@ -132,24 +535,32 @@ def get_search_results():
         # get user top movie for genre search input
         selected_genre = request.form.get('top_genre_movie')
 
-        # list of movies within specified world sales amounts
-        if sales_minimum is not None and sales_maximum is not None:
-            movie_list = search_movies_by_sales(sales_type, sales_minimum, sales_maximum)
-        else:
-            # if missing search criteria, set list with blank movie but no results title to display
-            movie_list = Movie("No Results", "", "", "", 0, 0, 0, "", "", "")
-        # if search yields no results
-        if not movie_list:
-            movie_list.append(Movie("No Results", "", "", "", 0, 0, 0, "", "", ""))
-
-        # movie with top world sales for selected month
-        top_month_movie = search_top_movie_in_month(release_month)
-        # convert world sales to readable format
-        top_month_movie.world_sales = utils.round_number_as_string(int(top_month_movie.world_sales))
-        # movie with top world sales for selected genre
-        top_genre_movie = search_genre_top_sales(selected_genre)
-        # convert world sales to readable format
-        top_genre_movie.world_sales = utils.round_number_as_string(int(top_genre_movie.world_sales))
+        # which page of the sales search results to show
+        cursor = max(get_form_int('cursor', 0), 0)
+        limit = min(max(get_form_int('limit', app.config['SEARCH_PAGE_SIZE']), 1), app.config['SEARCH_MAX_PAGE_SIZE'])
+        # how many of the top selling movies of the month/genre to show
+        top_count = min(max(get_form_int('top_count', 1), 1), app.config['TOP_MOVIES_MAX_COUNT'])
+
+        with stage('search'):
+            store = get_movie_store()
+            # movies within specified world sales amounts, each one is only looked up as the page is sent
+            # the template shows no results when there aren't any
+            if sales_minimum is not None and sales_maximum is not None:
+                page_rows, total_movies = get_sales_page(
+                    store, sales_type, sales_minimum, sales_maximum, cursor, limit)
+                # a cursor past the end (old link, edited form) shows the last page instead of an empty one
+                if cursor > 0 and cursor >= total_movies:
+                    cursor = max(total_movies - 1, 0) // limit * limit
+                    page_rows, total_movies = get_sales_page(
+                        store, sales_type, sales_minimum, sales_maximum, cursor, limit)
+            else:
+                page_rows, total_movies = [], 0
+            movie_list = store.iter_rows(page_rows)
+
+            # movie with top world sales for selected month
+            top_month_movies = search_top_movies('World', top_count, month=release_month)
+            # movie with top world sales for selected genre
+            top_genre_movies = search_top_movies('World', top_count, genre=selected_genre)
 
         # combine search results into dictionary to pass to web page
         search_results = {
@@ -157,22 +568,86 @@ def get_search_results():
             "SalesMinimum": utils.round_number_as_string(sales_minimum),
             "SalesMaximum": utils.round_number_as_string(sales_maximum),
             "MovieList": movie_list,
+            "TotalMovies": total_movies,
+            "Limit": limit,
+            # cursors for the previous/next pages, None if there isn't one
+            "PreviousCursor": max(cursor - limit, 0) if cursor > 0 else None,
+            "NextCursor": cursor + limit if cursor + limit < total_movies else None,
+            "FirstResult": min(cursor + 1, total_movies),
+            "LastResult": min(cursor + limit, total_movies),
+            # original inputs so page links can repeat the same search
+            "MinInput": sales_minimum,
+            "MaxInput": sales_maximum,
             "ReleaseMonth": release_month,
-            "TopMonthMovie": top_month_movie,
+            "TopCount": top_count,
+            "TopMonthMovies": get_top_movie_list(top_month_movies),
             "SelectedGenre": selected_genre,
-            "TopGenreMovie": top_genre_movie
+            "TopGenreMovies": get_top_movie_list(top_genre_movies)
         }
     # just do nothing if a request isn't successfully made
     else:
         return
     # render page that contains results from user search inputs
-    return render_template("search_results.html", data=search_results)
+    # streamed a few rows at a time so the first results go out before the rest are rendered
+    return stream_page("search_results.html", data=search_results)
 
 
-# create chart for total sales percentage by genre
-def generate_sales_by_genre_chart(dataset):
-    # Pie chart, where the slices will be ordered and plotted counter-clockwise
+# titles and world sales of top selling movies for the search results page
+def get_top_movie_list(movies):
+    return [
+        {
+            "Title": movie.title,
+            # convert world sales to readable format
+            "Sales": utils.round_number_as_string(movie.world_sales)
+        }
+        for movie in movies
+    ]
 
+
+# renders the template as the response is sent instead of into one string first
+# output is buffered so each chunk sent holds several rows instead of every tag on its own
+def stream_page(template_name, **context):
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+    page = template.stream(context)
+    page.enable_buffering(app.config['TEMPLATE_STREAM_BUFFER'])
+    g.streamed = True
+    return Response(stream_with_context(render_streamed_page(page)), mimetype='text/html')
+
+
+# sends the chunks of a streamed page, timing how long they took to render (not how long the client took to read
+# them) as the template stage, and records the request once the last one has gone out or the client went away
+def render_streamed_page(chunks):
+    chunks = iter(chunks)
+    rendering_seconds = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            rendering_seconds += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        finish_streamed_request(rendering_seconds)
+
+
+# what record_request_timing and store_request_profile left for the end of a streamed page
+def finish_streamed_request(rendering_seconds):
+    stages = g.pop('streamed_stages', None)
+    if stages is not None and app.config['METRICS_ENABLED']:
+        stages.append(('template', rendering_seconds))
+        record_request_metrics(g.pop('streamed_status'), time.perf_counter() - g.request_start, stages)
+
+    profiler = g.pop('streamed_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        profile_store.add(request.method, request.full_path.rstrip('?'), time.perf_counter() - g.profile_start,
+                          profiler, g.pop('streamed_profile_id'))
+
+
+# gets total sales percentage for top 5 genres and everything else as 'Other' for genre sales chart
+def get_genre_sales_percentages(cube):
     # dictionary for holding genre count for movies in dataset
     genres = {
         'Action': 0,
@@ -198,16 +673,12 @@ def generate_sales_by_genre_chart(dataset):
         'Western': 0
     }
 
-    # need total sales to get sales percentage for each genre
-    total_all_movie_sales = 0
-    # loop through dataset and count sales for each genre
+    # world sales of movies with each genre, totalled in the sales cube when the dataset loaded
     for genre in genres:
-        for movie in dataset:
-            if genre in movie.genre:
-                # add world sales for that movie to genre sales count
-                genres[genre] += int(movie.world_sales)
-            # add movie world sales to overall sales count
-            total_all_movie_sales += int(movie.world_sales)
+        genres[genre] = cube.genre_totals(genre)[0][WORLD_SALES]
+    # need total sales to get sales percentage for each genre
+    # overall sales are counted once for every genre
+    total_all_movie_sales = len(genres) * cube.world_total()
 
     # convert count of genres to percentage
     for genre in genres:
@@ -226,34 +697,18 @@ def generate_sales_by_genre_chart(dataset):
     # get 'Other' category percentage
     other_percentage = round(10 - top_five_genre_percentage, 2)
 
-    labels = []
-    percentages = []
+    genre_percentages = {}
     # separate dict into labels/percentages to input into pie chart generation
     for genre in trimmed_genres:
-        labels.append(genre[0])
-        percentages.append(round(genre[1] * 1000, 2))
-    # add 'Other' and its percentage to respective lists
-    labels.append('Other')
-    percentages.append(other_percentage)
-
-    explode = (0.1, 0, 0, 0, 0, 0)  # only explode 1st slice
-
-    fig1, ax1 = plt.subplots()
-    # assign values to pie chart plot
-    ax1.pie(percentages, explode=explode, labels=labels, autopct='%1.1f%%',
-            shadow=True, startangle=90)
-    ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-
-    plt.title('Genre Sales Percentage')
+        genre_percentages[genre[0]] = round(genre[1] * 1000, 2)
+    # add 'Other' and its percentage
+    genre_percentages['Other'] = other_percentage
 
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/genre_sales.png')
-    plt.close()
+    return genre_percentages
 
 
-# create chart for genre by weighted rank
-def generate_rank_by_genre_chart(dataset):
+# gets weighted rank points for each genre for genre rank chart
+def get_genre_rank_points(cube):
     # use dictionary here for easier looping and tracking of weighted rank points
     labels = {
         'Action': 0,
@@ -284,87 +739,36 @@ def generate_rank_by_genre_chart(dataset):
     # 2nd has ['Action', 'Adventure', 'Drama'], each genre gets 999pts
     # so on and so forth
 
-    # simpler to start with genre then loop through all movies to determine rank points
+    # points are added up per genre by the sales cube as movies are loaded
     for genre in labels:
-        # set and reset points used for determining rank for each genre
-        genre_rank_points = 1000
-        # start looping through movies
-        for movie in dataset:
-            # check if current genre is in current movie
-            if genre in movie.genre:
-                # add points for current rank
-                labels[genre] += genre_rank_points
-            # subtract point before moving on to next movie
-            genre_rank_points -= 1
+        labels[genre] = int(cube.genre_rank_points[GENRES.index(genre)])
 
     # reduce points for better readability
     for genre in labels:
         labels[genre] /= 10000
 
-    # horizontal bar chart for this
-    plt.barh(list(labels.keys()), labels.values())
-    # invert y-axis to show genres in alphabetical order
-    plt.gca().invert_yaxis()
-    # set chart title/labels
-    plt.title('Genre Weighted Ranks')
-    plt.ylabel('Genre')
-    plt.xlabel('Weighted Points')
-    # ensures graph is not cutoff when saved as .png
-    plt.tight_layout()
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/genre_ranks.png')
-    plt.close()
-
-
-# create chart for sales percentage by rating
-def generate_sales_by_rating(dataset):
-    # Pie chart, where the slices will be ordered and plotted counter-clockwise
-    # use a list here so that we only have to iterate through the dataset once
-    ratings = 'G', 'PG', 'PG-13', 'R'
-
-    g_total = pg_total = pg_13_total = r_total = 0
-    # iterate through entire dataset and add to rating count for each movie for respective MPAA ratings
-    for movie in dataset:
-        if 'G' == movie.rating:
-            g_total += 1
-        if 'PG' == movie.rating:
-            pg_total += 1
-        if 'PG-13' == movie.rating:
-            pg_13_total += 1
-        if 'R' == movie.rating:
-            r_total += 1
+    return labels
 
-    # calculate percentage of movies with each rating
-    g_percentage = g_total / len(dataset)
-    pg_percentage = pg_total / len(dataset)
-    pg_13_percentage = pg_13_total / len(dataset)
-    r_percentage = r_total / len(dataset)
-    # add rating percentages to list for pie chart generation
-    sizes = [
-        g_percentage,
-        pg_percentage,
-        pg_13_percentage,
-        r_percentage
-    ]
-    explode = (0, 0, 0.1, 0)  # explode 2nd slice (PG-13)
-
-    fig1, ax1 = plt.subplots()
-    # assign values to plot for chart generation
-    ax1.pie(sizes, explode=explode, labels=ratings, autopct='%1.1f%%',
-            shadow=True, startangle=90)
-    ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
 
-    plt.title('Rating Sales Percentage')
+# gets percentage of movies with each MPAA rating for rating chart
+def get_rating_percentages(cube):
+    # count movies for respective MPAA ratings
+    _, g_total = cube.rating_totals('G')
+    _, pg_total = cube.rating_totals('PG')
+    _, pg_13_total = cube.rating_totals('PG-13')
+    _, r_total = cube.rating_totals('R')
 
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/rating_sales.png')
-    plt.close()
+    # calculate percentage of movies with each rating
+    return {
+        'G': g_total / cube.movie_count,
+        'PG': pg_total / cube.movie_count,
+        'PG-13': pg_13_total / cube.movie_count,
+        'R': r_total / cube.movie_count
+    }
 
 
-# create chart for total sales by month release
-def generate_sales_by_month(dataset):
+# gets total world sales in billions for each release month for month sales chart
+def get_month_sales(cube):
     # dictionary for search and tracking month sales
     months = {
         'Jan': 0,
@@ -383,125 +787,88 @@ def generate_sales_by_month(dataset):
 
     # get total world sales for each month
     for month in months:
-        for movie in dataset:
-            if month in movie.release_date:
-                months[month] += int(movie.world_sales)
+        months[month], _, _, _ = cube.month_totals(month)
 
     #  round amount for each month in billions to second decimal
     for month in months:
         months[month] = round(months[month] / 1000000000, 2)
 
-    x = np.arange(len(months))  # label locations
-    width = 0.4  # the width of the bars
-
-    fig, ax = plt.subplots()
-    month_bars = ax.bar(x - width / 2, months.values(), width)
-
-    # Add some text for labels, title and custom x-axis tick labels, etc.
-    ax.set_ylabel('Total Sales in Billions')
-    ax.set_title('Total Sales By Month')
-    ax.set_xticks(x, months.keys())
-
-    ax.bar_label(month_bars, padding=3)
-    fig.tight_layout()
-
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/sales_months.png')
-    plt.close()
-
+    return months
 
-# creates chart displaying highest and lowest sales for selected genre(s) alongside the projected movie sales
-def generate_genre_highest_lowest_sales(projected_data):
-    # create plot with data to visual comparisons
-    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
-    width = 0.5  # the width of the bars
 
-    fig, ax = plt.subplots()
-    comparison_bars = ax.bar(x - width / 2, projected_data.values(), width)
+# renders every chart that isn't already cached at the same time on the chart renderer
+# charts is a list of (chart name, chart function, chart data), returns key of each chart to use in its url
+def render_charts(charts):
+    chart_keys = [get_chart_key(chart_name, chart_data) for chart_name, _, chart_data in charts]
 
-    # Add some text for labels, title and custom x-axis tick labels, etc.
-    ax.set_ylabel('Total Sales in Millions')
-    ax.set_title('Genre Highest vs Lowest vs Prediction')
-    ax.set_xticks(x, projected_data.keys())
-
-    ax.bar_label(comparison_bars, padding=3)
-    fig.tight_layout()
-
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/genre_high_low_comparison.png')
-    plt.close()
-
-
-# creates chart for highest/lowest/projected sales for chose release month
-def generate_month_highest_lowest_sales(projected_data):
-    # create plot with data to visual comparisons
-    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
-    width = 0.3  # the width of the bars
-
-    fig, ax = plt.subplots()
-    comparison_bars = ax.bar(x - width / 2, projected_data.values(), width)
-
-    # Add some text for labels, title and custom x-axis tick labels, etc.
-    ax.set_ylabel('Total Sales in Millions')
-    ax.set_title('Release Month Highest vs Lowest vs Prediction')
-    ax.set_xticks(x, projected_data.keys())
+    # only render charts nobody has asked for with the same data yet
+    missing_charts = [
+        (chart_key, (chart_function, chart_data))
+        for chart_key, (_, chart_function, chart_data) in zip(chart_keys, charts)
+        if chart_key not in chart_cache
+    ]
+    with stage('charts'):
+        images = chart_renderer.render_all([chart_job for _, chart_job in missing_charts])
 
-    ax.bar_label(comparison_bars, padding=3)
-    fig.tight_layout()
+    failed_charts = set()
+    for (chart_key, _), image in zip(missing_charts, images):
+        if image is None:
+            failed_charts.add(chart_key)
+        else:
+            chart_cache.put(chart_key, image)
 
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/month_high_low_comparison.png')
-    plt.close()
+    # charts that failed or timed out show the placeholder instead, they'll be tried again next request
+    if failed_charts:
+        chart_cache.put(PLACEHOLDER_CHART_KEY, chart_renderer.get_placeholder())
+    return [PLACEHOLDER_CHART_KEY if chart_key in failed_charts else chart_key for chart_key in chart_keys]
 
 
-# creates chart for sales of all movies in chosen series with projected sales for this movie
-def generate_series_sales(series_selection, projected_data):
-    # create chart for series comparisons (horizontal bar chart)
-    plt.barh(list(projected_data.keys()), projected_data.values())
-    # invert y-axis to show genres in alphabetical order
-    plt.gca().invert_yaxis()
-    # set chart title/labels
-    if series_selection != 'None':
-        plt.title('Series Sales Comparisons')
-    else:
-        # chart will be blank if no series chosen
-        plt.title('No Series Data to Display')
+# serves chart images rendered for predictions out of the chart cache
+# chart keys are made from the chart's data so the image behind a url never changes
+@app.route('/charts/<chart_key>.png')
+def get_chart(chart_key):
+    not_modified = get_not_modified(chart_key, immutable=True)
+    if not_modified is not None:
+        return not_modified
 
-    plt.ylabel('Title')
-    plt.xlabel('World Sales in Millions')
-    # ensures graph is not cutoff when saved as .png
-    plt.tight_layout()
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/series_sales_comparisons.png')
-    plt.close()
+    image = chart_cache.get(chart_key)
+    if image is None:
+        abort(404)
+    return make_cached_response(image, 'image/png', chart_key, immutable=True)
 
 
-# create chart for average sales of movies of each rating alongside projected sales of this movie
-def generate_rating_average_sales(projected_data):
-    # horizontal chart for sales for each rating
-    # create plot with data to visual comparisons
-    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
-    width = 0.4  # the width of the bars
+# create visualizations for projected data alongside historical data
+# returns dictionary with the key of each chart to use in its url
+def render_prediction_charts(series_selection, prediction):
+    # each chart is keyed by its data so repeated scenarios reuse the already rendered image
+    return dict(zip(PREDICTION_CHARTS, render_charts(get_prediction_charts(series_selection, prediction))))
 
-    fig, ax = plt.subplots()
-    comparison_bars = ax.bar(x - width / 2, projected_data.values(), width)
 
-    # Add some text for labels, title and custom x-axis tick labels, etc.
-    ax.set_ylabel('Average Sales in Millions')
-    ax.set_title('Average Sales By Rating')
-    ax.set_xticks(x, projected_data.keys())
+# keys the prediction's charts have, without rendering them
+def get_prediction_chart_keys(series_selection, prediction):
+    prediction_charts = get_prediction_charts(series_selection, prediction)
+    return {
+        name: get_chart_key(chart_name, chart_data)
+        for name, (chart_name, _, chart_data) in zip(PREDICTION_CHARTS, prediction_charts)
+    }
 
-    ax.bar_label(comparison_bars, padding=3)
-    fig.tight_layout()
 
-    # have to save image to static directory to be accessible in flask env
-    # it will update images with same name
-    plt.savefig('static/rating_sales_comparison.png')
-    plt.close()
+# charts shown with a prediction as (chart name, chart function, chart data), in the order of PREDICTION_CHARTS
+def get_prediction_charts(series_selection, prediction):
+    return [
+        # create highest/lowest/projected sales chart for genres with predictive data
+        ('genre_high_low_comparison', charts.generate_genre_highest_lowest_sales,
+         (prediction["GenreSalesComparisons"],)),
+        # create series sales chart for chosen series with predictive data
+        ('series_sales_comparisons', charts.generate_series_sales,
+         (series_selection, prediction["SeriesMovies"])),
+        # generate chart for high/low/predicted sales for selected release month
+        ('month_high_low_comparison', charts.generate_month_highest_lowest_sales,
+         (prediction["MonthSalesComparisons"],)),
+        # generate chart for average sales for each rating alongside projected sales
+        ('rating_sales_comparison', charts.generate_rating_average_sales,
+         (prediction["RatingSalesComparison"],))
+    ]
 
 
 # method to retrieve inputs from user for proposed movie types/release date/rating/series
@@ -510,8 +877,7 @@ def generate_rating_average_sales(projected_data):
 def predict_movie_success():
     if request.method == 'POST':
         # retrieve dataset
-        data_helper = DataHelper()
-        dataset = data_helper.retrieve_movies("movie_data.csv")
+        dataset = get_dataset()
 
         # get selected genres
         genre_checkboxes = [
@@ -547,218 +913,30 @@ def predict_movie_success():
         # get selected series (if any)
         series_selection = request.form.get('series')
 
-        # get domestic, international, and total sales of genres and track movies in genres
-        genres_domestic_sales = genres_international_sales = genres_world_sales = movies_with_genre = genre_highest_sales = 0
-        genre_lowest_sales = 1000000000
-        # get sales numbers and amount for ratings for visualization later
-        g_rating_sales = pg_rating_sales = pg13_rating_sales = r_rating_sales = 0
-        g_rating_count = pg_rating_count = pg13_rating_count = r_rating_count = 0
-
-        for movie in dataset:
-            for genre in selected_genres:
-                if genre in movie.genre:
-                    genres_domestic_sales += int(movie.domestic_sales)
-                    genres_international_sales += int(movie.international_sales)
-                    genres_world_sales += int(movie.world_sales)
-                    movies_with_genre += 1
-            # add to rating sales for visualization in results
-            if 'G' == movie.rating:
-                g_rating_sales += int(movie.world_sales)
-                g_rating_count += 1
-            if 'PG' == movie.rating:
-                pg_rating_sales += int(movie.world_sales)
-                pg_rating_count += 1
-            if 'PG-13' == movie.rating:
-                pg13_rating_sales += int(movie.world_sales)
-                pg13_rating_count += 1
-            if 'R' == movie.rating:
-                r_rating_sales += int(movie.world_sales)
-                r_rating_count += 1
-
-        # want to try to get exact matches of genres selected first for better comparison
-        for movie in dataset:
-            if movie.genre == str(selected_genres):
-                if int(movie.world_sales) > genre_highest_sales:
-                    genre_highest_sales = int(movie.world_sales)
-                if int(movie.world_sales) < genre_lowest_sales:
-                    genre_lowest_sales = int(movie.world_sales)
-
-        # if no matches to exact genre then get movies with that genre in their list of genres
-        for movie in dataset:
-            movie_genre_list = movie.genre.strip('][').replace("'", "").split(', ')
-            # make sure original sales high/low is unchanged before doing this search
-            if genre_highest_sales == 0 or genre_lowest_sales == 1000000000:
-                if all(element in movie_genre_list for element in selected_genres):
-                    if int(movie.world_sales) > genre_highest_sales:
-                        genre_highest_sales = int(movie.world_sales)
-                    if int(movie.world_sales) < genre_lowest_sales:
-                        genre_lowest_sales = int(movie.world_sales)
-
-        # divide by amount of selected genres multiplied by amount of genres selected
-        # since we iterate through the dataset that many times
-        genres_domestic_sales /= (len(selected_genres) * movies_with_genre)
-        genres_international_sales /= (len(selected_genres) * movies_with_genre)
-        genres_world_sales /= (len(selected_genres) * movies_with_genre)
-
-        # take total sales for movies released in selected month and divide by amount of movies released in month
-        month_total_sales = movies_released_in_month = month_highest_sales = 0
-        month_lowest_sales = 1000000000
-
-        # add up total sales for movies that were released in each month
-        # and how many movies released in that month to determine averages sale for that month
-        for movie in dataset:
-            if selected_release_month in movie.release_date:
-                month_total_sales += int(movie.world_sales)
-                movies_released_in_month += 1
-                # track high/low world sales for this month
-                if int(movie.world_sales) > month_highest_sales:
-                    month_highest_sales = int(movie.world_sales)
-                if int(movie.world_sales) < month_lowest_sales:
-                    month_lowest_sales = int(movie.world_sales)
-
-        # total sales for that release month divided by total movies released in that month
-        month_average_sales = month_total_sales / movies_released_in_month
-
-        # we want to get the mean of the monthly average and projected sales based on genre
-        genres_domestic_sales = (month_average_sales + genres_domestic_sales) / 2
-        genres_international_sales += (month_average_sales + genres_international_sales) / 2
-        genres_world_sales += (month_average_sales + genres_world_sales) / 2
-
-        # movie rating modifier
-        # get chosen rating then reduce by 20% if rated R
-        # sales data backs up this reduction (see results from average ratings sales on prediction results page)
-        if selected_movie_rating == 'R':
-            genres_domestic_sales *= 0.7
-            genres_international_sales *= 0.7
-            genres_world_sales = genres_domestic_sales + genres_international_sales
-
-        # increase sales for continuations of popular series and
-        series_movies = {}
-        if series_selection != 'None':
-            for movie in dataset:
-                if series_selection in movie.title:
-                    genres_domestic_sales += (genres_domestic_sales * 0.2)
-                    genres_international_sales += (genres_international_sales * 0.2)
-                    genres_world_sales = genres_domestic_sales + genres_international_sales
-                    # first match found breaks loop to avoid duplicate additions
-                    break
-
-            # get list of previous series movies for comparison chart
-            # also check series movie sales against high/low genre sales since we want to include that in chart generation
-            for movie in dataset:
-                if series_selection in movie.title:
-                    # add movie to series list
-                    series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                    if int(movie.world_sales) > genre_highest_sales:
-                        genre_highest_sales = int(movie.world_sales)
-                    if int(movie.world_sales) < genre_lowest_sales:
-                        genre_lowest_sales = int(movie.world_sales)
-                # edge cases where selection box will not find all movies in series
-                elif series_selection == 'Batman':
-                    if 'Dark Knight' in movie.title:
-                        series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                        if int(movie.world_sales) > genre_highest_sales:
-                            genre_highest_sales = int(movie.world_sales)
-                        if int(movie.world_sales) < genre_lowest_sales:
-                            genre_lowest_sales = int(movie.world_sales)
-                elif series_selection == 'Harry Potter':
-                    if 'Fantastic Beasts' in movie.title:
-                        series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                        if int(movie.world_sales) > genre_highest_sales:
-                            genre_highest_sales = int(movie.world_sales)
-                        if int(movie.world_sales) < genre_lowest_sales:
-                            genre_lowest_sales = int(movie.world_sales)
-                elif series_selection == 'Lord of the Rings':
-                    if 'The Hobbit' in movie.title:
-                        series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                        if int(movie.world_sales) > genre_highest_sales:
-                            genre_highest_sales = int(movie.world_sales)
-                        if int(movie.world_sales) < genre_lowest_sales:
-                            genre_lowest_sales = int(movie.world_sales)
-                elif series_selection == 'The Fast and the Furious':
-                    if '2 Fast 2 Furious' in movie.title or 'Fast Five' in movie.title or 'Fast & Furious' in movie.title \
-                            or 'Furious' in movie.title or 'Fate of the Furious' in movie.title or 'F9' in movie.title:
-                        series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                        if int(movie.world_sales) > genre_highest_sales:
-                            genre_highest_sales = int(movie.world_sales)
-                        if int(movie.world_sales) < genre_lowest_sales:
-                            genre_lowest_sales = int(movie.world_sales)
-                elif series_selection == 'X-Men':
-                    if 'Wolverine' in movie.title:
-                        series_movies[movie.title] = utils.round_number_millions(int(movie.world_sales))
-                        if int(movie.world_sales) > genre_highest_sales:
-                            genre_highest_sales = int(movie.world_sales)
-                        if int(movie.world_sales) < genre_lowest_sales:
-                            genre_lowest_sales = int(movie.world_sales)
-
-        # subtract from sales for having absurd amount of genres
-        if len(selected_genres) > 8:
-            genres_domestic_sales -= (genres_domestic_sales * (0.1 * (len(selected_genres) - 8)))
-            genres_international_sales -= (genres_international_sales * (0.1 * (len(selected_genres) - 8)))
-            genres_world_sales = genres_world_sales = genres_domestic_sales + genres_international_sales
-
-        # find movies with exact  or very similar genres to show as comparisons
-        comparative_movies = []
-        for movie in dataset:
-            # have to convert string of genres in dataset to list to compare
-            movie_genre_list = movie.genre.strip('][').replace("'", "").split(', ')
-            # check if all genres in selected genre appear in a movie genre list
-            # and see if same rating because we don't want to recommend The Conjuring as a similar title to Scooby Doo
-            if all(element in movie_genre_list for element in
-                   selected_genres) and selected_movie_rating == movie.rating:
-                comparative_movies.append(movie.title)
-
-        # trim list to just top 3
-        if len(comparative_movies) > 3:
-            comparative_movies = comparative_movies[0:3]
-
-        # create visualizations for projected data alongside historical data
-
-        # put genres sales data in dictionary to pass to function for plot generation
-        genre_sales_comparisons = {
-            "Lowest": utils.round_number_millions(genre_lowest_sales),
-            "Projected": utils.round_number_millions(genres_world_sales),
-            "Highest": utils.round_number_millions(genre_highest_sales)
-        }
-        # create highest/lowest/projected sales chart for genres with predictive data
-        generate_genre_highest_lowest_sales(genre_sales_comparisons)
-
-        # create highest/lowest/projected sales for chosen release month with predictive data
-
-        # add projected movie data to series movie list first
-        if series_selection != 'None':
-            series_movies['Projected Movie'] = utils.round_number_millions(genres_world_sales)
+        # popular scenarios are answered from the cache along with their already rendered charts
+        scenario_key = get_scenario_key(
+            dataset.version, selected_genres, selected_movie_rating, selected_release_month, series_selection)
+        cached_prediction = prediction_cache.get(scenario_key)
+
+        if cached_prediction is None:
+            # run predictive algorithm with the selected inputs
+            with stage('prediction'):
+                prediction = predict_movie(
+                    dataset, selected_genres, selected_movie_rating, selected_release_month, series_selection)
+            chart_keys = render_prediction_charts(series_selection, prediction)
+            # don't remember results whose charts didn't render so they're tried again
+            if PLACEHOLDER_CHART_KEY not in chart_keys.values():
+                prediction_cache.put(scenario_key, (prediction, chart_keys))
         else:
-            series_movies[''] = 0
-        # create series sales chart for chosen series with predictive data
-        generate_series_sales(series_selection, series_movies)
+            prediction, chart_keys = cached_prediction
+            # chart images can be dropped from the chart cache before the prediction is, render them again
+            if any(chart_key not in chart_cache for chart_key in chart_keys.values()):
+                chart_keys = render_prediction_charts(series_selection, prediction)
 
-        # get highest and lowest selling movie in selected month for visualization
-        month_sales_comparisons = {
-            "Lowest": utils.round_number_millions(month_lowest_sales),
-            "Projected": utils.round_number_millions(genres_world_sales),
-            "Highest": utils.round_number_millions(month_highest_sales)
-        }
-        # generate chart for high/low/predicted sales for selected genre(s)
-        generate_month_highest_lowest_sales(month_sales_comparisons)
-
-        # get average sales for each MPAA rating to compare to projected sales of this one
-        # total sales have been counted as many times as selected genres so we have to divide by that amount
-        # and divide by all the movies with that rating counted divided by amount of genres as well
-        g_rating_average_sales = (g_rating_sales / len(selected_genres)) / (g_rating_count / len(selected_genres))
-        pg_rating_average_sales = (pg_rating_sales / len(selected_genres)) / (pg_rating_count / len(selected_genres))
-        pg13_rating_average_sales = (pg13_rating_sales / len(selected_genres)) / (pg13_rating_count / len(selected_genres))
-        r_rating_average_sales = (r_rating_sales / len(selected_genres)) / (r_rating_count / len(selected_genres))
-
-        rating_sales_comparison = {
-            'G': utils.round_number_millions(g_rating_average_sales),
-            'PG': utils.round_number_millions(pg_rating_average_sales),
-            'PG-13': utils.round_number_millions(pg13_rating_average_sales),
-            'R': utils.round_number_millions(r_rating_average_sales),
-            'Projected': utils.round_number_millions(genres_world_sales)
-        }
-        # generate chart for average sales for each rating alongside projected sales
-        generate_rating_average_sales(rating_sales_comparison)
+        genres_domestic_sales = prediction["DomesticSales"]
+        genres_international_sales = prediction["InternationalSales"]
+        genres_world_sales = prediction["WorldSales"]
+        comparative_movies = prediction["ComparativeMovies"]
 
         # convert sales numbers to more readable format (millions or billions)
         # domestic sales conversion
@@ -782,9 +960,398 @@ def predict_movie_success():
         ]
 
         # render page with prediction data
-        return render_template("prediction_results.html", data=prediction_results)
+        with stage('template'):
+            return render_template("prediction_results.html", data=prediction_results, charts=chart_keys)
+
+
+# scores a batch of what-if scenarios and returns their projected sales as json, no charts are rendered
+# body is {"scenarios": [{"genres": [...], "rating": "PG-13", "month": "Dec", "series": "None"}, ...]}
+# scenarios can also have a "runtime" in minutes to adjust the sales by how that runtime sells
+@app.route('/api/predictions', methods=['POST'])
+def predict_movie_batch():
+    body = request.get_json(silent=True)
+    scenarios = body.get('scenarios') if isinstance(body, dict) else body
+    if not isinstance(scenarios, list):
+        return jsonify(error='expected a list of scenarios'), 400
+    if len(scenarios) > app.config['BATCH_PREDICTION_LIMIT']:
+        return jsonify(error='at most %d scenarios per request' % app.config['BATCH_PREDICTION_LIMIT']), 413
+
+    # check every scenario first so one bad entry doesn't waste the whole batch
+    scenario_errors = [
+        {"index": index, "errors": errors}
+        for index, errors in enumerate(validate_scenario(scenario) for scenario in scenarios)
+        if errors
+    ]
+    if scenario_errors:
+        return jsonify(error='invalid scenarios', scenarios=scenario_errors), 400
+
+    dataset = get_dataset()
+    with stage('prediction'):
+        # scenarios the dataset has no movies for get their errors back instead of failing the whole batch
+        data_errors = get_scenario_data_errors(
+            dataset, [scenario['genres'] for scenario in scenarios], [scenario['month'] for scenario in scenarios])
+        projected_scenarios = [scenario for scenario, errors in zip(scenarios, data_errors) if not errors]
+
+        domestic_sales, international_sales, world_sales = project_sales(
+            dataset,
+            [scenario['genres'] for scenario in projected_scenarios],
+            [scenario['rating'] for scenario in projected_scenarios],
+            [scenario['month'] for scenario in projected_scenarios],
+            [scenario.get('series', 'None') for scenario in projected_scenarios]
+        )
+
+        # scenarios with a runtime are scaled by how movies with their rating sell at that runtime
+        if any(scenario.get('runtime') is not None for scenario in projected_scenarios):
+            runtime_buckets = dataset.get_runtime_buckets()
+            runtime_modifiers = np.array([
+                runtime_buckets.runtime_modifier(scenario['runtime'], scenario['rating'])
+                if scenario.get('runtime') is not None else 1.0
+                for scenario in projected_scenarios
+            ])
+            domestic_sales = domestic_sales * runtime_modifiers
+            international_sales = international_sales * runtime_modifiers
+            world_sales = world_sales * runtime_modifiers
+
+    projections = iter(zip(domestic_sales.tolist(), international_sales.tolist(), world_sales.tolist()))
+    predictions = []
+    for errors in data_errors:
+        if errors:
+            predictions.append({"errors": errors})
+        else:
+            domestic, international, world = next(projections)
+            predictions.append({"domestic_sales": domestic, "international_sales": international, "world_sales": world})
+    return jsonify(dataset_version=dataset.version, predictions=predictions)
+
+
+# projects sales for a genre/series pitch across every release month and rating in one calculation
+# body is {"genres": [...], "series": "None"}, returns month x rating grids and a heatmap chart of world sales
+@app.route('/api/predictions/sweep', methods=['POST'])
+def sweep_movie_predictions():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify(error='expected an object with genres and series'), 400
+    selected_genres = body.get('genres')
+    series_selection = body.get('series', 'None')
+
+    # month/rating are filled in for every cell so only genres and series need checking
+    errors = validate_scenario({"genres": selected_genres, "rating": RATINGS[0], "month": MONTHS[0],
+                                "series": series_selection})
+    if errors:
+        return jsonify(error='invalid scenario', errors=errors), 400
+
+    # every month x rating combination as one batch, months are the rows of the grid
+    sweep_months = [month for month in MONTHS for _ in RATINGS]
+    sweep_ratings = [rating for _ in MONTHS for rating in RATINGS]
+    dataset = get_dataset()
+    # every cell is needed for the grids, so a pitch the dataset can't project for any month is rejected
+    data_errors = get_scenario_data_errors(dataset, [selected_genres] * len(MONTHS), MONTHS)
+    errors = list(dict.fromkeys(error for month_errors in data_errors for error in month_errors))
+    if errors:
+        return jsonify(error='scenario can not be projected from the dataset', errors=errors), 400
+    with stage('prediction'):
+        domestic_sales, international_sales, world_sales = project_sales(
+            dataset,
+            [selected_genres] * len(sweep_months),
+            sweep_ratings,
+            sweep_months,
+            [series_selection] * len(sweep_months)
+        )
+    grid_shape = (len(MONTHS), len(RATINGS))
+
+    # heatmap goes through the chart cache like the prediction charts
+    world_sales_millions = [
+        [utils.round_number_millions(sales) for sales in month_sales]
+        for month_sales in world_sales.reshape(grid_shape).tolist()
+    ]
+    heatmap_chart, = render_charts([
+        ('sales_heatmap', charts.generate_sales_heatmap, (series_selection, MONTHS, RATINGS, world_sales_millions))
+    ])
+
+    return jsonify(
+        dataset_version=dataset.version,
+        genres=selected_genres,
+        series=series_selection,
+        months=MONTHS,
+        ratings=RATINGS,
+        domestic_sales=domestic_sales.reshape(grid_shape).tolist(),
+        international_sales=international_sales.reshape(grid_shape).tolist(),
+        world_sales=world_sales.reshape(grid_shape).tolist(),
+        chart_url=url_for('get_chart', chart_key=heatmap_chart)
+    )
+
+
+# amount, average and median world sales of movies in each 15 minute runtime bucket for every genre and rating
+# grids are runtime bucket x genre x rating, averages/medians are null where there are no movies
+@app.route('/api/runtimes')
+def get_runtime_sales():
+    dataset = get_dataset()
+    etag = get_etag(dataset.version, request.full_path)
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    with stage('chart_data'):
+        runtime_buckets = dataset.get_runtime_buckets()
+
+    return make_json_response(
+        etag,
+        dataset_version=dataset.version,
+        bucket_minutes=BUCKET_MINUTES,
+        bucket_starts=runtime_buckets.bucket_starts(),
+        genres=list(GENRES) + ['All'],
+        ratings=['Unrated'] + list(RATINGS) + ['All'],
+        movie_counts=runtime_buckets.counts.tolist(),
+        average_world_sales=get_json_grid(runtime_buckets.average_sales),
+        median_world_sales=get_json_grid(runtime_buckets.median_sales)
+    )
+
+
+# nested lists of an array with nan turned into None, json has no nan
+def get_json_grid(values):
+    return np.where(np.isnan(values), None, np.round(values)).tolist()
+
+
+# start/end year query arguments, both included, default to the first/last year any movie was released in
+# returns (start year, end year, error message)
+def get_year_range_args(store):
+    years = store.release_years
+    try:
+        start_year = int(request.args.get('start', years[0] if len(years) else 0))
+        end_year = int(request.args.get('end', years[-1] if len(years) else 0))
+    except ValueError:
+        return None, None, 'start and end must be whole years'
+    if start_year > end_year:
+        return None, None, 'start must not be after end'
+    return start_year, end_year, None
+
+
+def get_year_movie(movie):
+    if movie is None:
+        return None
+    return {
+        "rank": movie.rank,
+        "title": movie.title,
+        "release_date": movie.release_date,
+        "world_sales": movie.world_sales
+    }
 
 
-# runs web app in flask environment
+# total sales, amount of movies and top selling movie released from start to end year
+# e.g. /api/years/summary?start=1990&end=1999, answered from the store's per-year running totals
+@app.route('/api/years/summary')
+def get_year_range_summary():
+    dataset = get_dataset()
+    store = dataset.store
+    start_year, end_year, error = get_year_range_args(store)
+    if error:
+        return jsonify(error=error), 400
+    etag = get_etag(dataset.version, request.full_path)
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    with stage('search'):
+        sales, movie_count = store.year_range_totals(start_year, end_year)
+        top_movie = store.year_range_top(start_year, end_year)
+
+    return make_json_response(
+        etag,
+        dataset_version=dataset.version,
+        start_year=start_year,
+        end_year=end_year,
+        movie_count=movie_count,
+        domestic_sales=sales['Domestic'],
+        international_sales=sales['International'],
+        world_sales=sales['World'],
+        top_movie=get_year_movie(store.row(top_movie) if top_movie is not None else None)
+    )
+
+
+# sales, amount of movies and top selling movie of every year from start to end year that has movies in it
+@app.route('/api/years/sales')
+def get_year_range_sales():
+    dataset = get_dataset()
+    store = dataset.store
+    start_year, end_year, error = get_year_range_args(store)
+    if error:
+        return jsonify(error=error), 400
+    etag = get_etag(dataset.version, request.full_path)
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    with stage('search'):
+        start, end = store.year_range(start_year, end_year)
+        # totals of single years are the differences between neighbouring running totals
+        year_sales = {
+            sales_type: np.diff(store.year_sales_cumsum[sales_type][start:end + 1]).tolist()
+            for sales_type in ('Domestic', 'International', 'World')
+        }
+        movie_counts = np.diff(store.year_starts[start:end + 1]).tolist()
+        top_movies = [get_year_movie(store.row(row)) for row in store.year_top_rows[start:end]]
+
+    return make_json_response(
+        etag,
+        dataset_version=dataset.version,
+        start_year=start_year,
+        end_year=end_year,
+        years=store.release_years[start:end].tolist(),
+        movie_counts=movie_counts,
+        domestic_sales=year_sales['Domestic'],
+        international_sales=year_sales['International'],
+        world_sales=year_sales['World'],
+        top_movies=top_movies
+    )
+
+
+# movies with the highest sales matching every filter given, highest first
+# e.g. /api/movies/top?sales_type=World&limit=10&month=Dec&genre=Action, filters are any of TOP_SELLER_FILTERS
+@app.route('/api/movies/top')
+def get_top_movies():
+    dataset = get_dataset()
+    sales_type, limit, filters, error = get_top_movie_args()
+    if error:
+        return jsonify(error=error), 400
+    etag = get_etag(dataset.version, request.full_path)
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    with stage('search'):
+        top_rows = dataset.top_sellers.top(sales_type, limit, filters)
+        movies = [dict(row=int(row), **get_movie_json(dataset.store.row(row))) for row in top_rows]
+
+    return make_json_response(
+        etag,
+        dataset_version=dataset.version,
+        sales_type=sales_type,
+        limit=limit,
+        filters=filters,
+        movies=movies
+    )
+
+
+# sales type, amount of movies and filters query arguments of a top movies search
+# returns (sales type, limit, {filter: value}, error message)
+def get_top_movie_args():
+    sales_type = request.args.get('sales_type', 'World')
+    if sales_type not in SALES_TYPES:
+        return None, None, None, 'sales_type must be one of %s' % ', '.join(SALES_TYPES)
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return None, None, None, 'limit must be a whole number'
+    limit = min(max(limit, 1), app.config['TOP_MOVIES_MAX_COUNT'])
+
+    filters = {field: request.args[field] for field in TOP_SELLER_FILTERS if field in request.args}
+    if 'month' in filters and filters['month'] not in MONTHS:
+        return None, None, None, 'month must be one of %s' % ', '.join(MONTHS)
+    if 'genre' in filters and filters['genre'] not in GENRES:
+        return None, None, None, 'unknown genre %s' % filters['genre']
+    if 'year' in filters:
+        try:
+            filters['year'] = int(filters['year'])
+        except ValueError:
+            return None, None, None, 'year must be a whole year'
+    return sales_type, limit, filters, None
+
+
+# one movie of the dataset, row is its position in the dataset (same as its rank in the original data)
+@app.route('/api/movies/<int:row>')
+def get_movie(row):
+    dataset = get_dataset()
+    if row >= len(dataset.store):
+        return jsonify(error='no movie in row %d' % row), 404
+    etag = get_etag(dataset.version, request.full_path)
+    not_modified = get_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return make_json_response(etag, dataset_version=dataset.version, row=row,
+                              movie=get_movie_json(dataset.store.row(row)))
+
+
+# adds a movie on the end of the dataset, body has every field /api/movies/<row> returns
+# world_sales defaults to domestic + international, release_date and runtime can be null
+@app.route('/api/movies', methods=['POST'])
+def add_movie():
+    return change_movie(None)
+
+
+# updates the fields in the body of the movie in row, fields that aren't given keep their value
+@app.route('/api/movies/<int:row>', methods=['PATCH'])
+def update_movie(row):
+    return change_movie(row)
+
+
+# applies the change to the shared dataset without loading it again, cached predictions and charts the
+# movie doesn't feed into stay cached
+def change_movie(row):
+    if not app.config['MOVIE_WRITES_ENABLED']:
+        abort(404)
+    if not has_write_token():
+        return jsonify(error='a valid write token is required'), 401
+
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict):
+        return jsonify(error='expected an object with the movie fields'), 400
+
+    # fields are merged into the movie while the change log is locked, so two updates of the same movie from
+    # different workers never write back each other's old values
+    with stage('dataset'):
+        try:
+            previous_dataset, dataset, row = get_dataset_cache(app.config['MOVIE_DATA']).apply_change(
+                row, fields, app.config['CHANGE_LOG_COMPACT_AFTER'])
+        except IndexError as error:
+            return jsonify(error=str(error)), 404
+        except InvalidMovieError as error:
+            return jsonify(error='invalid movie', errors=error.errors), 400
+
+    # cached predictions were already carried over to the new dataset by carry_over_predictions
+    added = row == len(previous_dataset.store)
+    return jsonify(
+        dataset_version=dataset.version,
+        row=row,
+        movie=get_movie_json(dataset.store.row(row))
+    ), 201 if added else 200
+
+
+# keeps the cached predictions the changed movie doesn't feed into for the new dataset, called for every change the
+# dataset cache applies, including ones other workers logged
+# every movie with a rating feeds into the rating averages, so those are worked out again for every prediction kept
+# and only the rating chart gets rendered again (the next time the prediction is asked for)
+def carry_over_predictions(previous_dataset, dataset, row):
+    changed_movies = [dataset.store.row(row)]
+    if row < len(previous_dataset.store):
+        changed_movies.append(previous_dataset.store.row(row))
+    rating_comparison_affected = is_rating_comparison_affected(changed_movies)
+
+    def carry(scenario_key, result):
+        if is_scenario_affected(dataset, changed_movies, *scenario_key[1:]):
+            return None
+        if not rating_comparison_affected:
+            return result
+
+        prediction, chart_keys = result
+        selected_genres, series_selection = scenario_key[1], scenario_key[4]
+        prediction = dict(prediction, RatingSalesComparison=get_rating_sales_comparison(
+            dataset.cube, selected_genres, prediction["WorldSales"]))
+        return prediction, get_prediction_chart_keys(series_selection, prediction)
+
+    prediction_cache.carry_over(previous_dataset.version, dataset.version, carry)
+
+
+change_listeners.append(carry_over_predictions)
+
+
+# True if the request has the configured write token, never when no token is configured
+def has_write_token():
+    token = app.config['MOVIE_WRITE_TOKEN']
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode(), ('Bearer ' + token).encode())
+
+
+# runs web app with the pre-fork server, the dataset and charts are loaded once and shared by its workers
 if __name__ == '__main__':
-    app.run()
+    import serve
+    serve.serve(sys.modules[__name__])
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import app as movie_app
+import charts
+from DataHelper import read_dataset
+from generate_movie_data import DEFAULT_SEED, generate_movie_data
+from prediction import predict_movie
+
+
+# dataset sizes benchmarked when none are given
+BENCHMARK_SIZES = (1000, 100000, 1000000)
+
+# inputs every run uses so results from different runs line up
+SEARCH_FORM = {
+    'sales_type': 'World',
+    'min_input': '100000000',
+    'max_input': '1000000000',
+    'top_month_movie': 'Dec',
+    'top_genre_movie': 'Action'
+}
+PREDICTION_FORM = {
+    'action': 'Action',
+    'adventure': 'Adventure',
+    'scifi': 'Sci-Fi',
+    'ratings': 'PG-13',
+    'months': 'Dec',
+    'series': 'Star Wars'
+}
+PREDICTION_SCENARIO = (['Action', 'Adventure', 'Sci-Fi'], 'PG-13', 'Dec', 'Star Wars')
+BATCH_SCENARIOS = 1000
+
+
+# runs function repeat times and returns the timings in seconds
+# before runs ahead of every call without being timed, used to empty caches
+def time_call(function, repeat, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "max": max(timings)
+    }
+
+
+# makes a test client request and fails the benchmark if it didn't succeed
+def request_route(client, method, url, **kwargs):
+    response = client.open(url, method=method, **kwargs)
+    if response.status_code != 200:
+        raise RuntimeError('%s %s returned %d' % (method, url, response.status_code))
+    return response
+
+
+def clear_caches():
+    movie_app.prediction_cache.clear()
+    movie_app.chart_cache.clear()
+
+
+# every benchmark for one dataset size, returns {benchmark name: timings}
+def benchmark_dataset(movie_data, repeat):
+    results = {}
+    client = movie_app.app.test_client()
+    movie_app.app.config['MOVIE_DATA'] = movie_data
+
+    # loading is slow at the bigger sizes so it's only done once
+    results['load:read_dataset'] = time_call(lambda: read_dataset(movie_data), 1)
+    results['load:get_dataset'] = time_call(movie_app.get_dataset, 1)
+    dataset = movie_app.get_dataset()
+    cube = dataset.cube
+
+    # routes through the test client, first main page load draws the descriptive charts
+    results['route:GET /:first'] = time_call(lambda: request_route(client, 'GET', '/'), 1)
+    results['route:GET /'] = time_call(lambda: request_route(client, 'GET', '/'), repeat)
+    results['route:POST /search_results'] = time_call(
+        lambda: request_route(client, 'POST', '/search_results', data=SEARCH_FORM), repeat)
+    results['route:POST /prediction_results:uncached'] = time_call(
+        lambda: request_route(client, 'POST', '/prediction_results', data=PREDICTION_FORM), repeat, clear_caches)
+    results['route:POST /prediction_results:cached'] = time_call(
+        lambda: request_route(client, 'POST', '/prediction_results', data=PREDICTION_FORM), repeat)
+
+    genres, rating, month, series = PREDICTION_SCENARIO
+    batch = {"scenarios": [
+        {"genres": genres, "rating": rating, "month": month, "series": series}
+    ] * BATCH_SCENARIOS}
+    results['route:POST /api/predictions:%d' % BATCH_SCENARIOS] = time_call(
+        lambda: request_route(client, 'POST', '/api/predictions', json=batch), repeat)
+
+    results['route:GET /api/years/summary'] = time_call(
+        lambda: request_route(client, 'GET', '/api/years/summary?start=1990&end=2009'), repeat)
+    results['route:GET /api/movies/top'] = time_call(
+        lambda: request_route(client, 'GET', '/api/movies/top?limit=10&month=Dec&genre=Action'), repeat)
+
+    # helpers called directly
+    minimum_sales, maximum_sales = int(SEARCH_FORM['min_input']), int(SEARCH_FORM['max_input'])
+    results['helper:search_movies_by_sales:page'] = time_call(
+        lambda: movie_app.search_movies_by_sales('World', minimum_sales, maximum_sales, 0, 100), repeat)
+    results['helper:search_movies_by_sales:all'] = time_call(
+        lambda: movie_app.search_movies_by_sales('World', minimum_sales, maximum_sales), repeat)
+    results['helper:search_top_movie_in_month'] = time_call(
+        lambda: movie_app.search_top_movie_in_month('Dec'), repeat)
+    results['helper:search_genre_top_sales'] = time_call(
+        lambda: movie_app.search_genre_top_sales('Action'), repeat)
+    results['helper:search_top_movies'] = time_call(
+        lambda: movie_app.search_top_movies('World', 10, month='Dec', genre='Action'), repeat)
+    results['helper:predict_movie'] = time_call(lambda: predict_movie(dataset, *PREDICTION_SCENARIO), repeat)
+
+    # chart data and the charts drawn from it, rendered in this process so only drawing is timed
+    prediction = predict_movie(dataset, *PREDICTION_SCENARIO)
+    chart_jobs = {
+        'sales_by_genre': (movie_app.get_genre_sales_percentages, charts.generate_sales_by_genre_chart),
+        'rank_by_genre': (movie_app.get_genre_rank_points, charts.generate_rank_by_genre_chart),
+        'sales_by_rating': (movie_app.get_rating_percentages, charts.generate_sales_by_rating),
+        'sales_by_month': (movie_app.get_month_sales, charts.generate_sales_by_month)
+    }
+    for chart_name, (data_function, chart_function) in chart_jobs.items():
+        results['helper:%s' % data_function.__name__] = time_call(lambda: data_function(cube), repeat)
+        chart_data = data_function(cube)
+        results['chart:%s' % chart_name] = time_call(lambda: chart_function(chart_data), repeat)
+
+    prediction_charts = {
+        'genre_highest_lowest_sales': (charts.generate_genre_highest_lowest_sales,
+                                       (prediction["GenreSalesComparisons"],)),
+        'series_sales': (charts.generate_series_sales, (series, prediction["SeriesMovies"])),
+        'month_highest_lowest_sales': (charts.generate_month_highest_lowest_sales,
+                                       (prediction["MonthSalesComparisons"],)),
+        'rating_average_sales': (charts.generate_rating_average_sales, (prediction["RatingSalesComparison"],))
+    }
+    for chart_name, (chart_function, chart_data) in prediction_charts.items():
+        results['chart:%s' % chart_name] = time_call(lambda: chart_function(*chart_data), repeat)
+
+    return results
+
+
+# prints how much slower/faster each benchmark got compared to an earlier run's output
+def print_comparison(previous_results, results):
+    previous_medians = {
+        (result["rows"], result["benchmark"]): result["median"] for result in previous_results["results"]
+    }
+    for result in results["results"]:
+        previous_median = previous_medians.get((result["rows"], result["benchmark"]))
+        if previous_median:
+            print('%8d  %-50s %10.4fs  %6.2fx' % (
+                result["rows"], result["benchmark"], result["median"], result["median"] / previous_median))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times routes and helpers against generated datasets.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--data-dir', help='where generated .csv files are kept, reused if already there')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', help='earlier output to compare the medians against')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='movie-benchmark-')
+    os.makedirs(data_dir, exist_ok=True)
+    # descriptive charts get written to the static folder, keep the checked in images untouched
+    movie_app.app.static_folder = tempfile.mkdtemp(prefix='movie-benchmark-static-')
+
+    results = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": []
+    }
+    try:
+        for rows in args.sizes:
+            movie_data = os.path.join(data_dir, 'movies_%d_%d.csv' % (rows, args.seed))
+            if not os.path.exists(movie_data):
+                generate_movie_data(rows, movie_data, args.seed)
+
+            for benchmark, timings in benchmark_dataset(movie_data, args.repeat).items():
+                results["results"].append(dict(rows=rows, benchmark=benchmark, **timings))
+                print('%8d  %-50s %10.4fs' % (rows, benchmark, timings["median"]), file=sys.stderr)
+    finally:
+        movie_app.chart_renderer.shutdown()
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(json.load(file), results)
+
+
+if __name__ == '__main__':
+    main()
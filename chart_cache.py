@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+# keeps rendered chart images in memory, evicting the least recently used ones once the images
+# go over the byte budget
+# with a directory every chart is also written there as <chart key>.png, so processes sharing the directory (like
+# the pre-fork server's workers) can serve charts another one rendered
+# the process that wrote a file deletes it again when it evicts the chart (or clears the cache), so the directory
+# never holds more than the byte budget of each process using it
+class ChartCache:
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        # chart key -> png bytes, most recently used last
+        self.charts = OrderedDict()
+        self.total_bytes = 0
+        # keys of the files in the directory this process wrote
+        self.written_keys = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # returns png bytes for the key, None if it isn't cached
+    def get(self, chart_key):
+        with self.lock:
+            image = self.charts.get(chart_key)
+            if image is not None:
+                self.charts.move_to_end(chart_key)
+                self.hits += 1
+                return image
+
+        # rendered by another process, kept in memory from now on
+        image = self.read_chart_file(chart_key)
+        with self.lock:
+            if image is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self.add(chart_key, image)
+        return image
+
+    def put(self, chart_key, image):
+        self.write_chart_file(chart_key, image)
+        self.add(chart_key, image)
+
+    def add(self, chart_key, image):
+        evicted_keys = []
+        with self.lock:
+            if chart_key in self.charts:
+                self.charts.move_to_end(chart_key)
+                return
+            self.charts[chart_key] = image
+            self.total_bytes += len(image)
+
+            # drop oldest charts until we're back under budget, always keep the one just added
+            while self.total_bytes > self.max_bytes and len(self.charts) > 1:
+                evicted_key, evicted_image = self.charts.popitem(last=False)
+                self.total_bytes -= len(evicted_image)
+                self.evictions += 1
+                evicted_keys.append(evicted_key)
+        self.remove_chart_files(evicted_keys)
+
+    def clear(self):
+        with self.lock:
+            self.charts.clear()
+            self.total_bytes = 0
+            written_keys = list(self.written_keys)
+        self.remove_chart_files(written_keys)
+
+    # a forked process starts out with the charts of its parent but leaves their files to the parent
+    def forget_written_files(self):
+        with self.lock:
+            self.written_keys.clear()
+
+    def __contains__(self, chart_key):
+        with self.lock:
+            if chart_key in self.charts:
+                return True
+        chart_path = self.get_chart_path(chart_key)
+        return chart_path is not None and os.path.exists(chart_path)
+
+    # file a chart is kept in, None without a directory or for keys that aren't a chart key (they come from urls)
+    def get_chart_path(self, chart_key):
+        if self.directory is None or not chart_key.isalnum():
+            return None
+        return os.path.join(self.directory, chart_key + '.png')
+
+    def read_chart_file(self, chart_key):
+        chart_path = self.get_chart_path(chart_key)
+        if chart_path is None:
+            return None
+        try:
+            with open(chart_path, 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    # written to a temporary file first so other processes never read half a chart
+    def write_chart_file(self, chart_key, image):
+        chart_path = self.get_chart_path(chart_key)
+        if chart_path is None or os.path.exists(chart_path):
+            return
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(image)
+        os.replace(temporary_path, chart_path)
+        with self.lock:
+            self.written_keys.add(chart_key)
+
+    # deletes the files of the charts this process wrote, other processes' files are left to them
+    def remove_chart_files(self, chart_keys):
+        for chart_key in chart_keys:
+            with self.lock:
+                if chart_key not in self.written_keys:
+                    continue
+                self.written_keys.discard(chart_key)
+            try:
+                os.remove(self.get_chart_path(chart_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "charts": len(self.charts),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# key for a chart made from its name and the data it's drawn from, same inputs always give the same key
+def get_chart_key(chart_name, chart_data):
+    encoded_data = json.dumps([chart_name, chart_data], separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded_data.encode()).hexdigest()
@@ -0,0 +1,366 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError, wait
+import io
+import multiprocessing
+import signal
+import threading
+import time
+
+import numpy as np
+
+from metrics import record_stage
+
+
+# matplotlib takes a while to import so it's only loaded once the first chart is drawn
+# keeps app and chart worker startup quick
+matplotlib_loaded = False
+matplotlib_lock = threading.Lock()
+
+
+def load_matplotlib():
+    global matplotlib_loaded
+
+    with matplotlib_lock:
+        if matplotlib_loaded:
+            return
+        import matplotlib
+        # charts are only ever saved as png, never shown, so always use the headless backend
+        matplotlib.use('Agg')
+        import matplotlib.style
+        # have to make our graphs look nice
+        # set once per process (in every worker process too), charts never change global state after this
+        matplotlib.style.use('ggplot')
+        matplotlib_loaded = True
+
+
+# every chart is drawn on its own Figure with the Agg canvas, nothing goes through pyplot's
+# global current figure so charts can be drawn at the same time from different threads/processes
+def new_chart():
+    load_matplotlib()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+# seconds charts drawn on this thread have spent in savefig, read back by render_chart()
+savefig_timings = threading.local()
+
+
+# saves chart as png into memory and returns the bytes
+def get_png_bytes(fig):
+    start = time.perf_counter()
+    image = io.BytesIO()
+    fig.savefig(image, format='png')
+    savefig_timings.seconds = getattr(savefig_timings, 'seconds', 0.0) + time.perf_counter() - start
+    return image.getvalue()
+
+
+# runs on a chart worker, returns the png with the seconds spent drawing the chart and saving it as png
+def render_chart(chart_function, chart_data):
+    savefig_timings.seconds = 0.0
+    start = time.perf_counter()
+    image = chart_function(*chart_data)
+    savefig_seconds = savefig_timings.seconds
+    return image, time.perf_counter() - start - savefig_seconds, savefig_seconds
+
+
+# create chart for total sales percentage by genre
+def generate_sales_by_genre_chart(genre_percentages):
+    # Pie chart, where the slices will be ordered and plotted counter-clockwise
+    explode = (0.1, 0, 0, 0, 0, 0)  # only explode 1st slice
+
+    fig, ax = new_chart()
+    # assign values to pie chart plot
+    ax.pie(list(genre_percentages.values()), explode=explode, labels=list(genre_percentages.keys()),
+           autopct='%1.1f%%', shadow=True, startangle=90)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+
+    ax.set_title('Genre Sales Percentage')
+
+    return get_png_bytes(fig)
+
+
+# create chart for genre by weighted rank
+def generate_rank_by_genre_chart(genre_points):
+    fig, ax = new_chart()
+    # horizontal bar chart for this
+    ax.barh(list(genre_points.keys()), list(genre_points.values()))
+    # invert y-axis to show genres in alphabetical order
+    ax.invert_yaxis()
+    # set chart title/labels
+    ax.set_title('Genre Weighted Ranks')
+    ax.set_ylabel('Genre')
+    ax.set_xlabel('Weighted Points')
+    # ensures graph is not cutoff when saved as .png
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# create chart for sales percentage by rating
+def generate_sales_by_rating(rating_percentages):
+    # Pie chart, where the slices will be ordered and plotted counter-clockwise
+    explode = (0, 0, 0.1, 0)  # explode 2nd slice (PG-13)
+
+    fig, ax = new_chart()
+    # assign values to plot for chart generation
+    ax.pie(list(rating_percentages.values()), explode=explode, labels=list(rating_percentages.keys()),
+           autopct='%1.1f%%', shadow=True, startangle=90)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+
+    ax.set_title('Rating Sales Percentage')
+
+    return get_png_bytes(fig)
+
+
+# create chart for total sales by month release
+def generate_sales_by_month(month_sales):
+    x = np.arange(len(month_sales))  # label locations
+    width = 0.4  # the width of the bars
+
+    fig, ax = new_chart()
+    month_bars = ax.bar(x - width / 2, list(month_sales.values()), width)
+
+    # Add some text for labels, title and custom x-axis tick labels, etc.
+    ax.set_ylabel('Total Sales in Billions')
+    ax.set_title('Total Sales By Month')
+    ax.set_xticks(x, list(month_sales.keys()))
+
+    ax.bar_label(month_bars, padding=3)
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# creates chart displaying highest and lowest sales for selected genre(s) alongside the projected movie sales
+def generate_genre_highest_lowest_sales(projected_data):
+    # create plot with data to visual comparisons
+    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
+    width = 0.5  # the width of the bars
+
+    fig, ax = new_chart()
+    comparison_bars = ax.bar(x - width / 2, list(projected_data.values()), width)
+
+    # Add some text for labels, title and custom x-axis tick labels, etc.
+    ax.set_ylabel('Total Sales in Millions')
+    ax.set_title('Genre Highest vs Lowest vs Prediction')
+    ax.set_xticks(x, list(projected_data.keys()))
+
+    ax.bar_label(comparison_bars, padding=3)
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# creates chart for highest/lowest/projected sales for chose release month
+def generate_month_highest_lowest_sales(projected_data):
+    # create plot with data to visual comparisons
+    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
+    width = 0.3  # the width of the bars
+
+    fig, ax = new_chart()
+    comparison_bars = ax.bar(x - width / 2, list(projected_data.values()), width)
+
+    # Add some text for labels, title and custom x-axis tick labels, etc.
+    ax.set_ylabel('Total Sales in Millions')
+    ax.set_title('Release Month Highest vs Lowest vs Prediction')
+    ax.set_xticks(x, list(projected_data.keys()))
+
+    ax.bar_label(comparison_bars, padding=3)
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# creates chart for sales of all movies in chosen series with projected sales for this movie
+def generate_series_sales(series_selection, projected_data):
+    fig, ax = new_chart()
+    # create chart for series comparisons (horizontal bar chart)
+    ax.barh(list(projected_data.keys()), list(projected_data.values()))
+    # invert y-axis to show genres in alphabetical order
+    ax.invert_yaxis()
+    # set chart title/labels
+    if series_selection != 'None':
+        ax.set_title('Series Sales Comparisons')
+    else:
+        # chart will be blank if no series chosen
+        ax.set_title('No Series Data to Display')
+
+    ax.set_ylabel('Title')
+    ax.set_xlabel('World Sales in Millions')
+    # ensures graph is not cutoff when saved as .png
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# create chart for average sales of movies of each rating alongside projected sales of this movie
+def generate_rating_average_sales(projected_data):
+    # horizontal chart for sales for each rating
+    # create plot with data to visual comparisons
+    x = np.arange(len(projected_data))  # label locations for high, low, and prediction
+    width = 0.4  # the width of the bars
+
+    fig, ax = new_chart()
+    comparison_bars = ax.bar(x - width / 2, list(projected_data.values()), width)
+
+    # Add some text for labels, title and custom x-axis tick labels, etc.
+    ax.set_ylabel('Average Sales in Millions')
+    ax.set_title('Average Sales By Rating')
+    ax.set_xticks(x, list(projected_data.keys()))
+
+    ax.bar_label(comparison_bars, padding=3)
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# creates heatmap of projected world sales for every release month and rating combination
+def generate_sales_heatmap(series_selection, months, ratings, projected_sales):
+    fig, ax = new_chart()
+    fig.set_size_inches(6.4, 7.2)
+    heatmap = ax.imshow(projected_sales, cmap='viridis', aspect='auto')
+
+    # label every cell with its projected sales
+    for month in range(len(months)):
+        for rating in range(len(ratings)):
+            ax.text(rating, month, projected_sales[month][rating], ha='center', va='center', color='w', fontsize=8)
+
+    ax.set_xticks(np.arange(len(ratings)), ratings)
+    ax.set_yticks(np.arange(len(months)), months)
+    ax.grid(False)
+    if series_selection != 'None':
+        ax.set_title('Projected World Sales in Millions (%s)' % series_selection)
+    else:
+        ax.set_title('Projected World Sales in Millions')
+    ax.set_xlabel('Rating')
+    ax.set_ylabel('Release Month')
+    fig.colorbar(heatmap, ax=ax)
+    fig.tight_layout()
+
+    return get_png_bytes(fig)
+
+
+# image shown in place of a chart that failed or took too long to render
+def generate_placeholder_chart():
+    fig, ax = new_chart()
+    ax.axis('off')
+    ax.text(0.5, 0.5, 'Chart unavailable, try again shortly', ha='center', va='center', fontsize=14)
+
+    return get_png_bytes(fig)
+
+
+# loads matplotlib and draws a chart with text so the font cache and glyphs are ready before the first request
+def warm_up():
+    generate_placeholder_chart()
+
+
+# ctrl+c reaches the chart worker processes too, leave stopping them to the process that started them
+def ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# renders the independent charts of a request at the same time on a pool of workers
+# worker processes are used by default so rendering isn't held back by the GIL
+# with 0 workers charts are drawn on the calling thread without starting a pool
+class ChartRenderer:
+
+    def __init__(self, workers, timeout, use_processes=True):
+        self.workers = workers
+        # seconds a whole batch of charts gets before unfinished ones are replaced by the placeholder
+        self.timeout = timeout
+        self.use_processes = use_processes
+        # pool is only started on first use so importing the app stays cheap
+        self.executor = None
+        self.placeholder = None
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.failed = 0
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                if self.use_processes:
+                    # spawn so workers don't inherit the threads/locks of a running web server
+                    self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                        initializer=ignore_interrupts)
+                else:
+                    self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='chart-renderer')
+            return self.executor
+
+    def get_placeholder(self):
+        with self.lock:
+            if self.placeholder is None:
+                self.placeholder = generate_placeholder_chart()
+            return self.placeholder
+
+    # chart_jobs is a list of (chart function, chart function arguments)
+    # returns png bytes for each job in the same order, None for jobs that failed or timed out
+    def render_all(self, chart_jobs):
+        if not chart_jobs:
+            return []
+
+        if self.workers == 0:
+            # no pool, charts are drawn one after another on the calling thread
+            results = []
+            for chart_function, chart_data in chart_jobs:
+                try:
+                    results.append(render_chart(chart_function, chart_data))
+                except Exception:
+                    results.append(None)
+        else:
+            executor = self.get_executor()
+            futures = [
+                executor.submit(render_chart, chart_function, chart_data) for chart_function, chart_data in chart_jobs
+            ]
+            wait(futures, timeout=self.timeout)
+
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=0))
+                except (TimeoutError, Exception):
+                    # don't leave a chart nobody is waiting for in the queue
+                    future.cancel()
+                    results.append(None)
+
+        images = []
+        draw_seconds = 0.0
+        savefig_seconds = 0.0
+        for result in results:
+            if result is None:
+                images.append(None)
+                continue
+            image, chart_draw_seconds, chart_savefig_seconds = result
+            images.append(image)
+            draw_seconds += chart_draw_seconds
+            savefig_seconds += chart_savefig_seconds
+
+        # time the workers spent on the request's charts, added up over all of them
+        record_stage('chart_draw', draw_seconds)
+        record_stage('chart_savefig', savefig_seconds)
+
+        with self.lock:
+            self.failed += images.count(None)
+            self.rendered += len(images) - images.count(None)
+        return images
+
+    # starts the workers and warms each of them up so the first charts don't pay for it
+    def warm_up(self):
+        self.get_placeholder()
+        if self.workers == 0:
+            return
+        executor = self.get_executor()
+        wait([executor.submit(warm_up) for _ in range(self.workers)], timeout=self.timeout)
+
+    # renders a single chart the same way
+    def render(self, chart_function, *chart_data):
+        return self.render_all([(chart_function, chart_data)])[0]
+
+    def shutdown(self, wait=False):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=wait, cancel_futures=True)
+                self.executor = None
@@ -0,0 +1,98 @@
+import csv
+import sys
+
+import numpy as np
+
+from movie_store import GENRES, MONTHS
+from sales_cube import RATINGS
+from series_index import SERIES
+
+
+# same seed always writes the exact same file so benchmark runs can be compared
+DEFAULT_SEED = 918
+
+DISTRIBUTORS = (
+    'Warner Bros.', 'Walt Disney Studios Motion Pictures', 'Universal Pictures', 'Twentieth Century Fox',
+    'Sony Pictures Entertainment (SPE)', 'Paramount Pictures', 'New Line Cinema', 'DreamWorks', 'Lionsgate',
+    'Metro-Goldwyn-Mayer (MGM)', 'TriStar Pictures', 'Columbia Pictures'
+)
+# roughly how often each distributor and rating shows up in movie_data.csv
+DISTRIBUTOR_WEIGHTS = (156, 153, 119, 115, 101, 99, 21, 21, 19, 11, 9, 9)
+RATING_WEIGHTS = (42, 228, 424, 224)
+
+# share of movies without a release date, and share of titles that continue a series
+MISSING_DATE_RATE = 0.13
+SERIES_RATE = 0.02
+
+
+# writes a .csv with the same columns and value formats as movie_data.csv
+# run as: python generate_movie_data.py rows output.csv [seed]
+def generate_movie_data(rows, output, seed=DEFAULT_SEED):
+    random = np.random.default_rng(seed)
+
+    # world sales go from highest to lowest like the real dataset since rank is the position
+    world_sales = np.sort(random.lognormal(18.8, 0.8, rows).astype(np.int64) + 1000000)[::-1]
+    domestic_sales = (world_sales * random.uniform(0.2, 0.7, rows)).astype(np.int64)
+    international_sales = world_sales - domestic_sales
+
+    years = random.integers(1975, 2022, rows)
+    months = random.integers(0, len(MONTHS), rows)
+    days = random.integers(1, 29, rows)
+    missing_dates = random.random(rows) < MISSING_DATE_RATE
+
+    # 1 to 4 genres per movie, listed alphabetically like the dataset does
+    genre_amounts = random.integers(1, 5, rows)
+    genre_picks = np.argsort(random.random((rows, len(GENRES))), axis=1)
+
+    distributors = random.choice(len(DISTRIBUTORS), rows, p=get_probabilities(DISTRIBUTOR_WEIGHTS))
+    ratings = random.choice(len(RATINGS), rows, p=get_probabilities(RATING_WEIGHTS))
+    runtimes = random.integers(75, 200, rows)
+
+    series_names = sorted(SERIES)
+    continues_series = random.random(rows) < SERIES_RATE
+    series_picks = random.integers(0, len(series_names), rows)
+
+    with open(output, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Rank', 'Title', 'Distributor', 'ReleaseDate', 'DomesticSales', 'InternationalSales',
+                         'WorldSales', 'Genre', 'Runtime', 'Rating'])
+        for movie in range(rows):
+            if continues_series[movie]:
+                title = '%s: Chapter %d (%d)' % (series_names[series_picks[movie]], movie, years[movie])
+            else:
+                title = 'Synthetic Movie %d (%d)' % (movie, years[movie])
+
+            if missing_dates[movie]:
+                release_date = 'NA'
+            else:
+                release_date = '%d-%s-%02d' % (days[movie], MONTHS[months[movie]], years[movie] % 100)
+
+            genres = sorted(GENRES[genre] for genre in genre_picks[movie, :genre_amounts[movie]])
+            hours, minutes = divmod(int(runtimes[movie]), 60)
+
+            writer.writerow([
+                movie,
+                title,
+                DISTRIBUTORS[distributors[movie]],
+                release_date,
+                domestic_sales[movie],
+                international_sales[movie],
+                world_sales[movie],
+                str(genres),
+                '%d hr %d min' % (hours, minutes) if minutes else '%d hr' % hours,
+                RATINGS[ratings[movie]]
+            ])
+
+    return output
+
+
+def get_probabilities(weights):
+    weights = np.array(weights, dtype=float)
+    return weights / weights.sum()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('usage: python generate_movie_data.py rows output.csv [seed]')
+        sys.exit(1)
+    generate_movie_data(int(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_SEED)
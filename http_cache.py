@@ -0,0 +1,126 @@
+from collections import OrderedDict
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    # responses are only gzipped without the brotli package
+    brotli = None
+
+
+# max-age of urls that change whenever their contents do, like charts and static files with ?v=
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# responses worth compressing, images are already compressed
+COMPRESSIBLE_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript', 'application/json',
+    'image/svg+xml'
+)
+# smaller bodies don't get any smaller once compressed
+MIN_COMPRESSED_BYTES = 256
+
+# encodings responses can be compressed with, best first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+# strong etag from the things a response is made from, same parts always give the same etag
+def get_etag(*parts):
+    return hashlib.sha1('\0'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+# each encoding of a response is a different representation so it gets its own etag
+def get_variant_etag(etag, encoding):
+    return '%s-%s' % (etag, encoding) if encoding else etag
+
+
+# encoding to send a body of this type and size with, None to send it as it is
+def get_response_encoding(accept_encodings, mimetype, size):
+    if mimetype not in COMPRESSIBLE_MIMETYPES or size < MIN_COMPRESSED_BYTES:
+        return None
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    # mtime of 0 so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+# compressed copies of response bodies keyed by their etag, a body is only compressed the first time it's sent
+# with each encoding, least recently used ones are dropped once they go over the byte budget
+class CompressedVariants:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        # (etag, encoding) -> compressed body, most recently used last
+        self.variants = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag, encoding, body):
+        key = (etag, encoding)
+        with self.lock:
+            variant = self.variants.get(key)
+            if variant is not None:
+                self.variants.move_to_end(key)
+                self.hits += 1
+                return variant
+            self.misses += 1
+
+        # compressed outside the lock, two requests might both compress the same body the first time
+        variant = compress(body, encoding)
+        with self.lock:
+            if key not in self.variants:
+                self.variants[key] = variant
+                self.total_bytes += len(variant)
+            while self.total_bytes > self.max_bytes and len(self.variants) > 1:
+                _, evicted_variant = self.variants.popitem(last=False)
+                self.total_bytes -= len(evicted_variant)
+        return variant
+
+    def stats(self):
+        with self.lock:
+            return {
+                "variants": len(self.variants),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# contents and content hash of files read from disk, a file is only read again when its mtime/size change
+class FileVersions:
+
+    def __init__(self):
+        # path -> ((mtime, size), version, contents)
+        self.files = {}
+        self.lock = threading.Lock()
+
+    # (version, contents) of the file, None if it doesn't exist
+    def get(self, path):
+        try:
+            file_stats = os.stat(path)
+        except OSError:
+            return None
+        file_stats = (file_stats.st_mtime_ns, file_stats.st_size)
+
+        with self.lock:
+            cached_file = self.files.get(path)
+        if cached_file is not None and cached_file[0] == file_stats:
+            return cached_file[1], cached_file[2]
+
+        try:
+            with open(path, 'rb') as file:
+                contents = file.read()
+        except OSError:
+            return None
+        version = hashlib.sha1(contents).hexdigest()
+        with self.lock:
+            self.files[path] = (file_stats, version, contents)
+        return version, contents
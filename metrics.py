@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+
+# upper bounds in seconds of the latency histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (stage name, seconds) of every timed stage of the request being handled, None when nothing is being recorded
+# each thread/request has its own so stages never end up on another request
+request_stages = contextvars.ContextVar('request_stages', default=None)
+
+
+# starts collecting stage timings for the current request, returns token for stop_recording()
+def start_recording():
+    return request_stages.set([])
+
+
+# stops collecting and returns the stages recorded since start_recording()
+def stop_recording(token):
+    stages = request_stages.get()
+    request_stages.reset(token)
+    return stages or []
+
+
+# times the code inside the with block as a stage of the current request
+# only costs a context variable lookup when nothing is being recorded
+@contextmanager
+def stage(name):
+    stages = request_stages.get()
+    if stages is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages.append((name, time.perf_counter() - start))
+
+
+# adds a stage that was timed somewhere else (like a chart worker process) to the current request
+def record_stage(name, seconds):
+    stages = request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+# adds up the time of stages with the same name, keeping the order they first ran in
+def get_stage_totals(stages):
+    totals = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+
+# counters and latency histograms collected in this process, printed in Prometheus text format
+class Metrics:
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # (metric name, labels) -> value, labels are a tuple of (label, value) pairs
+        self.counters = {}
+        # (metric name, labels) -> [count in each bucket..., sum of observations, amount of observations]
+        self.histograms = {}
+
+    def increment(self, name, labels=(), amount=1):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, labels=()):
+        with self.lock:
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for bucket, upper_bound in enumerate(self.buckets):
+                if seconds <= upper_bound:
+                    histogram[bucket] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    # records how long a request took in total and in each of its stages
+    def observe_request(self, route, method, status, seconds, stages):
+        labels = (('route', route), ('method', method))
+        self.increment('movie_requests_total', labels + (('status', str(status)),))
+        self.observe('movie_request_duration_seconds', seconds, labels)
+        for stage_name, stage_seconds in get_stage_totals(stages).items():
+            self.observe('movie_request_stage_duration_seconds', stage_seconds,
+                         (('route', route), ('stage', stage_name)))
+
+    # text for the /metrics endpoint
+    # extra_counters/extra_gauges are lists of (metric name, help text, value) read from the app when scraped
+    def render(self, extra_counters=(), extra_gauges=()):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: list(histogram) for key, histogram in self.histograms.items()}
+
+        lines = []
+        for name, help_text, value in extra_counters:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s counter' % name)
+            lines.append('%s %s' % (name, format_value(value)))
+        for name, help_text, value in extra_gauges:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s gauge' % name)
+            lines.append('%s %s' % (name, format_value(value)))
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append('# TYPE %s counter' % name)
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append('# TYPE %s histogram' % name)
+            for (histogram_name, labels), histogram in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                for upper_bound, count in zip(self.buckets, histogram):
+                    lines.append('%s_bucket%s %d' % (
+                        name, format_labels(labels + (('le', format_value(upper_bound)),)), count))
+                lines.append('%s_bucket%s %d' % (name, format_labels(labels + (('le', '+Inf'),)), histogram[-1]))
+                lines.append('%s_sum%s %s' % (name, format_labels(labels), format_value(histogram[-2])))
+                lines.append('%s_count%s %d' % (name, format_labels(labels), histogram[-1]))
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (label, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for label, value in labels
+    )
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Server-Timing header value with each stage in milliseconds, total is the whole request
+def get_server_timing(stages, seconds):
+    timings = ['%s;dur=%.2f' % (name, stage_seconds * 1000) for name, stage_seconds in get_stage_totals(stages).items()]
+    timings.append('total;dur=%.2f' % (seconds * 1000))
+    return ', '.join(timings)
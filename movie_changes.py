@@ -0,0 +1,221 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on this platform, only threads of this process are kept apart
+    fcntl = None
+
+import numpy as np
+
+from movie import Movie
+from movie_store import GENRES, format_runtime, parse_genres, parse_release_date, parse_runtime
+
+
+# columns of the .csv in order, every change is kept as one of these rows
+MOVIE_DATA_HEADER = ('Rank', 'Title', 'Distributor', 'ReleaseDate', 'DomesticSales', 'InternationalSales',
+                     'WorldSales', 'Genre', 'Runtime', 'Rating')
+
+# json fields of a movie in the movie api
+MOVIE_TEXT_FIELDS = ('title', 'distributor', 'rating')
+MOVIE_SALES_FIELDS = ('domestic_sales', 'international_sales', 'world_sales')
+
+# largest values a movie can have, runtime minutes are kept as int16 and rank as int64 in the store
+# sales are int64 too but are capped lower so totals over every movie still fit
+MAX_RUNTIME_MINUTES = int(np.iinfo(np.int16).max)
+MAX_RANK = int(np.iinfo(np.int64).max)
+MAX_SALES = 10 ** 15
+
+
+# changes are kept next to the .csv until they're compacted into it, movie_data.csv -> movie_data.changes
+def get_change_log_path(movie_data):
+    return os.path.splitext(movie_data)[0] + '.changes'
+
+
+# append only file of movies added/updated through the api since the .csv was last written
+# first line is {"base_version": hash of the .csv the changes go on top of}, then one change per line:
+# {"row": row the movie replaces (amount of movies to add it on the end), "movie": [.csv fields]}
+# a log whose base_version isn't the current .csv was already compacted into it and gets ignored
+class ChangeLog:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.thread_lock = threading.Lock()
+
+    # keeps other threads and processes from writing the log (or the .csv) at the same time
+    @contextmanager
+    def locked(self):
+        with self.thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # (mtime, size) of the log, None if there isn't one
+    def get_stats(self):
+        try:
+            file_stats = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return file_stats.st_mtime_ns, file_stats.st_size
+
+    # changes for base_version from byte offset on, and the offset to read the next ones from
+    # a line still being written by someone else is left for the next read
+    # changes are None when the log was already compacted into a newer .csv than base_version
+    def read(self, base_version, offset=0):
+        try:
+            with open(self.path, 'rb') as file:
+                header = file.readline()
+                if not header.endswith(b'\n'):
+                    return [], offset
+                if json.loads(header)["base_version"] != base_version:
+                    return None, offset
+                offset = max(offset, len(header))
+                file.seek(offset)
+                changes = []
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break
+                    changes.append(json.loads(line))
+                    offset += len(line)
+                return changes, offset
+        except FileNotFoundError:
+            return [], offset
+
+    # writes the change to disk before it's applied anywhere, returns the offset after it
+    def append(self, base_version, change):
+        with open(self.path, 'ab') as file:
+            if file.tell() == 0:
+                file.write(encode_change({"base_version": base_version}))
+            file.write(encode_change(change))
+            file.flush()
+            os.fsync(file.fileno())
+            return file.tell()
+
+    # starts a new empty log on top of the .csv with base_version
+    def reset(self, base_version):
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(encode_change({"base_version": base_version}))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+
+# api fields that don't make a valid movie, errors has every problem found
+class InvalidMovieError(ValueError):
+
+    def __init__(self, errors):
+        super().__init__('invalid movie: %s' % '; '.join(errors))
+        self.errors = errors
+
+
+def encode_change(change):
+    return json.dumps(change, separators=(',', ':')).encode() + b'\n'
+
+
+# version of a dataset after the change, same change on the same version always gives the same version
+# so every process replaying the log ends up with the same versions
+def get_change_version(version, change):
+    return hashlib.sha1(version.encode() + encode_change(change)).hexdigest()
+
+
+# .csv fields of a Movie/MovieRow
+def get_movie_fields(movie):
+    return [
+        str(movie.rank),
+        movie.title,
+        movie.distributor,
+        movie.release_date,
+        str(movie.domestic_sales),
+        str(movie.international_sales),
+        str(movie.world_sales),
+        movie.genre,
+        movie.runtime,
+        movie.rating
+    ]
+
+
+# movie as it's shown in the movie api
+def get_movie_json(movie):
+    release_date = parse_release_date(movie.release_date)
+    runtime = parse_runtime(movie.runtime)
+    return {
+        "rank": movie.rank,
+        "title": movie.title,
+        "distributor": movie.distributor,
+        "release_date": movie.release_date if release_date else None,
+        "domestic_sales": movie.domestic_sales,
+        "international_sales": movie.international_sales,
+        "world_sales": movie.world_sales,
+        "genres": parse_genres(movie.genre),
+        "runtime": runtime if runtime >= 0 else None,
+        "rating": movie.rating
+    }
+
+
+# Movie from api fields laid over the current movie's (None when adding one), returns (Movie, list of problems)
+# world sales are domestic + international unless they're given, rank None is filled in with the movie's row
+def get_changed_movie(fields, current=None):
+    movie = dict(current or {"rank": None, "release_date": None, "runtime": None})
+    movie.update(fields)
+    if 'world_sales' not in fields and ('domestic_sales' in fields or 'international_sales' in fields):
+        movie.pop('world_sales', None)
+
+    errors = []
+    for name in MOVIE_TEXT_FIELDS:
+        if not isinstance(movie.get(name), str) or not movie[name].strip():
+            errors.append('%s must be a non-empty string' % name)
+    for name in MOVIE_SALES_FIELDS:
+        if name == 'world_sales' and name not in movie:
+            continue
+        if not is_whole_number(movie.get(name)) or not 0 <= movie[name] <= MAX_SALES:
+            errors.append('%s must be a whole number from 0 to %d' % (name, MAX_SALES))
+    # world sales can be more than domestic + international (re-releases etc.) but never less than either of them
+    if 'world_sales' in fields and not errors and \
+            movie['world_sales'] < max(movie['domestic_sales'], movie['international_sales']):
+        errors.append('world_sales must not be less than domestic_sales or international_sales')
+    if movie['rank'] is not None and (not is_whole_number(movie['rank']) or not -MAX_RANK <= movie['rank'] <= MAX_RANK):
+        errors.append('rank must be a whole number from %d to %d' % (-MAX_RANK, MAX_RANK))
+    if movie['release_date'] is not None and (
+            not isinstance(movie['release_date'], str) or parse_release_date(movie['release_date']) is None):
+        errors.append('release_date must look like 16-Dec-15')
+    genres = movie.get('genres')
+    if not isinstance(genres, list) or not genres:
+        errors.append('genres must be a non-empty list')
+    elif any(genre not in GENRES for genre in genres):
+        errors.append('unknown genre in %s' % genres)
+    elif len(set(genres)) != len(genres):
+        errors.append('genres must not repeat')
+    if movie['runtime'] is not None and (
+            not is_whole_number(movie['runtime']) or not 0 < movie['runtime'] <= MAX_RUNTIME_MINUTES):
+        errors.append('runtime must be a whole number of minutes from 1 to %d' % MAX_RUNTIME_MINUTES)
+    if errors:
+        return None, errors
+
+    return Movie(
+        movie['rank'],
+        movie['title'],
+        movie['distributor'],
+        movie['release_date'] or 'NA',
+        movie['domestic_sales'],
+        movie['international_sales'],
+        movie.get('world_sales', movie['domestic_sales'] + movie['international_sales']),
+        str(genres),
+        format_runtime(movie['runtime'] if movie['runtime'] is not None else -1),
+        movie['rating']
+    ), []
+
+
+def is_whole_number(value):
+    return isinstance(value, int) and not isinstance(value, bool)
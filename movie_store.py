@@ -0,0 +1,564 @@
+from datetime import date, datetime
+import re
+
+import numpy as np
+
+
+# every genre that can appear in a movie's genre list, position in this tuple is the genre's bit
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family', 'Fantasy',
+    'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller', 'War', 'Western'
+)
+GENRE_BITS = {genre: 1 << bit for bit, genre in enumerate(GENRES)}
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# maps sales type options from the search form to the column holding those sales
+SALES_TYPES = {
+    'Domestic': 'domestic_sales',
+    'International': 'international_sales',
+    'World': 'world_sales'
+}
+
+INT64_LIMIT = 2 ** 62
+
+# one array per movie for each of these MovieStore attributes
+STORE_COLUMNS = (
+    'rank', 'domestic_sales', 'international_sales', 'world_sales', 'titles', 'genres', 'genre_masks', 'rating_codes',
+    'distributor_codes', 'release_dates', 'release_months', 'runtime_minutes'
+)
+
+# release year indexes of a MovieStore, one entry per year instead of per movie
+YEAR_COLUMNS = ('year_order', 'release_years', 'year_starts', 'year_top_rows')
+
+RUNTIME_HOURS = re.compile(r'(\d+)\s*hr')
+RUNTIME_MINUTES = re.compile(r'(\d+)\s*min')
+# titles end with the year the movie came out, e.g. Star Wars: Episode VII - The Force Awakens (2015)
+TITLE_YEAR = re.compile(r'\((\d{4})\)\s*$')
+
+
+# column based copy of the dataset, every field is converted once when the store is built
+# so requests can filter and aggregate with numpy instead of looping over Movie objects
+class MovieStore:
+
+    def __init__(self, movies, build_indexes=True):
+        self.size = len(movies)
+
+        # numbers get converted once here instead of int() on every use
+        self.rank = np.array([int(movie.rank) for movie in movies], dtype=np.int64)
+        self.domestic_sales = np.array([int(movie.domestic_sales) for movie in movies], dtype=np.int64)
+        self.international_sales = np.array([int(movie.international_sales) for movie in movies], dtype=np.int64)
+        self.world_sales = np.array([int(movie.world_sales) for movie in movies], dtype=np.int64)
+
+        # text kept as numpy string arrays so substring checks can run over the whole column
+        self.titles = np.array([movie.title for movie in movies], dtype=str)
+        self.genres = np.array([movie.genre for movie in movies], dtype=str)
+
+        # genre lists parsed once into one bit per genre
+        self.genre_masks = np.array([genres_to_mask(parse_genres(movie.genre)) for movie in movies], dtype=np.uint32)
+
+        # ratings and distributors only have a handful of values so store a small code per movie
+        self.rating_names, self.rating_codes = encode_categories([movie.rating for movie in movies])
+        self.distributor_names, self.distributor_codes = encode_categories([movie.distributor for movie in movies])
+
+        # release dates parsed to real dates, NaT/0 for movies without a release date
+        release_dates = [parse_release_date(movie.release_date, movie.title) for movie in movies]
+        self.release_dates = np.array(release_dates, dtype='datetime64[D]')
+        self.release_months = np.array([date.month if date else 0 for date in release_dates], dtype=np.int8)
+
+        # runtime in minutes, -1 if missing
+        self.runtime_minutes = np.array([parse_runtime(movie.runtime) for movie in movies], dtype=np.int16)
+
+        # chunks of a streamed .csv skip the indexes, they're built once the chunks are joined
+        if build_indexes:
+            self.build_indexes()
+
+    def build_indexes(self):
+        # row ids ordered from highest to lowest sales for each sales type so range searches can binary search
+        self.sales_order = {}
+        self.sales_keys = {}
+        for sales_type in SALES_TYPES:
+            sales = self.sales(sales_type)
+            order = np.argsort(-sales, kind='stable')
+            self.sales_order[sales_type] = order
+            # sales negated so the keys go from lowest to highest like searchsorted needs
+            self.sales_keys[sales_type] = -sales[order]
+
+        # sorted row ids of the movies that have each genre
+        self.genre_index = {
+            genre: np.flatnonzero(self.genre_masks & GENRE_BITS[genre]) for genre in GENRES
+        }
+        # sorted row ids of the movies released in each month
+        self.month_index = {
+            month: np.flatnonzero(self.release_months == position + 1) for position, month in enumerate(MONTHS)
+        }
+
+        # movies with a release date grouped by release year, row ids of one year are in row order
+        # year_starts[i]:year_starts[i + 1] is where the movies of release_years[i] are in year_order
+        dated_rows = np.flatnonzero(~np.isnat(self.release_dates))
+        dated_years = self.release_dates[dated_rows].astype('datetime64[Y]').astype(np.int64) + 1970
+        self.year_order = dated_rows[np.argsort(dated_years, kind='stable')]
+        self.release_years, year_counts = np.unique(dated_years, return_counts=True)
+        self.year_starts = np.concatenate(([0], np.cumsum(year_counts)))
+
+        # running total of each sales type over the years, total between two years is a difference of two entries
+        self.year_sales_cumsum = {}
+        for sales_type in SALES_TYPES:
+            year_sales = np.add.reduceat(self.sales(sales_type)[self.year_order], self.year_starts[:-1]) \
+                if len(self.year_order) else np.zeros(0, dtype=np.int64)
+            self.year_sales_cumsum[sales_type] = np.concatenate(([0], np.cumsum(year_sales)))
+
+        # movie with the highest world sales in each year, first one in the dataset wins ties
+        top_first = np.lexsort((self.year_order, -self.world_sales[self.year_order],
+                                np.repeat(self.release_years, year_counts)))
+        self.year_top_rows = self.year_order[top_first][self.year_starts[:-1]]
+
+    # builds a store straight from arrays made by get_columns(), nothing gets parsed or sorted again
+    # arrays can be memory mapped from a snapshot file, the store never writes to them
+    @classmethod
+    def from_columns(cls, columns, string_table):
+        store = cls.__new__(cls)
+        store.size = len(columns['rank'])
+        for name in STORE_COLUMNS:
+            setattr(store, name, columns[name])
+        store.sales_order = {sales_type: columns['sales_order:' + sales_type] for sales_type in SALES_TYPES}
+        store.sales_keys = {sales_type: columns['sales_keys:' + sales_type] for sales_type in SALES_TYPES}
+        store.genre_index = {genre: columns['genre_index:' + genre] for genre in GENRES}
+        store.month_index = {month: columns['month_index:' + month] for month in MONTHS}
+        for name in YEAR_COLUMNS:
+            setattr(store, name, columns[name])
+        store.year_sales_cumsum = {
+            sales_type: columns['year_sales_cumsum:' + sales_type] for sales_type in SALES_TYPES
+        }
+        store.rating_names = list(string_table['rating_names'])
+        store.distributor_names = list(string_table['distributor_names'])
+        return store
+
+    # joins stores of consecutive chunks of movies into one store with indexes over all of them
+    # with release_parts the chunks give up each column as soon as it's joined, so only one column is ever held
+    # twice instead of the whole dataset, the chunk stores can't be used afterwards
+    @classmethod
+    def concatenate(cls, stores, release_parts=False):
+        if not stores:
+            return cls([])
+
+        store = cls.__new__(cls)
+        store.size = sum(len(part) for part in stores)
+        for name in STORE_COLUMNS:
+            if name not in ('rating_codes', 'distributor_codes'):
+                setattr(store, name, np.concatenate([getattr(part, name) for part in stores]))
+                if release_parts:
+                    for part in stores:
+                        delattr(part, name)
+        # each chunk numbered its own ratings/distributors so the codes have to be redone
+        store.rating_names, store.rating_codes = merge_categories(
+            [(part.rating_names, part.rating_codes) for part in stores])
+        store.distributor_names, store.distributor_codes = merge_categories(
+            [(part.distributor_names, part.distributor_codes) for part in stores])
+        if release_parts:
+            for part in stores:
+                del part.rating_codes, part.distributor_codes
+        store.build_indexes()
+        return store
+
+    # copy of the store with the movie in row replaced, or added at the end when row is the store's size
+    # movie is a store with just that one movie in it
+    # columns are copied so requests still holding this store never see the change, but nothing gets parsed or
+    # sorted again: every index is patched with binary searches for just the movie that changed
+    def updated(self, row, movie):
+        store = MovieStore.__new__(MovieStore)
+        replacing = row < self.size
+        store.size = self.size + (not replacing)
+        for name in STORE_COLUMNS:
+            if name not in ('rating_codes', 'distributor_codes'):
+                setattr(store, name, updated_column(getattr(self, name), row, getattr(movie, name)[0]))
+        # names the store hasn't seen yet go on the end so the codes of every other movie stay the same
+        store.rating_names, rating_code = add_category(self.rating_names, movie.rating_names[movie.rating_codes[0]])
+        store.rating_codes = updated_column(self.rating_codes, row, rating_code)
+        store.distributor_names, distributor_code = add_category(
+            self.distributor_names, movie.distributor_names[movie.distributor_codes[0]])
+        store.distributor_codes = updated_column(self.distributor_codes, row, distributor_code)
+
+        store.sales_order = {}
+        store.sales_keys = {}
+        for sales_type in SALES_TYPES:
+            order, keys = self.sales_order[sales_type], self.sales_keys[sales_type]
+            if replacing:
+                order, keys = remove_sales_key(order, keys, row, -self.sales(sales_type)[row])
+            store.sales_order[sales_type], store.sales_keys[sales_type] = insert_sales_key(
+                order, keys, row, -store.sales(sales_type)[row])
+
+        old_genre_mask = int(self.genre_masks[row]) if replacing else 0
+        new_genre_mask = int(store.genre_masks[row])
+        store.genre_index = dict(self.genre_index)
+        for genre in GENRES:
+            if old_genre_mask & GENRE_BITS[genre] and not new_genre_mask & GENRE_BITS[genre]:
+                store.genre_index[genre] = remove_sorted(self.genre_index[genre], row)
+            elif new_genre_mask & GENRE_BITS[genre] and not old_genre_mask & GENRE_BITS[genre]:
+                store.genre_index[genre] = insert_sorted(self.genre_index[genre], row)
+
+        old_month = int(self.release_months[row]) if replacing else 0
+        new_month = int(store.release_months[row])
+        store.month_index = dict(self.month_index)
+        if old_month != new_month:
+            if old_month:
+                store.month_index[MONTHS[old_month - 1]] = remove_sorted(self.month_index[MONTHS[old_month - 1]], row)
+            if new_month:
+                store.month_index[MONTHS[new_month - 1]] = insert_sorted(self.month_index[MONTHS[new_month - 1]], row)
+
+        store.update_years(self, row)
+        return store
+
+    # patches the year indexes copied from old_store for the movie in row, only the one or two years the movie
+    # was/is released in are touched, running totals are redone from the per-year totals (one entry per year)
+    def update_years(self, old_store, row):
+        self.year_order = old_store.year_order
+        self.release_years = old_store.release_years
+        self.year_starts = old_store.year_starts
+        self.year_top_rows = old_store.year_top_rows
+        year_sales = {sales_type: np.diff(cumsum) for sales_type, cumsum in old_store.year_sales_cumsum.items()}
+
+        old_year = get_release_year(old_store.release_dates[row]) if row < old_store.size else None
+        if old_year is not None:
+            year = int(np.searchsorted(self.release_years, old_year))
+            start, end = self.year_starts[year], self.year_starts[year + 1]
+            self.year_order = np.delete(
+                self.year_order, start + np.searchsorted(self.year_order[start:end], row))
+            self.year_starts = self.year_starts.copy()
+            self.year_starts[year + 1:] -= 1
+            for sales_type in SALES_TYPES:
+                year_sales[sales_type][year] -= old_store.sales(sales_type)[row]
+            # last movie of the year is gone
+            if start + 1 == end:
+                self.release_years = np.delete(self.release_years, year)
+                self.year_starts = np.delete(self.year_starts, year + 1)
+                self.year_top_rows = np.delete(self.year_top_rows, year)
+                for sales_type in SALES_TYPES:
+                    year_sales[sales_type] = np.delete(year_sales[sales_type], year)
+
+        new_year = get_release_year(self.release_dates[row])
+        if new_year is not None:
+            year = int(np.searchsorted(self.release_years, new_year))
+            # first movie of the year, year starts out empty
+            if year == len(self.release_years) or self.release_years[year] != new_year:
+                self.release_years = np.insert(self.release_years, year, new_year)
+                self.year_starts = np.insert(self.year_starts, year + 1, self.year_starts[year])
+                self.year_top_rows = np.insert(self.year_top_rows, year, row)
+                for sales_type in SALES_TYPES:
+                    year_sales[sales_type] = np.insert(year_sales[sales_type], year, 0)
+            start, end = self.year_starts[year], self.year_starts[year + 1]
+            self.year_order = np.insert(
+                self.year_order, start + np.searchsorted(self.year_order[start:end], row), row)
+            self.year_starts = self.year_starts.copy()
+            self.year_starts[year + 1:] += 1
+            for sales_type in SALES_TYPES:
+                year_sales[sales_type][year] += self.sales(sales_type)[row]
+
+        self.year_sales_cumsum = {
+            sales_type: np.concatenate(([0], np.cumsum(sales))) for sales_type, sales in year_sales.items()
+        }
+
+        # top movie can only have changed in the years the movie was/is in
+        self.year_top_rows = self.year_top_rows.copy()
+        for changed_year in {old_year, new_year} - {None}:
+            year = int(np.searchsorted(self.release_years, changed_year))
+            if year < len(self.release_years) and self.release_years[year] == changed_year:
+                year_rows = self.year_order[self.year_starts[year]:self.year_starts[year + 1]]
+                self.year_top_rows[year] = year_rows[np.argmax(self.world_sales[year_rows])]
+
+    # every array in the store by name, plus the lists of rating/distributor names the codes point into
+    def get_columns(self):
+        columns = {name: getattr(self, name) for name in STORE_COLUMNS}
+        for sales_type in SALES_TYPES:
+            columns['sales_order:' + sales_type] = self.sales_order[sales_type]
+            columns['sales_keys:' + sales_type] = self.sales_keys[sales_type]
+        for genre in GENRES:
+            columns['genre_index:' + genre] = self.genre_index[genre]
+        for month in MONTHS:
+            columns['month_index:' + month] = self.month_index[month]
+        for name in YEAR_COLUMNS:
+            columns[name] = getattr(self, name)
+        for sales_type in SALES_TYPES:
+            columns['year_sales_cumsum:' + sales_type] = self.year_sales_cumsum[sales_type]
+        string_table = {
+            "rating_names": list(self.rating_names),
+            "distributor_names": list(self.distributor_names)
+        }
+        return columns, string_table
+
+    def __len__(self):
+        return self.size
+
+    # returns sales column for 'Domestic', 'International' or 'World', None for anything else
+    def sales(self, sales_type):
+        if sales_type not in SALES_TYPES:
+            return None
+        return getattr(self, SALES_TYPES[sales_type])
+
+    # start/end positions in sales_order[sales_type] of the movies with sales strictly between min and max
+    # movies in between are already ordered from highest to lowest sales
+    def sales_range(self, sales_type, minimum_sales, maximum_sales):
+        keys = self.sales_keys[sales_type]
+        # keep search values inside the range numpy can compare against int64
+        minimum_sales = min(max(minimum_sales, -INT64_LIMIT), INT64_LIMIT)
+        maximum_sales = min(max(maximum_sales, -INT64_LIMIT), INT64_LIMIT)
+
+        start = int(np.searchsorted(keys, -maximum_sales, side='right'))
+        end = int(np.searchsorted(keys, -minimum_sales, side='left'))
+        return start, max(start, end)
+
+    # sorted row ids of movies that have every one of the genres in their genre list
+    def genre_rows(self, genres):
+        if any(genre not in GENRE_BITS for genre in genres):
+            return np.array([], dtype=np.intp)
+        if not genres:
+            return np.arange(self.size)
+
+        # intersect the shortest lists first so the work stays as small as possible
+        posting_lists = sorted((self.genre_index[genre] for genre in genres), key=len)
+        rows = posting_lists[0]
+        for posting_list in posting_lists[1:]:
+            rows = np.intersect1d(rows, posting_list, assume_unique=True)
+        return rows
+
+    # sorted row ids of movies released in the month ('Jan', 'Feb', ...)
+    def month_rows(self, month):
+        if month not in self.month_index:
+            return np.array([], dtype=np.intp)
+        return self.month_index[month]
+
+    # positions in release_years of the years from start_year to end_year, both included
+    def year_range(self, start_year, end_year):
+        start = int(np.searchsorted(self.release_years, start_year, side='left'))
+        end = int(np.searchsorted(self.release_years, end_year, side='right'))
+        return start, max(start, end)
+
+    # row ids of movies released from start_year to end_year, grouped by year
+    def year_rows(self, start_year, end_year):
+        start, end = self.year_range(start_year, end_year)
+        return self.year_order[self.year_starts[start]:self.year_starts[end]]
+
+    # total sales of each sales type and amount of movies released from start_year to end_year
+    def year_range_totals(self, start_year, end_year):
+        start, end = self.year_range(start_year, end_year)
+        sales = {
+            sales_type: int(cumsum[end] - cumsum[start]) for sales_type, cumsum in self.year_sales_cumsum.items()
+        }
+        return sales, int(self.year_starts[end] - self.year_starts[start])
+
+    # row id of the movie with the highest world sales released from start_year to end_year, None if there's none
+    # first movie in the dataset wins ties, same as the month/genre searches
+    def year_range_top(self, start_year, end_year):
+        start, end = self.year_range(start_year, end_year)
+        if start == end:
+            return None
+        top_rows = self.year_top_rows[start:end]
+        top_sales = self.world_sales[top_rows]
+        return int(top_rows[top_sales == top_sales.max()].min())
+
+    # movies whose genre list is exactly the genres, order doesn't matter
+    def exact_genre_mask(self, genres):
+        if any(genre not in GENRE_BITS for genre in genres):
+            return np.zeros(self.size, dtype=bool)
+        return self.genre_masks == genres_to_mask(genres)
+
+    # movies with the given MPAA rating
+    def rating_mask(self, rating):
+        if rating not in self.rating_names:
+            return np.zeros(self.size, dtype=bool)
+        return self.rating_codes == self.rating_names.index(rating)
+
+    # movies released in the given month ('Jan', 'Feb', ...)
+    def month_mask(self, month):
+        if month not in MONTHS:
+            return np.zeros(self.size, dtype=bool)
+        return self.release_months == MONTHS.index(month) + 1
+
+    # movies with the text anywhere in their title
+    def title_mask(self, text):
+        return np.char.find(self.titles, text) >= 0
+
+    def row(self, index):
+        return MovieRow(self, int(index))
+
+    def rows(self, indexes):
+        return [MovieRow(self, int(index)) for index in indexes]
+
+    # same as rows but each MovieRow is only made when it's asked for, for pages rendered as they're sent
+    def iter_rows(self, indexes):
+        for index in indexes:
+            yield MovieRow(self, int(index))
+
+
+# read only view of a single movie in the store, has the same attributes as Movie so templates still work
+class MovieRow:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def rank(self):
+        return int(self.store.rank[self.index])
+
+    @property
+    def title(self):
+        return str(self.store.titles[self.index])
+
+    @property
+    def distributor(self):
+        return self.store.distributor_names[self.store.distributor_codes[self.index]]
+
+    @property
+    def release_date(self):
+        return format_release_date(self.store.release_dates[self.index])
+
+    @property
+    def domestic_sales(self):
+        return int(self.store.domestic_sales[self.index])
+
+    @property
+    def international_sales(self):
+        return int(self.store.international_sales[self.index])
+
+    @property
+    def world_sales(self):
+        return int(self.store.world_sales[self.index])
+
+    @property
+    def genre(self):
+        return str(self.store.genres[self.index])
+
+    @property
+    def runtime(self):
+        return format_runtime(int(self.store.runtime_minutes[self.index]))
+
+    @property
+    def rating(self):
+        return self.store.rating_names[self.store.rating_codes[self.index]]
+
+
+# converts the genre list text from the dataset ("['Action', 'Adventure']") into a list of genres
+def parse_genres(genre):
+    return [genre for genre in genre.strip('][').replace("'", "").split(', ') if genre]
+
+
+# combines the bits of each genre into one number, unknown genres are ignored
+def genres_to_mask(genres):
+    mask = 0
+    for genre in genres:
+        mask |= GENRE_BITS.get(genre, 0)
+    return mask
+
+
+# converts list of values into sorted list of unique values and array of each value's position in it
+def encode_categories(values):
+    names = sorted(set(values))
+    positions = {name: code for code, name in enumerate(names)}
+    codes = np.array([positions[value] for value in values], dtype=np.int16)
+    return names, codes
+
+
+# combines (names, codes) from encode_categories() of several chunks into one list of names and codes
+def merge_categories(categories):
+    names = sorted(set().union(*(chunk_names for chunk_names, _ in categories)))
+    positions = {name: code for code, name in enumerate(names)}
+    codes = [
+        np.array([positions[name] for name in chunk_names], dtype=np.int16)[chunk_codes]
+        for chunk_names, chunk_codes in categories
+    ]
+    return names, np.concatenate(codes)
+
+
+# copy of a column with value in row, row can be one past the end to add it on
+def updated_column(column, row, value):
+    if row == len(column):
+        return np.append(column, np.array([value], dtype=column.dtype))
+    column = column.copy()
+    column[row] = value
+    return column
+
+
+# names with name added on the end if it isn't there yet, and the code of name
+def add_category(names, name):
+    if name in names:
+        return names, names.index(name)
+    return list(names) + [name], len(names)
+
+
+# copy of a sorted array of unique row ids with row added/removed
+def insert_sorted(rows, row):
+    return np.insert(rows, np.searchsorted(rows, row), row)
+
+
+def remove_sorted(rows, row):
+    return np.delete(rows, np.searchsorted(rows, row))
+
+
+# sales keys are sorted from lowest to highest and rows with the same key are in row order, like a stable argsort
+def insert_sales_key(order, keys, row, key):
+    start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+    position = start + np.searchsorted(order[start:end], row)
+    return np.insert(order, position, row), np.insert(keys, position, key)
+
+
+def remove_sales_key(order, keys, row, key):
+    start, end = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+    position = start + np.searchsorted(order[start:end], row)
+    return np.delete(order, position), np.delete(keys, position)
+
+
+def get_release_year(release_date):
+    if np.isnat(release_date):
+        return None
+    return int(release_date.astype('datetime64[Y]').astype(np.int64)) + 1970
+
+
+# dates in dataset look like 16-Dec-15, missing ones are NA
+# the year only has two digits, so the century is the one that puts it closest to the year in the title
+# (15-Dec-39 is 1939 for a movie titled (1939)), without a title year a date can't be later than today
+def parse_release_date(release_date, title=None):
+    try:
+        release_date = datetime.strptime(release_date, '%d-%b-%y').date()
+    except ValueError:
+        return None
+
+    title_year = TITLE_YEAR.search(title) if title else None
+    if title_year is not None:
+        year = min((release_date.year + century for century in (-100, 0, 100)),
+                   key=lambda year: abs(year - int(title_year.group(1))))
+    else:
+        year = release_date.year - 100 if release_date > date.today() else release_date.year
+    try:
+        return release_date.replace(year=year)
+    except ValueError:
+        # 29-Feb only exists in one of the centuries
+        return release_date
+
+
+def format_release_date(release_date):
+    if np.isnat(release_date):
+        return 'NA'
+    date = release_date.astype(object)
+    return '%d-%s-%02d' % (date.day, MONTHS[date.month - 1], date.year % 100)
+
+
+# runtimes in dataset look like 2 hr 18 min or 2 hr
+def parse_runtime(runtime):
+    hours = RUNTIME_HOURS.search(runtime)
+    minutes = RUNTIME_MINUTES.search(runtime)
+    if hours is None and minutes is None:
+        return -1
+    return (int(hours.group(1)) * 60 if hours else 0) + (int(minutes.group(1)) if minutes else 0)
+
+
+def format_runtime(runtime_minutes):
+    if runtime_minutes < 0:
+        return 'NA'
+    hours, minutes = divmod(runtime_minutes, 60)
+    if not minutes:
+        return '%d hr' % hours
+    if not hours:
+        return '%d min' % minutes
+    return '%d hr %d min' % (hours, minutes)
@@ -0,0 +1,276 @@
+import numpy as np
+
+from movie_store import GENRE_BITS, GENRES, MONTHS, genres_to_mask, parse_genres, parse_release_date
+from sales_cube import RATINGS
+import utils
+
+
+# lowest sales start at this value so any movie below it replaces it
+UNSET_LOWEST_SALES = 1000000000
+
+
+# predictive algorithm that outputs projected domestic/international/world sales for the proposed movie
+# genre, month and rating numbers are looked up from the dataset's sales cube instead of scanning every movie
+# returns dictionary with projected sales and the historical data used for the comparison charts
+def predict_movie(dataset, selected_genres, selected_movie_rating, selected_release_month, series_selection):
+    store = dataset.store
+    cube = dataset.cube
+
+    # projected sales come from the same calculation the batch predictions use, as a batch of one
+    domestic_sales, international_sales, world_sales = project_sales(
+        dataset, [selected_genres], [selected_movie_rating], [selected_release_month], [series_selection])
+    genres_domestic_sales = float(domestic_sales[0])
+    genres_international_sales = float(international_sales[0])
+    genres_world_sales = float(world_sales[0])
+
+    genre_highest_sales = 0
+    genre_lowest_sales = UNSET_LOWEST_SALES
+
+    # want to try to get exact matches of genres selected first for better comparison
+    if all(genre in GENRE_BITS for genre in selected_genres):
+        exact_genre_high_low = cube.genre_combo_high_low(genres_to_mask(selected_genres))
+        if exact_genre_high_low is not None:
+            genre_highest_sales = max(genre_highest_sales, exact_genre_high_low[0])
+            genre_lowest_sales = min(genre_lowest_sales, exact_genre_high_low[1])
+
+    # movies whose genre list contains every selected genre
+    superset_movies = store.genre_rows(selected_genres)
+
+    # if no matches to exact genre then get movies with that genre in their list of genres
+    # make sure original sales high/low is unchanged before doing this search
+    genre_highest_sales, genre_lowest_sales = get_unset_high_low_sales(
+        store.world_sales[superset_movies], genre_highest_sales, genre_lowest_sales)
+
+    # track high/low world sales for the selected release month
+    _, _, month_highest_sales, month_lowest_sales = cube.month_totals(selected_release_month)
+    month_highest_sales = max(0, month_highest_sales)
+    month_lowest_sales = min(UNSET_LOWEST_SALES, month_lowest_sales)
+
+    series_movies = {}
+    if series_selection != 'None':
+        # get list of previous series movies for comparison chart
+        # also check series movie sales against high/low genre sales since we want to include that in chart generation
+        for movie in store.rows(dataset.series.rows(series_selection)):
+            # add movie to series list
+            series_movies[movie.title] = utils.round_number_millions(movie.world_sales)
+            if movie.world_sales > genre_highest_sales:
+                genre_highest_sales = movie.world_sales
+            if movie.world_sales < genre_lowest_sales:
+                genre_lowest_sales = movie.world_sales
+
+    # find movies with exact  or very similar genres to show as comparisons
+    # check if all genres in selected genre appear in a movie genre list
+    # and see if same rating because we don't want to recommend The Conjuring as a similar title to Scooby Doo
+    comparative_movies = superset_movies[store.rating_mask(selected_movie_rating)[superset_movies]]
+    # trim list to just top 3
+    comparative_movies = [movie.title for movie in store.rows(comparative_movies[0:3])]
+
+    # add projected movie data to series movie list
+    if series_selection != 'None':
+        series_movies['Projected Movie'] = utils.round_number_millions(genres_world_sales)
+    else:
+        series_movies[''] = 0
+
+    return {
+        "DomesticSales": genres_domestic_sales,
+        "InternationalSales": genres_international_sales,
+        "WorldSales": genres_world_sales,
+        "ComparativeMovies": comparative_movies,
+        # genres high/low/projected sales for chart generation
+        "GenreSalesComparisons": {
+            "Lowest": utils.round_number_millions(genre_lowest_sales),
+            "Projected": utils.round_number_millions(genres_world_sales),
+            "Highest": utils.round_number_millions(genre_highest_sales)
+        },
+        # previous series movies alongside projected movie for chart generation
+        "SeriesMovies": series_movies,
+        # highest and lowest selling movie in selected month for chart generation
+        "MonthSalesComparisons": {
+            "Lowest": utils.round_number_millions(month_lowest_sales),
+            "Projected": utils.round_number_millions(genres_world_sales),
+            "Highest": utils.round_number_millions(month_highest_sales)
+        },
+        # average sales for each rating alongside projected sales for chart generation
+        "RatingSalesComparison": get_rating_sales_comparison(cube, selected_genres, genres_world_sales)
+    }
+
+
+# average sales for each MPAA rating to compare to projected sales of the movie, for the rating chart
+# this is the one part of a prediction every movie with a rating feeds into
+def get_rating_sales_comparison(cube, selected_genres, projected_world_sales):
+    # get sales numbers and amount for ratings
+    g_rating_sales, g_rating_count = cube.rating_totals('G')
+    pg_rating_sales, pg_rating_count = cube.rating_totals('PG')
+    pg13_rating_sales, pg13_rating_count = cube.rating_totals('PG-13')
+    r_rating_sales, r_rating_count = cube.rating_totals('R')
+
+    # total sales have been counted as many times as selected genres so we have to divide by that amount
+    # and divide by all the movies with that rating counted divided by amount of genres as well
+    g_rating_average_sales = (g_rating_sales / len(selected_genres)) / (g_rating_count / len(selected_genres))
+    pg_rating_average_sales = (pg_rating_sales / len(selected_genres)) / (pg_rating_count / len(selected_genres))
+    pg13_rating_average_sales = (pg13_rating_sales / len(selected_genres)) / (pg13_rating_count / len(selected_genres))
+    r_rating_average_sales = (r_rating_sales / len(selected_genres)) / (r_rating_count / len(selected_genres))
+
+    return {
+        'G': utils.round_number_millions(g_rating_average_sales),
+        'PG': utils.round_number_millions(pg_rating_average_sales),
+        'PG-13': utils.round_number_millions(pg13_rating_average_sales),
+        'R': utils.round_number_millions(r_rating_average_sales),
+        'Projected': utils.round_number_millions(projected_world_sales)
+    }
+
+
+# projected domestic, international and world sales for a whole batch of scenarios at once
+# each argument has one entry per scenario, every step of the prediction runs over the whole batch as arrays
+# returns three arrays (domestic, international, world) with one projected amount per scenario
+def project_sales(dataset, selected_genres, selected_movie_ratings, selected_release_months, series_selections):
+    cube = dataset.cube
+
+    genre_matrix = get_genre_matrix(selected_genres)
+    genre_amounts = genre_matrix.sum(axis=1)
+
+    # get domestic, international, and total sales of genres and track movies in genres
+    # movies are counted once for every selected genre they have
+    genre_sales, genre_counts = cube.genre_total_matrix()
+    genres_domestic_sales, genres_international_sales, genres_world_sales = (genre_matrix @ genre_sales).T
+    movies_with_genre = genre_matrix @ genre_counts
+
+    # raise on zero division like a single prediction would instead of silently returning nan
+    with np.errstate(divide='raise', invalid='raise'):
+        # divide by amount of selected genres multiplied by amount of genres selected
+        # since we iterate through the dataset that many times
+        genres_domestic_sales = genres_domestic_sales / (genre_amounts * movies_with_genre)
+        genres_international_sales = genres_international_sales / (genre_amounts * movies_with_genre)
+        genres_world_sales = genres_world_sales / (genre_amounts * movies_with_genre)
+
+        # take total sales for movies released in selected month and divide by amount of movies released in month
+        month_sales, month_counts = cube.month_total_arrays()
+        months = np.array([MONTHS.index(month) + 1 for month in selected_release_months], dtype=np.intp)
+        month_average_sales = month_sales[months] / month_counts[months]
+
+    # we want to get the mean of the monthly average and projected sales based on genre
+    genres_domestic_sales = (month_average_sales + genres_domestic_sales) / 2
+    genres_international_sales += (month_average_sales + genres_international_sales) / 2
+    genres_world_sales += (month_average_sales + genres_world_sales) / 2
+
+    # movie rating modifier
+    # get chosen rating then reduce by 20% if rated R
+    # sales data backs up this reduction (see results from average ratings sales on prediction results page)
+    rated_r = np.array([rating == 'R' for rating in selected_movie_ratings], dtype=bool)
+    genres_domestic_sales = np.where(rated_r, genres_domestic_sales * 0.7, genres_domestic_sales)
+    genres_international_sales = np.where(rated_r, genres_international_sales * 0.7, genres_international_sales)
+    genres_world_sales = np.where(rated_r, genres_domestic_sales + genres_international_sales, genres_world_sales)
+
+    # increase sales for continuations of popular series that already have a movie in the dataset
+    series_found = {
+        series: series != 'None' and dataset.series.has_movies(series)
+        for series in set(series_selections)
+    }
+    continues_series = np.array([series_found[series] for series in series_selections], dtype=bool)
+    genres_domestic_sales = np.where(continues_series, genres_domestic_sales + (genres_domestic_sales * 0.2),
+                                     genres_domestic_sales)
+    genres_international_sales = np.where(continues_series,
+                                          genres_international_sales + (genres_international_sales * 0.2),
+                                          genres_international_sales)
+    genres_world_sales = np.where(continues_series, genres_domestic_sales + genres_international_sales,
+                                  genres_world_sales)
+
+    # subtract from sales for having absurd amount of genres
+    too_many_genres = genre_amounts > 8
+    genres_domestic_sales = np.where(
+        too_many_genres, genres_domestic_sales - (genres_domestic_sales * (0.1 * (genre_amounts - 8))),
+        genres_domestic_sales)
+    genres_international_sales = np.where(
+        too_many_genres, genres_international_sales - (genres_international_sales * (0.1 * (genre_amounts - 8))),
+        genres_international_sales)
+    genres_world_sales = np.where(too_many_genres, genres_domestic_sales + genres_international_sales,
+                                  genres_world_sales)
+
+    return genres_domestic_sales, genres_international_sales, genres_world_sales
+
+
+# one row per scenario with a 1 for each selected genre
+def get_genre_matrix(selected_genres):
+    genre_matrix = np.zeros((len(selected_genres), len(GENRES)), dtype=np.int64)
+    for scenario, genres in enumerate(selected_genres):
+        for genre in genres:
+            genre_matrix[scenario, GENRES.index(genre)] = 1
+    return genre_matrix
+
+
+# checks valid scenarios against the dataset, returns a list of problems for each scenario (empty if it's fine)
+# projections divide by the amount of movies with the selected genres and released in the month,
+# so a scenario with none of either can't be projected
+def get_scenario_data_errors(dataset, selected_genres, selected_release_months):
+    _, genre_counts = dataset.cube.genre_total_matrix()
+    movies_with_genre = get_genre_matrix(selected_genres) @ genre_counts
+    _, month_counts = dataset.cube.month_total_arrays()
+
+    errors = []
+    for genres, month, genre_count in zip(selected_genres, selected_release_months, movies_with_genre.tolist()):
+        scenario_errors = []
+        if genre_count == 0:
+            scenario_errors.append('no movies in the dataset with genres %s' % genres)
+        if month_counts[MONTHS.index(month) + 1] == 0:
+            scenario_errors.append('no movies in the dataset released in %s' % month)
+        errors.append(scenario_errors)
+    return errors
+
+
+# True if changing any of the movies (Movie/MovieRow, before and after the change) could change the prediction
+# for the scenario of a cached prediction, apart from its rating averages (see is_rating_comparison_affected)
+# predictions read the totals of the selected genres and month and the series' movies
+def is_scenario_affected(dataset, movies, selected_genres, selected_movie_rating, selected_release_month,
+                         series_selection):
+    for movie in movies:
+        release_date = parse_release_date(movie.release_date, movie.title)
+        if set(parse_genres(movie.genre)) & set(selected_genres):
+            return True
+        if release_date and MONTHS[release_date.month - 1] == selected_release_month:
+            return True
+        if series_selection != 'None' and dataset.series.in_series(series_selection, movie.title):
+            return True
+    return False
+
+
+# True if changing any of the movies could change the rating averages every prediction is compared against
+def is_rating_comparison_affected(movies):
+    return any(movie.rating in RATINGS for movie in movies)
+
+
+# checks a scenario sent to the batch api, returns list of problems (empty if it's fine)
+def validate_scenario(scenario):
+    if not isinstance(scenario, dict):
+        return ['scenario must be an object']
+
+    errors = []
+    genres = scenario.get('genres')
+    if not isinstance(genres, list) or not genres:
+        errors.append('genres must be a non-empty list')
+    elif any(genre not in GENRES for genre in genres):
+        errors.append('unknown genre in %s' % genres)
+    elif len(set(genres)) != len(genres):
+        errors.append('genres must not repeat')
+    if scenario.get('rating') not in RATINGS:
+        errors.append('rating must be one of %s' % ', '.join(RATINGS))
+    if scenario.get('month') not in MONTHS:
+        errors.append('month must be one of %s' % ', '.join(MONTHS))
+    if not isinstance(scenario.get('series', 'None'), str):
+        errors.append('series must be a string')
+    runtime = scenario.get('runtime')
+    if runtime is not None and (not isinstance(runtime, int) or isinstance(runtime, bool) or runtime <= 0):
+        errors.append('runtime must be a positive whole number of minutes')
+    return errors
+
+
+# goes through sales in order tracking high/low, but only while high is still 0 or low still unset
+# once both have been found the rest of the sales are ignored
+def get_unset_high_low_sales(sales, highest_sales, lowest_sales):
+    # running high/low before each movie, last entry is after every movie has been checked
+    running_highest = np.maximum.accumulate(np.concatenate(([highest_sales], sales)))
+    running_lowest = np.minimum.accumulate(np.concatenate(([lowest_sales], sales)))
+    # movies are only checked while high/low is still unset
+    still_unset = (running_highest == 0) | (running_lowest == UNSET_LOWEST_SALES)
+    checked_movies = len(sales) if still_unset.all() else int(np.argmin(still_unset))
+
+    return int(running_highest[checked_movies]), int(running_lowest[checked_movies])
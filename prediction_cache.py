@@ -0,0 +1,86 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+# remembers results for recently asked scenarios, dropping the least recently used once full
+# and anything older than the time to live
+class PredictionCache:
+
+    def __init__(self, max_entries, time_to_live):
+        self.max_entries = max_entries
+        # seconds a result is kept before it has to be calculated again
+        self.time_to_live = time_to_live
+        # scenario key -> (time stored, result), most recently used last
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    # returns cached result for the scenario, None if it isn't cached or has expired
+    def get(self, scenario_key):
+        with self.lock:
+            entry = self.results.get(scenario_key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.time_to_live:
+                del self.results[scenario_key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self.results.move_to_end(scenario_key)
+            self.hits += 1
+            return result
+
+    def put(self, scenario_key, result):
+        with self.lock:
+            self.results[scenario_key] = (time.monotonic(), result)
+            self.results.move_to_end(scenario_key)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+
+    # copies results of old_version over to new_version so they stay cached after a change
+    # carry gets the scenario key and result and returns the result for new_version (the same one if the change
+    # didn't touch it, an updated copy if it only touched part of it), or None if it has to be calculated again
+    def carry_over(self, old_version, new_version, carry):
+        with self.lock:
+            for scenario_key, (stored_at, result) in list(self.results.items()):
+                if scenario_key[0] != old_version:
+                    continue
+                result = carry(scenario_key, result)
+                if result is not None:
+                    self.results[(new_version,) + scenario_key[1:]] = (stored_at, result)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.results),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# same scenario always gives the same key no matter what order the genres were picked in
+def get_scenario_key(dataset_version, selected_genres, selected_movie_rating, selected_release_month,
+                     series_selection):
+    return (
+        dataset_version,
+        frozenset(selected_genres),
+        selected_movie_rating,
+        selected_release_month,
+        series_selection
+    )
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+import io
+import itertools
+import marshal
+import pstats
+import threading
+import time
+
+
+# keeps the call profiles of the most recent profiled requests, dropping the oldest once full
+class ProfileStore:
+
+    def __init__(self, max_profiles):
+        self.max_profiles = max_profiles
+        # profile id -> profile, oldest first
+        self.profiles = OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    # id for a profile that will only be added later (like one of a streamed page that's still being sent)
+    def reserve_id(self):
+        with self.lock:
+            return next(self.ids)
+
+    # stores a finished cProfile.Profile of a request, returns the id it can be downloaded with
+    def add(self, method, path, seconds, profiler, profile_id=None):
+        profiler.create_stats()
+        with self.lock:
+            if profile_id is None:
+                profile_id = next(self.ids)
+            self.profiles[profile_id] = {
+                "id": profile_id,
+                "method": method,
+                "path": path,
+                "created": time.time(),
+                "seconds": seconds,
+                # same bytes pstats.Stats.dump_stats() writes, so the file works with snakeviz/flameprof etc.
+                "stats": marshal.dumps(profiler.stats)
+            }
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+        return profile_id
+
+    # every stored profile without its stats, newest first
+    def list(self):
+        with self.lock:
+            return [
+                {name: value for name, value in profile.items() if name != "stats"}
+                for profile in reversed(self.profiles.values())
+            ]
+
+    # returns stored profile, None if it doesn't exist or was already dropped
+    def get(self, profile_id):
+        with self.lock:
+            return self.profiles.get(profile_id)
+
+
+# pstats needs something with create_stats() to load stats that aren't in a file
+class LoadedProfile:
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+# readable table of the functions in a profile, slowest first
+def get_profile_text(profile, sort='cumulative', limit=50):
+    output = io.StringIO()
+    stats = pstats.Stats(LoadedProfile(marshal.loads(profile["stats"])), stream=output)
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
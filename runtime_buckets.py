@@ -0,0 +1,90 @@
+import numpy as np
+
+from movie_store import GENRES, GENRE_BITS
+from sales_cube import ALL_GENRES, RATINGS, get_rating_slots
+
+
+# width in minutes of each runtime bucket
+BUCKET_MINUTES = 15
+
+# extra rating slot every movie is counted in, slot 0 is unrated and 1 onwards are RATINGS
+ALL_RATINGS = len(RATINGS) + 1
+
+
+# amount, average and median world sales of movies in each runtime bucket x genre x rating
+# genre axis has ALL_GENRES for every movie, rating axis has ALL_RATINGS for every movie
+# movies without a runtime are left out
+class RuntimeBuckets:
+
+    def __init__(self, first_bucket, counts, average_sales, median_sales):
+        # runtime of bucket i starts at (first_bucket + i) * BUCKET_MINUTES minutes
+        self.first_bucket = first_bucket
+        self.counts = counts
+        # nan where a cell has no movies
+        self.average_sales = average_sales
+        self.median_sales = median_sales
+
+    # works out every cell at once: each movie is copied into each cell it belongs to, then sorted by cell and
+    # world sales so counts/sums come from bincount and medians from the middle of each cell's stretch
+    @classmethod
+    def from_store(cls, store):
+        rows = np.flatnonzero(store.runtime_minutes >= 0)
+        buckets = store.runtime_minutes[rows].astype(np.intp) // BUCKET_MINUTES
+        first_bucket = int(buckets.min()) if len(rows) else 0
+        bucket_amount = int(buckets.max()) - first_bucket + 1 if len(rows) else 0
+        buckets -= first_bucket
+        shape = (bucket_amount, len(GENRES) + 1, len(RATINGS) + 2)
+
+        # (movie, genre slot) for every genre a movie has, plus ALL_GENRES for every movie
+        genre_bits = np.array([GENRE_BITS[genre] for genre in GENRES], dtype=store.genre_masks.dtype)
+        movies, genres = np.nonzero(store.genre_masks[rows, None] & genre_bits)
+        movies = np.concatenate((movies, np.arange(len(rows))))
+        genres = np.concatenate((genres, np.full(len(rows), ALL_GENRES)))
+        # each of those once with the movie's own rating slot and once with ALL_RATINGS
+        rating_slots = get_rating_slots(store.rating_names, store.rating_codes[rows])
+        ratings = np.concatenate((rating_slots[movies], np.full(len(movies), ALL_RATINGS)))
+        movies = np.concatenate((movies, movies))
+        genres = np.concatenate((genres, genres))
+
+        cells = np.ravel_multi_index((buckets[movies], genres, ratings), shape)
+        sales = store.world_sales[rows][movies]
+        cell_amount = int(np.prod(shape))
+        counts = np.bincount(cells, minlength=cell_amount)
+        totals = np.bincount(cells, weights=sales, minlength=cell_amount)
+
+        # sales of one cell end up next to each other from lowest to highest
+        sorted_sales = sales[np.lexsort((sales, cells))]
+        starts = np.cumsum(counts) - counts
+        filled = counts > 0
+        lower_middle = starts[filled] + (counts[filled] - 1) // 2
+        upper_middle = starts[filled] + counts[filled] // 2
+
+        average_sales = np.full(cell_amount, np.nan)
+        median_sales = np.full(cell_amount, np.nan)
+        average_sales[filled] = totals[filled] / counts[filled]
+        median_sales[filled] = (sorted_sales[lower_middle] + sorted_sales[upper_middle]) / 2
+
+        return cls(first_bucket, counts.reshape(shape), average_sales.reshape(shape), median_sales.reshape(shape))
+
+    # runtime in minutes each bucket starts at
+    def bucket_starts(self):
+        return [(self.first_bucket + bucket) * BUCKET_MINUTES for bucket in range(len(self.counts))]
+
+    # position of the bucket with the runtime, None if no movie is that short/long
+    def bucket(self, runtime_minutes):
+        bucket = runtime_minutes // BUCKET_MINUTES - self.first_bucket
+        if bucket < 0 or bucket >= len(self.counts):
+            return None
+        return bucket
+
+    # how much better/worse movies with the rating sell at this runtime than at any runtime, 1 if there's nothing
+    # to compare against, used to adjust projected sales when a runtime is given
+    def runtime_modifier(self, runtime_minutes, rating):
+        rating = RATINGS.index(rating) + 1
+        bucket = self.bucket(runtime_minutes)
+        if bucket is None or not self.counts[bucket, ALL_GENRES, rating]:
+            return 1.0
+
+        counts = self.counts[:, ALL_GENRES, rating]
+        overall_average = np.nansum(self.average_sales[:, ALL_GENRES, rating] * counts) / counts.sum()
+        return float(self.average_sales[bucket, ALL_GENRES, rating] / overall_average)
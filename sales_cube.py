@@ -0,0 +1,203 @@
+import numpy as np
+
+from movie_store import GENRES, MONTHS, SALES_TYPES
+
+
+# MPAA ratings the cube keeps separate totals for, anything else is counted as unrated
+RATINGS = ('G', 'PG', 'PG-13', 'R')
+
+# extra genre slot every movie is counted in, used for totals across the whole dataset
+ALL_GENRES = len(GENRES)
+
+# position of world sales on the sales type axis
+WORLD_SALES = list(SALES_TYPES).index('World')
+
+# sentinels for empty cells so max/min across cells can skip them without checking counts
+NO_HIGHEST_SALES = np.iinfo(np.int64).min
+NO_LOWEST_SALES = np.iinfo(np.int64).max
+
+
+# sum, count, highest and lowest of each sales type for every genre x release month x rating combination
+# built once when the dataset loads so predictions only have to look up a few cells
+class SalesCube:
+
+    def __init__(self):
+        # genre (+ all genres) x month (0 is unknown release date) x rating (0 is unrated)
+        shape = (len(GENRES) + 1, len(MONTHS) + 1, len(RATINGS) + 1)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        # first axis is the sales type in the same order as SALES_TYPES
+        self.sums = np.zeros((len(SALES_TYPES),) + shape, dtype=np.int64)
+        self.highest = np.full((len(SALES_TYPES),) + shape, NO_HIGHEST_SALES, dtype=np.int64)
+        self.lowest = np.full((len(SALES_TYPES),) + shape, NO_LOWEST_SALES, dtype=np.int64)
+
+        # highest/lowest world sales for each exact combination of genres, keyed by genre bitmask
+        self.genre_combos = {}
+
+        # weighted rank points of each genre, every movie gives its genres 1000 minus its position in the dataset
+        self.genre_rank_points = np.zeros(len(GENRES), dtype=np.int64)
+        self.movie_count = 0
+
+    # builds the cube for every movie in a MovieStore
+    @classmethod
+    def from_store(cls, store):
+        cube = cls()
+        cube.add_store(store)
+        return cube
+
+    # adds every movie in a MovieStore, which holds the movies that come after the ones already added
+    def add_store(self, store):
+        self.add_movies(
+            store.genre_masks,
+            store.release_months,
+            get_rating_slots(store.rating_names, store.rating_codes),
+            [store.sales(sales_type) for sales_type in SALES_TYPES]
+        )
+
+    # adds movies to the cube, all arguments are arrays with one entry per movie
+    # sales is a list with an array for each sales type in the same order as SALES_TYPES
+    # movies are added after the ones already in the cube so the cube can be built a chunk at a time
+    def add_movies(self, genre_masks, release_months, rating_slots, sales):
+        rank_points = 1000 - (self.movie_count + np.arange(len(genre_masks), dtype=np.int64))
+        self.movie_count += len(genre_masks)
+
+        for genre in range(len(GENRES) + 1):
+            if genre == ALL_GENRES:
+                movies = np.arange(len(genre_masks))
+            else:
+                movies = np.flatnonzero(genre_masks & (1 << genre))
+                self.genre_rank_points[genre] += rank_points[movies].sum()
+
+            cells = (release_months[movies], rating_slots[movies])
+            np.add.at(self.counts[genre], cells, 1)
+            for sales_type in range(len(SALES_TYPES)):
+                np.add.at(self.sums[sales_type, genre], cells, sales[sales_type][movies])
+                np.maximum.at(self.highest[sales_type, genre], cells, sales[sales_type][movies])
+                np.minimum.at(self.lowest[sales_type, genre], cells, sales[sales_type][movies])
+
+        # group world sales by genre combination to get each combination's high/low
+        world_sales = sales[WORLD_SALES]
+        combos, combo_movies = np.unique(genre_masks, return_inverse=True)
+        combo_highest = np.full(len(combos), NO_HIGHEST_SALES, dtype=np.int64)
+        combo_lowest = np.full(len(combos), NO_LOWEST_SALES, dtype=np.int64)
+        np.maximum.at(combo_highest, combo_movies, world_sales)
+        np.minimum.at(combo_lowest, combo_movies, world_sales)
+        for combo, highest, lowest in zip(combos.tolist(), combo_highest.tolist(), combo_lowest.tolist()):
+            current_highest, current_lowest = self.genre_combos.get(combo, (highest, lowest))
+            self.genre_combos[combo] = (max(current_highest, highest), min(current_lowest, lowest))
+
+    # copy of the cube for new_store, which is old_store with the movie in row replaced or added on the end
+    # counts/sums take the old movie off and the new one on, highest/lowest only have to look at the movies in
+    # a cell again when the old movie was that cell's highest or lowest
+    def updated(self, old_store, new_store, row):
+        cube = SalesCube.__new__(SalesCube)
+        cube.counts = self.counts.copy()
+        cube.sums = self.sums.copy()
+        cube.highest = self.highest.copy()
+        cube.lowest = self.lowest.copy()
+        cube.genre_combos = dict(self.genre_combos)
+        cube.genre_rank_points = self.genre_rank_points.copy()
+        cube.movie_count = new_store.size
+
+        rank_points = 1000 - row
+        new_rating_slots = get_rating_slots(new_store.rating_names, new_store.rating_codes[row:row + 1])
+        new_cells = get_movie_cells(new_store.genre_masks[row], new_store.release_months[row], new_rating_slots[0])
+        new_sales = np.array([new_store.sales(sales_type)[row] for sales_type in SALES_TYPES])
+
+        if row < old_store.size:
+            old_rating_slots = get_rating_slots(old_store.rating_names, old_store.rating_codes[row:row + 1])
+            old_cells = get_movie_cells(old_store.genre_masks[row], old_store.release_months[row], old_rating_slots[0])
+            old_sales = np.array([old_store.sales(sales_type)[row] for sales_type in SALES_TYPES])
+            cube.counts[old_cells] -= 1
+            cube.sums[(slice(None),) + old_cells] -= old_sales[:, None]
+            cube.genre_rank_points[old_cells[0][old_cells[0] != ALL_GENRES]] -= rank_points
+
+        cube.counts[new_cells] += 1
+        cube.sums[(slice(None),) + new_cells] += new_sales[:, None]
+        cube.genre_rank_points[new_cells[0][new_cells[0] != ALL_GENRES]] += rank_points
+
+        if row < old_store.size:
+            for genre, month, rating in zip(*old_cells):
+                cell = (slice(None), genre, month, rating)
+                if (old_sales == cube.highest[cell]).any() or (old_sales == cube.lowest[cell]).any():
+                    cube.refresh_cell(new_store, genre, month, rating)
+        for genre, month, rating in zip(*new_cells):
+            cell = (slice(None), genre, month, rating)
+            cube.highest[cell] = np.maximum(cube.highest[cell], new_sales)
+            cube.lowest[cell] = np.minimum(cube.lowest[cell], new_sales)
+
+        new_combo = int(new_store.genre_masks[row])
+        if row < old_store.size:
+            old_combo = int(old_store.genre_masks[row])
+            if old_store.world_sales[row] in self.genre_combos[old_combo]:
+                cube.refresh_genre_combo(new_store, old_combo)
+        highest, lowest = cube.genre_combos.get(new_combo, (NO_HIGHEST_SALES, NO_LOWEST_SALES))
+        world_sales = int(new_store.world_sales[row])
+        cube.genre_combos[new_combo] = (max(highest, world_sales), min(lowest, world_sales))
+        return cube
+
+    # works out the highest/lowest of one cell from the movies in it
+    def refresh_cell(self, store, genre, month, rating):
+        rows = np.arange(store.size) if genre == ALL_GENRES else store.genre_index[GENRES[genre]]
+        rows = rows[store.release_months[rows] == month]
+        rows = rows[get_rating_slots(store.rating_names, store.rating_codes[rows]) == rating]
+        for sales_type_index, sales_type in enumerate(SALES_TYPES):
+            sales = store.sales(sales_type)[rows]
+            self.highest[sales_type_index, genre, month, rating] = sales.max() if len(rows) else NO_HIGHEST_SALES
+            self.lowest[sales_type_index, genre, month, rating] = sales.min() if len(rows) else NO_LOWEST_SALES
+
+    def refresh_genre_combo(self, store, genre_mask):
+        sales = store.world_sales[store.genre_masks == genre_mask]
+        if len(sales):
+            self.genre_combos[genre_mask] = (int(sales.max()), int(sales.min()))
+        else:
+            del self.genre_combos[genre_mask]
+
+    # total sales for each sales type and amount of movies with the genre
+    def genre_totals(self, genre):
+        genre = GENRES.index(genre)
+        return [int(total) for total in self.sums[:, genre].sum(axis=(1, 2))], int(self.counts[genre].sum())
+
+    # total sales for each sales type per genre (genres x sales types) and amount of movies per genre
+    def genre_total_matrix(self):
+        genre_sales = self.sums[:, :ALL_GENRES].sum(axis=(2, 3)).T
+        genre_counts = self.counts[:ALL_GENRES].sum(axis=(1, 2))
+        return genre_sales, genre_counts
+
+    # total world sales of every movie
+    def world_total(self):
+        return int(self.sums[WORLD_SALES, ALL_GENRES].sum())
+
+    # total world sales and amount of movies for every release month, index 0 is unknown release date
+    def month_total_arrays(self):
+        return self.sums[WORLD_SALES, ALL_GENRES].sum(axis=1), self.counts[ALL_GENRES].sum(axis=1)
+
+    # total world sales, amount, highest and lowest world sales of all movies released in the month
+    def month_totals(self, month):
+        month = MONTHS.index(month) + 1
+        return (
+            int(self.sums[WORLD_SALES, ALL_GENRES, month].sum()),
+            int(self.counts[ALL_GENRES, month].sum()),
+            int(self.highest[WORLD_SALES, ALL_GENRES, month].max()),
+            int(self.lowest[WORLD_SALES, ALL_GENRES, month].min())
+        )
+
+    # total world sales and amount of all movies with the rating
+    def rating_totals(self, rating):
+        rating = RATINGS.index(rating) + 1
+        return int(self.sums[WORLD_SALES, ALL_GENRES, :, rating].sum()), int(self.counts[ALL_GENRES, :, rating].sum())
+
+    # highest and lowest world sales of movies with exactly this genre bitmask, None if there aren't any
+    def genre_combo_high_low(self, genre_mask):
+        return self.genre_combos.get(genre_mask)
+
+
+# (genres, month, rating) index arrays of every cell one movie is counted in
+def get_movie_cells(genre_mask, release_month, rating_slot):
+    genres = [genre for genre in range(len(GENRES)) if int(genre_mask) & (1 << genre)] + [ALL_GENRES]
+    return np.array(genres), np.full(len(genres), int(release_month)), np.full(len(genres), int(rating_slot))
+
+
+# converts each movie's rating code into its slot in the cube
+def get_rating_slots(rating_names, rating_codes):
+    name_slots = np.array([RATINGS.index(name) + 1 if name in RATINGS else 0 for name in rating_names], dtype=np.intp)
+    return name_slots[rating_codes] if len(name_slots) else np.zeros(len(rating_codes), dtype=np.intp)
@@ -0,0 +1,93 @@
+import re
+
+import numpy as np
+
+
+# series that can be picked for a prediction and the other titles that belong to them
+# a title is in a series when it has the series name or one of its aliases in it
+# new series only need an entry here
+SERIES = {
+    'Avengers': [],
+    'Batman': ['Dark Knight'],
+    'Harry Potter': ['Fantastic Beasts'],
+    'James Bond': [],
+    'Jurassic Park': [],
+    'Lord of the Rings': ['The Hobbit'],
+    'Spider-Man': [],
+    'Star Wars': [],
+    'The Fast and the Furious': ['2 Fast 2 Furious', 'Fast Five', 'Fast & Furious', 'Furious', 'Fate of the Furious',
+                                 'F9'],
+    'Transformers': [],
+    'X-Men': ['Wolverine']
+}
+
+
+# row ids of the movies in each series, worked out once when the dataset loads
+# so predictions only need a dictionary lookup instead of checking every title
+class SeriesIndex:
+
+    def __init__(self, store, series_aliases=SERIES):
+        self.store = store
+        # series name always counts as one of its own aliases
+        self.series_aliases = {series: [series] + list(aliases) for series, aliases in series_aliases.items()}
+
+        # one pattern for every alias of every series, titles that don't match it can't be in any series
+        aliases = sorted({alias for names in self.series_aliases.values() for alias in names}, key=len, reverse=True)
+        self.matcher = re.compile('|'.join(re.escape(alias) for alias in aliases)) if aliases else None
+
+        # movies with the series name itself in the title
+        primary_rows = {series: [] for series in self.series_aliases}
+        # movies with the series name or any alias in the title
+        series_rows = {series: [] for series in self.series_aliases}
+        if self.matcher is not None:
+            for row, title in enumerate(store.titles.tolist()):
+                if self.matcher.search(title) is None:
+                    continue
+                # only the few titles that matched get checked series by series
+                for series, names in self.series_aliases.items():
+                    if series in title:
+                        primary_rows[series].append(row)
+                    if any(name in title for name in names):
+                        series_rows[series].append(row)
+
+        self.primary_rows = {series: np.array(rows, dtype=np.intp) for series, rows in primary_rows.items()}
+        self.series_rows = {series: np.array(rows, dtype=np.intp) for series, rows in series_rows.items()}
+
+    # copy of the index for new_store, which is the store this index was built for with the movie in row replaced
+    # or added on the end, only that movie's old and new title get checked
+    def updated(self, new_store, row):
+        index = SeriesIndex.__new__(SeriesIndex)
+        index.store = new_store
+        index.series_aliases = self.series_aliases
+        index.matcher = self.matcher
+        index.primary_rows = dict(self.primary_rows)
+        index.series_rows = dict(self.series_rows)
+
+        old_title = str(self.store.titles[row]) if row < self.store.size else ''
+        new_title = str(new_store.titles[row])
+        for series, names in self.series_aliases.items():
+            for series_rows, aliases in ((index.primary_rows, [series]), (index.series_rows, names)):
+                was_in_series = any(name in old_title for name in aliases)
+                is_in_series = any(name in new_title for name in aliases)
+                if was_in_series and not is_in_series:
+                    series_rows[series] = np.delete(series_rows[series], np.searchsorted(series_rows[series], row))
+                elif is_in_series and not was_in_series:
+                    series_rows[series] = np.insert(series_rows[series], np.searchsorted(series_rows[series], row), row)
+        return index
+
+    # sorted row ids of every movie in the series
+    # series that aren't in the registry fall back to checking titles for the name
+    def rows(self, series):
+        if series in self.series_rows:
+            return self.series_rows[series]
+        return np.flatnonzero(self.store.title_mask(series))
+
+    # True if a movie with the title counts as part of the series
+    def in_series(self, series, title):
+        return any(name in title for name in self.series_aliases.get(series, [series]))
+
+    # True if a movie with the series name in its title is already in the dataset
+    def has_movies(self, series):
+        if series in self.primary_rows:
+            return len(self.primary_rows[series]) > 0
+        return bool(self.store.title_mask(series).any())
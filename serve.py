@@ -0,0 +1,223 @@
+import argparse
+import gc
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+import charts
+from DataHelper import get_dataset_cache, load_dataset
+
+
+# pre-fork server: the parent process loads the dataset and draws the descriptive charts once, then forks
+# workers that all accept connections on the same socket and share the parent's memory copy-on-write
+# when the .csv changes (edited, or a worker compacted the movie api's change log into it) or the parent gets SIGHUP
+# it loads the new data and starts a new set of workers, the old ones finish the requests they're handling and exit
+# changes logged through the movie api don't need new workers, every worker reads them from the change log and
+# applies them to its own dataset
+# rendered prediction charts are written to a directory every worker reads from, so a chart url works whichever
+# worker it lands on. /metrics, /admin/profiles and the in-memory caches are per worker: each request shows the
+# numbers of the worker that answered it, not totals over all of them
+class PreforkServer:
+
+    def __init__(self, app_module, host, port, workers, reload_interval):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reload_interval = reload_interval
+        self.server = None
+        self.dataset = None
+        # hash of the .csv the current workers were forked with
+        self.file_version = None
+        # pids of the current set of workers, and of old ones still finishing their requests
+        self.worker_pids = set()
+        self.retiring_pids = set()
+        self.stopping = False
+        self.restart_requested = False
+
+    # loads the dataset and draws the descriptive charts in this process so every worker forked after gets them
+    # the first time the whole warm-up runs here, so workers also inherit compiled templates, the placeholder chart
+    # and the startup timings
+    def prepare(self, first=False):
+        # drawn right here, a chart pool started before forking would be shared by every worker
+        renderer = charts.ChartRenderer(0, self.app.config['CHART_TIMEOUT'])
+        if first:
+            self.app_module.warm_up(renderer, start_chart_workers=False)
+        self.dataset = load_dataset(self.app.config['MOVIE_DATA'])
+        self.file_version = get_dataset_cache(self.app.config['MOVIE_DATA']).file_version
+        if not first:
+            self.app_module.generate_descriptive_charts(self.dataset, renderer)
+        # objects that exist now are never freed, keeps the garbage collector from touching (and so copying)
+        # the memory workers share with this process
+        gc.freeze()
+
+    def serve(self):
+        # workers keep the .csv they were forked with and apply logged changes to it, they only load the .csv again
+        # when one of them compacted the log into it, only this process checks the .csv for other changes
+        self.app.config['DATASET_AUTO_RELOAD'] = False
+        # every worker gets its own chart pool, split the chart workers between them
+        self.app_module.chart_renderer.workers = max(1, self.app.config['CHART_WORKERS'] // self.workers)
+        # charts one worker renders can be asked for on any other, removed again when the server stops
+        chart_directory = tempfile.mkdtemp(prefix='movie-charts-')
+        self.app_module.chart_cache.directory = chart_directory
+
+        started = time.perf_counter()
+        self.prepare(first=True)
+        self.server = make_server(self.host, self.port, self.app, threaded=True)
+        # stopping workers wait for the threads still handling requests
+        self.server.daemon_threads = False
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_restart)
+
+        for _ in range(self.workers):
+            self.start_worker()
+        print('serving on http://%s:%d with %d workers, dataset ready in %.2fs' % (
+            self.host, self.port, self.workers, time.perf_counter() - started))
+
+        next_reload_check = time.monotonic() + self.reload_interval
+        while not self.stopping:
+            self.reap_workers()
+            if self.restart_requested or time.monotonic() >= next_reload_check:
+                self.reload()
+                next_reload_check = time.monotonic() + self.reload_interval
+            time.sleep(0.5)
+
+        self.stop_workers(self.worker_pids | self.retiring_pids)
+        self.server.server_close()
+        shutil.rmtree(chart_directory, ignore_errors=True)
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_restart(self, signum, frame):
+        self.restart_requested = True
+
+    # starts a new set of workers if the .csv changed or a restart was asked for
+    # logged changes are applied here too so workers that get replaced start from them, but don't need new workers
+    def reload(self):
+        restart_requested = self.restart_requested
+        self.restart_requested = False
+
+        dataset_cache = get_dataset_cache(self.app.config['MOVIE_DATA'])
+        dataset_cache.get_dataset()
+        file_changed = dataset_cache.file_version != self.file_version
+        if not file_changed and not restart_requested:
+            return
+
+        print('dataset changed, restarting workers' if file_changed else 'restarting workers')
+        gc.unfreeze()
+        self.prepare()
+        # new workers are taking requests before the old ones stop so nothing gets turned away
+        old_pids = self.worker_pids
+        self.worker_pids = set()
+        for _ in range(self.workers):
+            self.start_worker()
+        for pid in old_pids:
+            self.signal_worker(pid, signal.SIGTERM)
+        self.retiring_pids |= old_pids
+
+    def start_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self.run_worker()
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.worker_pids.add(pid)
+
+    # runs in the forked worker until it's told to stop
+    def run_worker(self):
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever() to return so it can't run on the serving thread
+            threading.Thread(target=self.server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        # chart files are deleted by the worker that wrote them, when it evicts them or when it stops
+        self.app_module.chart_cache.forget_written_files()
+        # chart pool is started after forking so no worker shares another's pool
+        self.app_module.chart_renderer.warm_up()
+        try:
+            self.server.serve_forever()
+        finally:
+            # waits for requests that are still being handled
+            self.server.server_close()
+            self.app_module.chart_renderer.shutdown(wait=True)
+            self.app_module.chart_cache.clear()
+
+    # collects workers that exited, replacing current workers that died
+    def reap_workers(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            self.retiring_pids.discard(pid)
+            if pid in self.worker_pids:
+                self.worker_pids.discard(pid)
+                if not self.stopping:
+                    print('worker %d exited, starting a new one' % pid)
+                    self.start_worker()
+
+    def stop_workers(self, pids):
+        for pid in pids:
+            self.signal_worker(pid, signal.SIGTERM)
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+    @staticmethod
+    def signal_worker(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+# runs the app from app_module (app.py) with the pre-fork server, settings default to the app's config
+def serve(app_module, host=None, port=None, workers=None, reload_interval=None):
+    config = app_module.app.config
+    host = host or config['SERVER_HOST']
+    port = port or config['SERVER_PORT']
+    workers = workers or config['SERVER_WORKERS']
+    reload_interval = reload_interval or config['DATA_RELOAD_INTERVAL']
+
+    # no fork() on this platform, fall back to a single process
+    if not hasattr(os, 'fork'):
+        app_module.warm_up()
+        app_module.app.run(host, port)
+        return
+
+    PreforkServer(app_module, host, port, workers, reload_interval).serve()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serves the app with a pre-fork server.')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--reload-interval', type=float)
+    args = parser.parse_args()
+
+    import app
+    serve(app, args.host, args.port, args.workers, args.reload_interval)
@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from movie_store import MovieStore
+
+
+# changed whenever the file layout or the store columns change so older snapshots get ignored
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_MAGIC = b'MOVIESNP'
+# arrays start on multiples of this so they can be used straight out of the mapped file
+SNAPSHOT_ALIGNMENT = 64
+
+
+# snapshot is kept next to the .csv it was compiled from, movie_data.csv -> movie_data.snapshot
+def get_snapshot_path(movie_data):
+    return os.path.splitext(movie_data)[0] + '.snapshot'
+
+
+def get_aligned(position):
+    return -(-position // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+# file is the magic bytes, header length, json header (source version, string table, where each array is)
+# and then the raw bytes of every array
+def write_snapshot(snapshot_path, version, store):
+    columns, string_table = store.get_columns()
+
+    arrays = {}
+    data_size = 0
+    for name, column in columns.items():
+        columns[name] = np.ascontiguousarray(column)
+        arrays[name] = {"dtype": column.dtype.str, "shape": list(column.shape), "offset": data_size}
+        data_size = get_aligned(data_size + column.nbytes)
+
+    header = json.dumps({
+        "format": SNAPSHOT_FORMAT,
+        # hash of the .csv the snapshot was compiled from
+        "version": version,
+        "strings": string_table,
+        "arrays": arrays
+    }).encode()
+    data_start = get_aligned(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+    # write next to the real file and swap it in so nobody ever maps half a snapshot
+    temporary_path = snapshot_path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for name, column in columns.items():
+            file.seek(data_start + arrays[name]["offset"])
+            file.write(column.tobytes())
+        file.truncate(data_start + data_size)
+    os.replace(temporary_path, snapshot_path)
+
+
+# returns a MovieStore backed by the memory mapped snapshot
+# None if there is no snapshot, it's unreadable or it wasn't compiled from the .csv with this version
+def read_snapshot(snapshot_path, version):
+    try:
+        with open(snapshot_path, 'rb') as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header_length = int.from_bytes(file.read(8), 'little')
+            header = json.loads(file.read(header_length))
+    except (OSError, ValueError):
+        return None
+
+    if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != version:
+        return None
+
+    # mapped read only, processes using the same snapshot share the pages
+    data = np.memmap(snapshot_path, dtype=np.uint8, mode='r')
+    data_start = get_aligned(len(SNAPSHOT_MAGIC) + 8 + header_length)
+    columns = {}
+    for name, array in header["arrays"].items():
+        dtype = np.dtype(array["dtype"])
+        shape = tuple(array["shape"])
+        columns[name] = np.frombuffer(data, dtype, int(np.prod(shape)), data_start + array["offset"]).reshape(shape)
+
+    return MovieStore.from_columns(columns, header["strings"])
+
+
+# compiles a .csv into a snapshot, run as: python snapshot.py [movie_data.csv] [output.snapshot]
+def compile_snapshot(movie_data, snapshot_path=None):
+    # DataHelper loads snapshots itself so it can only be imported once this module is
+    from DataHelper import get_load_stats, read_dataset
+
+    if snapshot_path is None:
+        snapshot_path = get_snapshot_path(movie_data)
+
+    start = time.perf_counter()
+    dataset = read_dataset(movie_data)
+    load_stats = get_load_stats('csv', len(dataset.store), time.perf_counter() - start)
+    write_snapshot(snapshot_path, dataset.version, dataset.store)
+    print('read %d movies from %s in %.2fs (%d rows/sec), compiled into %s in %.2fs' % (
+        load_stats["rows"], movie_data, load_stats["seconds"], load_stats["rows_per_second"], snapshot_path,
+        time.perf_counter() - start))
+    return snapshot_path
+
+
+if __name__ == '__main__':
+    compile_snapshot(*(sys.argv[1:3] or ['movie_data.csv']))
@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# app modules sit at the top of the repo instead of in a package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+# copy of the shipped .csv in a temporary directory, change logs and snapshots made by a test never touch the real one
+@pytest.fixture
+def movie_data(tmp_path):
+    path = str(tmp_path / 'movie_data.csv')
+    shutil.copy(os.path.join(REPO_DIR, 'movie_data.csv'), path)
+    return path
+
+
+# test client of the app reading a copy of the .csv, with the shared caches emptied and charts drawn in this process
+@pytest.fixture
+def client(movie_data, monkeypatch):
+    import app as app_module
+    import charts
+
+    monkeypatch.setitem(app_module.app.config, 'MOVIE_DATA', movie_data)
+    monkeypatch.setattr(app_module, 'chart_renderer', charts.ChartRenderer(0, app_module.app.config['CHART_TIMEOUT']))
+    app_module.prediction_cache.clear()
+    app_module.chart_cache.clear()
+    return app_module.app.test_client()
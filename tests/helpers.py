@@ -0,0 +1,31 @@
+import numpy as np
+
+from movie_store import GENRES, MONTHS, SALES_TYPES, STORE_COLUMNS, YEAR_COLUMNS
+
+
+# every column and index of the two stores hold the same movies in the same order
+# rating/distributor codes can be numbered differently, so the names they stand for are compared instead
+def assert_same_store(store, expected):
+    assert len(store) == len(expected)
+    for name in STORE_COLUMNS:
+        if name not in ('rating_codes', 'distributor_codes'):
+            np.testing.assert_array_equal(getattr(store, name), getattr(expected, name), err_msg=name)
+    assert get_category_values(store.rating_names, store.rating_codes) == \
+        get_category_values(expected.rating_names, expected.rating_codes)
+    assert get_category_values(store.distributor_names, store.distributor_codes) == \
+        get_category_values(expected.distributor_names, expected.distributor_codes)
+
+    for sales_type in SALES_TYPES:
+        np.testing.assert_array_equal(store.sales_order[sales_type], expected.sales_order[sales_type])
+        np.testing.assert_array_equal(store.sales_keys[sales_type], expected.sales_keys[sales_type])
+        np.testing.assert_array_equal(store.year_sales_cumsum[sales_type], expected.year_sales_cumsum[sales_type])
+    for genre in GENRES:
+        np.testing.assert_array_equal(store.genre_index[genre], expected.genre_index[genre], err_msg=genre)
+    for month in MONTHS:
+        np.testing.assert_array_equal(store.month_index[month], expected.month_index[month], err_msg=month)
+    for name in YEAR_COLUMNS:
+        np.testing.assert_array_equal(getattr(store, name), getattr(expected, name), err_msg=name)
+
+
+def get_category_values(names, codes):
+    return [names[code] for code in codes]
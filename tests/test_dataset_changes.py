@@ -0,0 +1,140 @@
+import random
+
+import numpy as np
+import pytest
+
+from DataHelper import Dataset, DatasetCache
+from helpers import assert_same_store
+from movie import Movie
+from movie_changes import InvalidMovieError, get_movie_fields
+from movie_store import GENRES, MONTHS, MovieStore
+from sales_cube import RATINGS
+from top_sellers import TopSellers
+
+
+# random api fields for a movie, all of them for a new movie or a few of them for an update
+def get_random_fields(rng, new_movie):
+    fields = {
+        "title": '%s %d' % (rng.choice(['Star Wars Story', 'Batman', 'Dark Knight', 'Small Film']), rng.randrange(100)),
+        "distributor": rng.choice(['Walt Disney Studios Motion Pictures', 'Warner Bros.', 'New Distributor']),
+        "rating": rng.choice(list(RATINGS) + ['NC-17']),
+        "domestic_sales": rng.randrange(10 ** 9),
+        "international_sales": rng.randrange(10 ** 9),
+        "genres": rng.sample(GENRES, rng.randint(1, 4)),
+        "release_date": rng.choice([None, '%d-%s-%02d' % (rng.randint(1, 28), rng.choice(MONTHS), rng.randrange(100))]),
+        "runtime": rng.choice([None, rng.randint(60, 200)])
+    }
+    if new_movie:
+        return fields
+    return {name: fields[name] for name in rng.sample(sorted(fields), rng.randint(1, 4))}
+
+
+# dataset built from scratch out of the movies of another dataset
+def rebuild(dataset):
+    store = dataset.store
+    movies = [Movie(*get_movie_fields(store.row(row))) for row in range(len(store))]
+    return Dataset('rebuilt', MovieStore(movies))
+
+
+def assert_same_dataset(dataset, expected):
+    assert_same_store(dataset.store, expected.store)
+    for name in ('counts', 'sums', 'highest', 'lowest', 'genre_rank_points'):
+        np.testing.assert_array_equal(getattr(dataset.cube, name), getattr(expected.cube, name), err_msg=name)
+    assert dataset.cube.genre_combos == expected.cube.genre_combos
+    assert dataset.cube.movie_count == expected.cube.movie_count
+    for series, rows in expected.series.series_rows.items():
+        np.testing.assert_array_equal(dataset.series.series_rows[series], rows, err_msg=series)
+        np.testing.assert_array_equal(dataset.series.primary_rows[series], expected.series.primary_rows[series])
+
+
+def apply_random_changes(cache, amount, seed=0):
+    rng = random.Random(seed)
+    for _ in range(amount):
+        rows = len(cache.get_dataset().store)
+        row = None if rng.random() < 0.3 else rng.randrange(rows)
+        cache.apply_change(row, get_random_fields(rng, row is None), compact_after=10 ** 6)
+
+
+def test_changes_match_full_rebuild(movie_data):
+    cache = DatasetCache(movie_data)
+    apply_random_changes(cache, 200)
+
+    dataset = cache.get_dataset()
+    assert_same_dataset(dataset, rebuild(dataset))
+
+
+def test_change_log_replay_matches(movie_data):
+    cache = DatasetCache(movie_data)
+    apply_random_changes(cache, 100)
+
+    # another process starting up replays the log on top of the .csv and ends up with the same dataset
+    replayed = DatasetCache(movie_data).get_dataset()
+    assert replayed.version == cache.get_dataset().version
+    assert_same_dataset(replayed, cache.get_dataset())
+
+
+def test_changes_from_other_process_are_picked_up(movie_data):
+    cache = DatasetCache(movie_data)
+    other_cache = DatasetCache(movie_data)
+    cache.get_dataset()
+    other_cache.get_dataset()
+
+    cache.apply_change(3, {"title": "Changed Title"})
+    # fields that weren't sent keep the latest values even though this process hadn't seen the change yet
+    _, dataset, _ = other_cache.apply_change(3, {"domestic_sales": 5})
+    assert dataset.store.row(3).title == 'Changed Title'
+    assert dataset.store.row(3).domestic_sales == 5
+    assert cache.get_dataset().version == dataset.version
+
+
+def test_compacted_csv_matches(movie_data):
+    cache = DatasetCache(movie_data)
+    apply_random_changes(cache, 50)
+    cache.compact()
+
+    assert cache.stats()["logged_changes"] == 0
+    assert_same_dataset(DatasetCache(movie_data).get_dataset(), cache.get_dataset())
+
+
+def test_invalid_changes_are_not_logged(movie_data):
+    cache = DatasetCache(movie_data)
+    version = cache.get_dataset().version
+
+    with pytest.raises(InvalidMovieError):
+        cache.apply_change(0, {"runtime": 40000})
+    with pytest.raises(InvalidMovieError):
+        cache.apply_change(0, {"domestic_sales": 2 ** 63})
+    with pytest.raises(IndexError):
+        cache.apply_change(10 ** 6, {"title": "Nothing Here"})
+    assert DatasetCache(movie_data).get_dataset().version == version
+
+
+def test_compaction_by_other_process_is_picked_up(movie_data):
+    cache = DatasetCache(movie_data)
+    other_cache = DatasetCache(movie_data)
+    cache.get_dataset()
+    other_cache.get_dataset(check_file=False)
+
+    other_cache.apply_change(3, {"title": "Changed Title"})
+    other_cache.compact()
+    # the change isn't in the log anymore, a process only following the log loads the .csv it went into
+    assert cache.get_dataset(check_file=False).store.row(3).title == 'Changed Title'
+
+
+def test_updated_top_sellers_match_new_ones(movie_data):
+    cache = DatasetCache(movie_data)
+    dataset = cache.get_dataset()
+    queries = [
+        {"genre": 'Action'}, {"month": 'Dec'}, {"rating": 'PG-13', "year": 2009}, {"distributor": 'Warner Bros.'}
+    ]
+    for filters in queries:
+        dataset.top_sellers.top('World', 10, filters)
+
+    row = next(row for row in range(len(dataset.store)) if dataset.store.row(row).title == 'Avatar (2009)')
+    _, changed, _ = cache.apply_change(row, {"international_sales": 0, "genres": ['Comedy'], "rating": 'R'})
+    _, added, _ = cache.apply_change(None, get_random_fields(random.Random(1), True))
+    for changed_dataset in (changed, added):
+        new_top_sellers = TopSellers(changed_dataset.store)
+        for filters in queries:
+            np.testing.assert_array_equal(changed_dataset.top_sellers.top('World', 10, filters),
+                                          new_top_sellers.top('World', 10, filters), err_msg=str(filters))
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from conftest import REPO_DIR
+from DataHelper import DatasetCache
+from http_cache import IMMUTABLE_MAX_AGE
+
+CSS_PATH = 'styles/main_page.css'
+
+
+def get_css_version():
+    with open(os.path.join(REPO_DIR, 'static', CSS_PATH), 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+@pytest.mark.parametrize('path', ['/', '/api/years/summary?start=1990&end=1999', '/api/runtimes'])
+def test_repeated_get_is_not_modified(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag, _ = response.get_etag()
+    assert etag
+    assert response.cache_control.no_cache
+
+    response = client.get(path, headers={'If-None-Match': '"%s"' % etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.get_etag() == (etag, False)
+
+    response = client.get(path, headers={'If-None-Match': '"not-the-etag"'})
+    assert response.status_code == 200
+
+
+def test_json_etag_changes_with_the_dataset(client, movie_data):
+    path = '/api/years/summary?start=2009&end=2009'
+    etag, _ = client.get(path).get_etag()
+
+    DatasetCache(movie_data).apply_change(0, {"domestic_sales": 1})
+    response = client.get(path, headers={'If-None-Match': '"%s"' % etag})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_compressed_response_has_its_own_etag(client):
+    identity = client.get('/api/runtimes', headers={'Accept-Encoding': 'identity'})
+    assert identity.content_encoding is None
+    etag, _ = identity.get_etag()
+
+    compressed = client.get('/api/runtimes', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in compressed.vary
+    assert compressed.get_etag()[0] == etag + '-gzip'
+    assert gzip.decompress(compressed.get_data()) == identity.get_data()
+
+    # either representation the browser has is still good
+    for cached_etag in (etag, etag + '-gzip'):
+        headers = {'Accept-Encoding': 'gzip', 'If-None-Match': '"%s"' % cached_etag}
+        response = client.get('/api/runtimes', headers=headers)
+        assert response.status_code == 304
+
+
+def test_small_and_image_responses_are_not_compressed(client):
+    response = client.get('/api/years/summary?start=1800&end=1801', headers={'Accept-Encoding': 'gzip'})
+    assert response.content_encoding is None
+    response = client.get('/static/genre_sales.png', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding is None
+
+
+def test_static_files_are_immutable_with_their_version(client):
+    version = get_css_version()
+
+    response = client.get('/static/' + CSS_PATH)
+    assert response.get_etag() == (version, False)
+    assert response.cache_control.no_cache
+
+    response = client.get('/static/%s?v=%s' % (CSS_PATH, version))
+    assert response.cache_control.max_age == IMMUTABLE_MAX_AGE
+    assert response.cache_control.immutable
+    # an old version in the url gets the current file, but it can't be kept for good
+    response = client.get('/static/%s?v=old' % CSS_PATH)
+    assert response.status_code == 200
+    assert response.cache_control.no_cache
+
+    assert client.get('/static/missing.css').status_code == 404
+    assert client.get('/static/../app.py').status_code == 404
+
+
+def test_pages_link_versioned_static_files(client):
+    page = client.get('/').get_data(as_text=True)
+    assert '%s?v=%s' % (CSS_PATH, get_css_version()) in page
+
+
+def test_chart_urls_are_immutable(client):
+    # a chart key is made from the chart's data, so whatever the browser has for it is still good
+    response = client.get('/charts/%s.png' % ('0' * 40), headers={'If-None-Match': '"%s"' % ('0' * 40)})
+    assert response.status_code == 304
+    assert response.cache_control.immutable
+
+    assert client.get('/charts/%s.png' % ('0' * 40)).status_code == 404
@@ -0,0 +1,78 @@
+import pytest
+
+import app as app_module
+from DataHelper import DatasetCache
+from prediction import predict_movie
+
+WRITE_TOKEN = 'test-token'
+AUTHORIZATION = {'Authorization': 'Bearer ' + WRITE_TOKEN}
+
+ACTION_SCENARIO = {'action': 'Action', 'adventure': 'Adventure', 'ratings': 'PG-13', 'months': 'Dec',
+                   'series': 'Star Wars'}
+HORROR_SCENARIO = {'horror': 'Horror', 'ratings': 'R', 'months': 'Oct', 'series': 'None'}
+
+
+@pytest.fixture
+def writes_enabled(monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'MOVIE_WRITES_ENABLED', True)
+    monkeypatch.setitem(app_module.app.config, 'MOVIE_WRITE_TOKEN', WRITE_TOKEN)
+
+
+def get_cached_predictions(dataset_version):
+    return {
+        scenario_key[1:]: result
+        for scenario_key, (_, result) in app_module.prediction_cache.results.items()
+        if scenario_key[0] == dataset_version
+    }
+
+
+def test_writes_are_off_by_default(client):
+    assert client.patch('/api/movies/0', json={"domestic_sales": 1}, headers=AUTHORIZATION).status_code == 404
+
+
+def test_writes_need_the_token(client, writes_enabled):
+    assert client.patch('/api/movies/0', json={"domestic_sales": 1}).status_code == 401
+    assert client.patch('/api/movies/0', json={"domestic_sales": 1},
+                        headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.patch('/api/movies/0', json={"domestic_sales": 1}, headers=AUTHORIZATION)
+    assert response.status_code == 200
+    assert response.get_json()["movie"]["domestic_sales"] == 1
+
+
+def test_change_keeps_predictions_it_does_not_feed_into(client, writes_enabled):
+    for scenario in (ACTION_SCENARIO, HORROR_SCENARIO):
+        assert client.post('/prediction_results', data=scenario).status_code == 200
+    dataset = app_module.get_dataset()
+    cached = get_cached_predictions(dataset.version)
+
+    # a comedy released in June only feeds into the rating averages of these scenarios
+    row = next(row for row in range(len(dataset.store)) if dataset.store.row(row).title == 'The Hangover (2009)')
+    response = client.patch('/api/movies/%d' % row, json={"domestic_sales": 10 ** 10}, headers=AUTHORIZATION)
+    changed_dataset = app_module.get_dataset()
+    carried = get_cached_predictions(response.get_json()["dataset_version"])
+    assert carried.keys() == cached.keys()
+    for scenario_key, (prediction, chart_keys) in carried.items():
+        assert prediction == predict_movie(changed_dataset, list(scenario_key[0]), *scenario_key[1:])
+        # only the rating chart has new data
+        assert [name for name in chart_keys if chart_keys[name] != cached[scenario_key][1][name]] == ['RatingSales']
+
+    # an action movie released in December feeds into the first scenario, so only the second one is kept
+    row = next(row for row in range(len(dataset.store)) if dataset.store.row(row).title == 'Avatar (2009)')
+    response = client.patch('/api/movies/%d' % row, json={"domestic_sales": 5}, headers=AUTHORIZATION)
+    assert [scenario_key[3] for scenario_key in get_cached_predictions(response.get_json()["dataset_version"])] == \
+        ['None']
+
+
+def test_changes_logged_by_another_worker_carry_over_predictions(client, movie_data):
+    assert client.post('/prediction_results', data=HORROR_SCENARIO).status_code == 200
+    dataset = app_module.get_dataset()
+
+    # another worker of the pre-fork server logs the change, this one replays it on its next request
+    row = next(row for row in range(len(dataset.store)) if dataset.store.row(row).title == 'The Hangover (2009)')
+    DatasetCache(movie_data).apply_change(row, {"domestic_sales": 10 ** 10})
+    changed_dataset = app_module.get_dataset()
+    assert changed_dataset.store.row(row).domestic_sales == 10 ** 10
+    carried = get_cached_predictions(changed_dataset.version)
+    assert len(carried) == 1
+    for scenario_key, (prediction, _) in carried.items():
+        assert prediction == predict_movie(changed_dataset, list(scenario_key[0]), *scenario_key[1:])
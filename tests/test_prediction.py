@@ -0,0 +1,92 @@
+import os
+import random
+
+import pytest
+
+from DataHelper import DataHelper, read_dataset
+from movie_store import GENRES, MONTHS, parse_genres
+from prediction import project_sales
+from sales_cube import RATINGS
+from series_index import SERIES
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# projection the way it was worked out before the sales cube, one pass over every movie per selected genre
+# movies keep the .csv text, so sales get converted the same way the old loop did
+# genres are matched whole like the store does, so 'Music' doesn't count movies that are only 'Musical'
+def project_sales_by_scanning(movies, selected_genres, selected_movie_rating, selected_release_month,
+                              series_selection):
+    domestic_sales = 0
+    international_sales = 0
+    world_sales = 0
+    movies_with_genre = 0
+    for genre in selected_genres:
+        for movie in movies:
+            if genre in parse_genres(movie.genre):
+                domestic_sales += int(movie.domestic_sales)
+                international_sales += int(movie.international_sales)
+                world_sales += int(movie.world_sales)
+                movies_with_genre += 1
+    domestic_sales /= len(selected_genres) * movies_with_genre
+    international_sales /= len(selected_genres) * movies_with_genre
+    world_sales /= len(selected_genres) * movies_with_genre
+
+    month_sales = [int(movie.world_sales) for movie in movies if selected_release_month in movie.release_date]
+    month_average_sales = sum(month_sales) / len(month_sales)
+    domestic_sales = (month_average_sales + domestic_sales) / 2
+    international_sales += (month_average_sales + international_sales) / 2
+    world_sales += (month_average_sales + world_sales) / 2
+
+    if selected_movie_rating == 'R':
+        domestic_sales *= 0.7
+        international_sales *= 0.7
+        world_sales = domestic_sales + international_sales
+
+    if series_selection != 'None' and any(series_selection in movie.title for movie in movies):
+        domestic_sales += domestic_sales * 0.2
+        international_sales += international_sales * 0.2
+        world_sales = domestic_sales + international_sales
+
+    if len(selected_genres) > 8:
+        domestic_sales -= domestic_sales * (0.1 * (len(selected_genres) - 8))
+        international_sales -= international_sales * (0.1 * (len(selected_genres) - 8))
+        world_sales = domestic_sales + international_sales
+
+    return domestic_sales, international_sales, world_sales
+
+
+def get_scenarios(amount, seed=0):
+    rng = random.Random(seed)
+    series_choices = ['None'] + list(SERIES)
+    scenarios = []
+    for _ in range(amount):
+        scenarios.append((rng.sample(GENRES, rng.randint(1, len(GENRES))), rng.choice(RATINGS), rng.choice(MONTHS),
+                          rng.choice(series_choices)))
+    return scenarios
+
+
+@pytest.fixture(scope='module')
+def movie_data_path():
+    return os.path.join(REPO_DIR, 'movie_data.csv')
+
+
+def test_batch_matches_scanning_every_movie(movie_data_path):
+    movies = DataHelper().retrieve_movies(movie_data_path)
+    dataset = read_dataset(movie_data_path)
+    scenarios = get_scenarios(300)
+
+    projected = project_sales(dataset, *zip(*scenarios))
+    for scenario, domestic_sales, international_sales, world_sales in zip(scenarios, *projected):
+        expected = project_sales_by_scanning(movies, *scenario)
+        assert (domestic_sales, international_sales, world_sales) == pytest.approx(expected, rel=1e-9), scenario
+
+
+def test_batch_of_one_matches_batch(movie_data_path):
+    dataset = read_dataset(movie_data_path)
+    scenarios = get_scenarios(20, seed=1)
+
+    projected = project_sales(dataset, *zip(*scenarios))
+    for index, scenario in enumerate(scenarios):
+        single = project_sales(dataset, *([value] for value in scenario))
+        assert [float(sales[0]) for sales in single] == [float(sales[index]) for sales in projected]
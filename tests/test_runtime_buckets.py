@@ -0,0 +1,94 @@
+from collections import defaultdict
+import statistics
+
+import pytest
+
+import app as app_module
+from DataHelper import DatasetCache
+from movie_store import GENRES, parse_genres
+from runtime_buckets import BUCKET_MINUTES, RuntimeBuckets
+from sales_cube import RATINGS
+
+SCENARIO = {"genres": ['Action', 'Adventure'], "rating": 'PG-13', "month": 'Dec', "series": 'None'}
+
+
+# world sales of the movies in each (bucket start, genre, rating) cell, collected one movie at a time
+# 'All' is the cell every movie is also counted in, 'Unrated' has the movies without one of RATINGS
+def get_cell_sales(store):
+    cell_sales = defaultdict(list)
+    for row in range(len(store)):
+        movie = store.row(row)
+        if store.runtime_minutes[row] < 0:
+            continue
+        bucket_start = store.runtime_minutes[row] // BUCKET_MINUTES * BUCKET_MINUTES
+        rating = movie.rating if movie.rating in RATINGS else 'Unrated'
+        for genre in [genre for genre in GENRES if genre in parse_genres(movie.genre)] + ['All']:
+            for rating_cell in (rating, 'All'):
+                cell_sales[(bucket_start, genre, rating_cell)].append(int(store.world_sales[row]))
+    return cell_sales
+
+
+def test_runtime_grids_match_scan(client, movie_data):
+    cell_sales = get_cell_sales(DatasetCache(movie_data).get_dataset().store)
+
+    response = client.get('/api/runtimes')
+    assert response.status_code == 200
+    runtimes = response.get_json()
+    assert runtimes["bucket_minutes"] == BUCKET_MINUTES
+    assert runtimes["bucket_starts"][0] == min(cell[0] for cell in cell_sales)
+    assert runtimes["bucket_starts"][-1] == max(cell[0] for cell in cell_sales)
+    for bucket, bucket_start in enumerate(runtimes["bucket_starts"]):
+        for genre_slot, genre in enumerate(runtimes["genres"]):
+            for rating_slot, rating in enumerate(runtimes["ratings"]):
+                sales = cell_sales.get((bucket_start, genre, rating), [])
+                cell = (bucket_start, genre, rating)
+                assert runtimes["movie_counts"][bucket][genre_slot][rating_slot] == len(sales), cell
+                if not sales:
+                    assert runtimes["average_world_sales"][bucket][genre_slot][rating_slot] is None, cell
+                    assert runtimes["median_world_sales"][bucket][genre_slot][rating_slot] is None, cell
+                    continue
+                assert runtimes["average_world_sales"][bucket][genre_slot][rating_slot] == \
+                    pytest.approx(statistics.mean(sales), abs=0.5), cell
+                assert runtimes["median_world_sales"][bucket][genre_slot][rating_slot] == \
+                    pytest.approx(statistics.median(sales), abs=0.5), cell
+
+
+def test_runtime_modifier(movie_data):
+    store = DatasetCache(movie_data).get_dataset().store
+    runtime_buckets = RuntimeBuckets.from_store(store)
+    cell_sales = get_cell_sales(store)
+    rated_sales = [sales for cell, cell_sales in cell_sales.items() if cell[1:] == ('All', 'PG-13')
+                   for sales in cell_sales]
+
+    bucket_sales = cell_sales[(120, 'All', 'PG-13')]
+    assert runtime_buckets.runtime_modifier(125, 'PG-13') == \
+        pytest.approx(statistics.mean(bucket_sales) / statistics.mean(rated_sales))
+    # nothing to compare a runtime no movie has against
+    assert runtime_buckets.runtime_modifier(1, 'PG-13') == 1.0
+    assert runtime_buckets.runtime_modifier(10000, 'PG-13') == 1.0
+
+
+def test_empty_store_has_no_buckets(movie_data):
+    store = DatasetCache(movie_data).get_dataset().store
+    store.runtime_minutes = store.runtime_minutes.copy()
+    store.runtime_minutes[:] = -1
+    runtime_buckets = RuntimeBuckets.from_store(store)
+    assert runtime_buckets.bucket_starts() == []
+    assert runtime_buckets.runtime_modifier(120, 'R') == 1.0
+
+
+def test_predictions_scaled_by_runtime(client):
+    response = client.post('/api/predictions', json={"scenarios": [SCENARIO, dict(SCENARIO, runtime=125)]})
+    assert response.status_code == 200
+    without_runtime, with_runtime = response.get_json()["predictions"]
+
+    modifier = app_module.get_dataset().get_runtime_buckets().runtime_modifier(125, 'PG-13')
+    assert modifier != 1.0
+    for name in ('domestic_sales', 'international_sales', 'world_sales'):
+        assert with_runtime[name] == pytest.approx(without_runtime[name] * modifier)
+
+
+@pytest.mark.parametrize('runtime', [0, -5, 90.5, 'long', True])
+def test_bad_runtime(client, runtime):
+    response = client.post('/api/predictions', json={"scenarios": [dict(SCENARIO, runtime=runtime)]})
+    assert response.status_code == 400
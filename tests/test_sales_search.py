@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from app import get_sales_page
+from DataHelper import DatasetCache
+
+SEARCH_FORM = {'sales_type': 'World', 'top_month_movie': 'Dec', 'top_genre_movie': 'Action'}
+
+
+# rows the old search loop found, movies with sales strictly between min and max from highest to lowest sales
+def find_sales_rows(store, sales_type, minimum_sales, maximum_sales):
+    sales = store.sales(sales_type)
+    rows = [row for row in range(len(store)) if minimum_sales < sales[row] < maximum_sales]
+    return sorted(rows, key=lambda row: -sales[row])
+
+
+def search(client, minimum_sales, maximum_sales, **page):
+    form = dict(SEARCH_FORM, min_input=minimum_sales, max_input=maximum_sales, **page)
+    response = client.post('/search_results', data=form)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def get_page_cursors(page):
+    return [int(cursor) for cursor in re.findall(r'name="cursor" value="(\d+)"', page)]
+
+
+@pytest.mark.parametrize('sales_type, minimum_sales, maximum_sales', [
+    ('World', 0, 10 ** 12),
+    ('Domestic', 10 ** 8, 5 * 10 ** 8),
+    ('International', -(2 ** 70), 2 ** 70),
+    ('World', 5, 4)
+])
+def test_pages_cover_every_match(movie_data, sales_type, minimum_sales, maximum_sales):
+    store = DatasetCache(movie_data).get_dataset().store
+    expected = find_sales_rows(store, sales_type, minimum_sales, maximum_sales)
+
+    rows = []
+    for cursor in range(0, len(expected) + 37, 37):
+        page_rows, total_movies = get_sales_page(store, sales_type, minimum_sales, maximum_sales, cursor, 37)
+        assert total_movies == len(expected)
+        rows.extend(int(row) for row in page_rows)
+    sales = store.sales(sales_type)
+    # movies with the same sales can come in either order
+    assert [sales[row] for row in rows] == [sales[row] for row in expected]
+    assert sorted(rows) == sorted(expected)
+
+
+def test_search_page_links_to_previous_and_next(client, movie_data):
+    total_movies = len(find_sales_rows(DatasetCache(movie_data).get_dataset().store, 'World', 0, 3000000000))
+
+    page = search(client, 0, 3000000000, cursor=100, limit=100)
+    assert 'Showing 101 - 200 of %d' % total_movies in page
+    assert get_page_cursors(page) == [0, 200]
+
+    page = search(client, 0, 3000000000, limit=100)
+    assert 'Showing 1 - 100 of %d' % total_movies in page
+    assert get_page_cursors(page) == [100]
+
+
+@pytest.mark.parametrize('cursor', [950, 5000, 10 ** 30])
+def test_cursor_past_the_end_shows_the_last_page(client, cursor):
+    page = search(client, 0, 3000000000, cursor=cursor, limit=100)
+    total_movies = int(re.search(r'Showing \d+ - \d+ of (\d+)', page).group(1))
+    last_page = (total_movies - 1) // 100 * 100
+    assert 'Showing %d - %d of %d' % (last_page + 1, total_movies, total_movies) in page
+    assert get_page_cursors(page) == [last_page - 100]
+
+
+def test_search_without_matches_has_no_pages(client):
+    page = search(client, 5, 4, cursor=300, limit=100)
+    assert 'Showing' not in page
+    assert 'No Results' in page
+    assert get_page_cursors(page) == []
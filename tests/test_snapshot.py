@@ -0,0 +1,39 @@
+import numpy as np
+
+from DataHelper import DatasetCache, read_dataset
+from helpers import assert_same_store
+from snapshot import compile_snapshot, get_snapshot_path, read_snapshot, write_snapshot
+
+
+def test_snapshot_round_trip(movie_data, tmp_path):
+    dataset = read_dataset(movie_data)
+    snapshot_path = str(tmp_path / 'round_trip.snapshot')
+    write_snapshot(snapshot_path, dataset.version, dataset.store)
+
+    store = read_snapshot(snapshot_path, dataset.version)
+    assert_same_store(store, dataset.store)
+    columns, string_table = store.get_columns()
+    expected_columns, expected_string_table = dataset.store.get_columns()
+    assert string_table == expected_string_table
+    assert columns.keys() == expected_columns.keys()
+    for name, column in expected_columns.items():
+        assert columns[name].dtype == column.dtype, name
+        np.testing.assert_array_equal(columns[name], column, err_msg=name)
+
+
+def test_snapshot_of_other_version_is_ignored(movie_data, tmp_path):
+    dataset = read_dataset(movie_data)
+    snapshot_path = str(tmp_path / 'old.snapshot')
+    write_snapshot(snapshot_path, dataset.version, dataset.store)
+
+    assert read_snapshot(snapshot_path, 'some other version') is None
+    assert read_snapshot(str(tmp_path / 'missing.snapshot'), dataset.version) is None
+
+
+def test_compiled_snapshot_is_loaded(movie_data):
+    assert compile_snapshot(movie_data) == get_snapshot_path(movie_data)
+
+    cache = DatasetCache(movie_data)
+    dataset = cache.get_dataset()
+    assert cache.stats()["last_load"]["source"] == 'snapshot'
+    assert_same_store(dataset.store, read_dataset(movie_data).store)
@@ -0,0 +1,93 @@
+import pytest
+
+import app as app_module
+from DataHelper import DatasetCache
+from movie_store import MONTHS, parse_genres, parse_release_date
+from top_sellers import is_known_value
+
+
+# filter values of a movie, worked out one movie at a time
+def get_movie_values(movie):
+    release_date = parse_release_date(movie.release_date, movie.title)
+    return {
+        "month": MONTHS[release_date.month - 1] if release_date else None,
+        "genre": parse_genres(movie.genre),
+        "rating": movie.rating,
+        "distributor": movie.distributor,
+        "year": release_date.year if release_date else None
+    }
+
+
+# rows of the k highest selling movies matching every filter, the old way: a scan over every movie
+# first movie in the dataset wins ties
+def find_top_rows(store, sales_type, k, filters):
+    sales = store.sales(sales_type)
+    rows = []
+    for row in range(len(store)):
+        values = get_movie_values(store.row(row))
+        if all(value in values[field] if field == 'genre' else value == values[field]
+               for field, value in filters.items()):
+            rows.append(row)
+    return sorted(rows, key=lambda row: (-sales[row], row))[:k]
+
+
+def get_top_rows(client, query):
+    response = client.get('/api/movies/top?' + query)
+    assert response.status_code == 200
+    return [movie["row"] for movie in response.get_json()["movies"]]
+
+
+@pytest.mark.parametrize('sales_type, k, filters', [
+    ('World', 10, {}),
+    ('World', 10, {"month": 'Dec'}),
+    ('Domestic', 25, {"genre": 'Music'}),
+    ('International', 5, {"rating": 'PG-13', "genre": 'Action'}),
+    ('World', 50, {"distributor": 'Warner Bros.', "month": 'Jul'}),
+    ('World', 10, {"year": 2009, "genre": 'Comedy', "rating": 'R'}),
+    ('World', 100, {"genre": 'Action', "month": 'May', "year": 2012, "rating": 'PG-13',
+                    "distributor": 'Walt Disney Studios Motion Pictures'}),
+    ('World', 10, {"genre": 'Western', "month": 'Feb', "rating": 'G'})
+])
+def test_top_movies_match_scan(client, movie_data, sales_type, k, filters):
+    store = DatasetCache(movie_data).get_dataset().store
+    expected = find_top_rows(store, sales_type, k, filters)
+
+    query = '&'.join(['sales_type=%s' % sales_type, 'limit=%d' % k] +
+                     ['%s=%s' % (field, value) for field, value in filters.items()])
+    assert get_top_rows(client, query) == expected
+
+
+@pytest.mark.parametrize('query', ['rating=NC-17', 'distributor=Nobody', 'year=1800', 'year=2009&rating=Unknown'])
+def test_unknown_values_have_no_movies(client, query):
+    assert get_top_rows(client, query) == []
+    # values no movie has don't get a sorted list of their own
+    top_sellers = app_module.get_dataset().top_sellers
+    assert all(is_known_value(top_sellers.store, field, value) for field, value, _ in top_sellers.sorted_rows)
+
+
+def test_limit_is_clamped(client):
+    assert len(get_top_rows(client, 'limit=0')) == 1
+    assert len(get_top_rows(client, 'limit=-5')) == 1
+    assert len(get_top_rows(client, 'limit=100000')) == app_module.app.config['TOP_MOVIES_MAX_COUNT']
+
+
+@pytest.mark.parametrize('query', [
+    'month=December', 'genre=action', 'genre=Musicals', 'sales_type=Total', 'limit=ten', 'year=2009.5'
+])
+def test_bad_arguments(client, query):
+    response = client.get('/api/movies/top?' + query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_top_movies_follow_changes(client, movie_data, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'MOVIE_WRITES_ENABLED', True)
+    monkeypatch.setitem(app_module.app.config, 'MOVIE_WRITE_TOKEN', 'test-token')
+    top_row, = get_top_rows(client, 'limit=1&genre=Horror')
+
+    response = client.patch('/api/movies/%d' % top_row, json={"genres": ['Comedy']},
+                            headers={'Authorization': 'Bearer test-token'})
+    assert response.status_code == 200
+    store = DatasetCache(movie_data).get_dataset().store
+    assert get_top_rows(client, 'limit=10&genre=Horror') == find_top_rows(store, 'World', 10, {"genre": 'Horror'})
+    assert top_row in get_top_rows(client, 'limit=100&genre=Comedy')
@@ -0,0 +1,93 @@
+from datetime import date
+
+import pytest
+
+from DataHelper import DatasetCache
+from movie_store import SALES_TYPES, parse_release_date
+
+
+# release year of every dated movie worked out one movie at a time
+def get_movie_years(store):
+    movie_years = {}
+    for row in range(len(store)):
+        movie = store.row(row)
+        release_date = parse_release_date(movie.release_date, movie.title)
+        if release_date is not None:
+            movie_years[row] = release_date.year
+    return movie_years
+
+
+# totals the old way, a scan over every movie released from start to end year
+def get_year_totals(store, movie_years, start_year, end_year):
+    rows = [row for row, year in movie_years.items() if start_year <= year <= end_year]
+    sales = {sales_type: sum(int(store.sales(sales_type)[row]) for row in rows) for sales_type in SALES_TYPES}
+    top_movie = min(rows, key=lambda row: (-store.world_sales[row], row)) if rows else None
+    return sales, len(rows), top_movie
+
+
+@pytest.mark.parametrize('release_date, title, expected', [
+    ('15-Dec-39', 'Gone with the Wind (1939)', date(1939, 12, 15)),
+    ('16-Dec-15', 'Star Wars: Episode VII - The Force Awakens (2015)', date(2015, 12, 16)),
+    ('1-Jan-01', 'Old Movie (1901)', date(1901, 1, 1)),
+    ('15-Dec-39', None, date(1939, 12, 15)),
+    ('16-Dec-15', 'No Year In Title', date(2015, 12, 16)),
+    # 1900 isn't a leap year, the date keeps the century it parsed with
+    ('29-Feb-00', 'Leap Day (1900)', date(2000, 2, 29)),
+    ('NA', 'Missing Date (1999)', None)
+])
+def test_release_date_century(release_date, title, expected):
+    assert parse_release_date(release_date, title) == expected
+
+
+# release dates don't always match the title year, but they're never a century off it
+def test_release_years_are_in_the_century_of_the_title(movie_data):
+    store = DatasetCache(movie_data).get_dataset().store
+    for row, year in get_movie_years(store).items():
+        title = store.row(row).title
+        if title.endswith(')') and title[-5:-1].isdigit():
+            assert abs(year - int(title[-5:-1])) < 50, title
+
+
+@pytest.mark.parametrize('start_year, end_year', [(1990, 1999), (1939, 1939), (2019, 2100), (1800, 1850)])
+def test_year_summary_matches_scan(client, movie_data, start_year, end_year):
+    store = DatasetCache(movie_data).get_dataset().store
+    sales, movie_count, top_movie = get_year_totals(store, get_movie_years(store), start_year, end_year)
+
+    response = client.get('/api/years/summary?start=%d&end=%d' % (start_year, end_year))
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary["movie_count"] == movie_count
+    assert summary["domestic_sales"] == sales['Domestic']
+    assert summary["international_sales"] == sales['International']
+    assert summary["world_sales"] == sales['World']
+    if top_movie is None:
+        assert summary["top_movie"] is None
+    else:
+        assert summary["top_movie"]["title"] == store.row(top_movie).title
+
+
+def test_year_sales_match_scan(client, movie_data):
+    store = DatasetCache(movie_data).get_dataset().store
+    movie_years = get_movie_years(store)
+
+    response = client.get('/api/years/sales')
+    assert response.status_code == 200
+    year_sales = response.get_json()
+    # without start/end every year a movie was released in is listed
+    assert year_sales["years"] == sorted(set(movie_years.values()))
+    assert year_sales["start_year"] == min(movie_years.values())
+    assert year_sales["end_year"] == max(movie_years.values())
+    for position, year in enumerate(year_sales["years"]):
+        sales, movie_count, top_movie = get_year_totals(store, movie_years, year, year)
+        assert year_sales["movie_counts"][position] == movie_count
+        assert year_sales["world_sales"][position] == sales['World']
+        assert year_sales["domestic_sales"][position] == sales['Domestic']
+        assert year_sales["top_movies"][position]["title"] == store.row(top_movie).title
+
+
+@pytest.mark.parametrize('path', ['/api/years/summary', '/api/years/sales'])
+@pytest.mark.parametrize('query', ['start=2000&end=1990', 'start=abc', 'end=1999.5'])
+def test_bad_year_range(client, path, query):
+    response = client.get('%s?%s' % (path, query))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
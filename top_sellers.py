@@ -0,0 +1,141 @@
+import threading
+
+import numpy as np
+
+from movie_store import GENRE_BITS, MONTHS, SALES_TYPES
+
+
+# fields top sellers can be picked by, a query can use any of them together
+TOP_SELLER_FILTERS = ('month', 'genre', 'rating', 'distributor', 'year')
+
+# movies of the shortest list checked against the other filters at a time, times the amount asked for
+FILTER_BLOCK_FACTOR = 4
+
+
+# highest selling movies of a store by month, genre, rating, distributor and/or release year for any sales type
+# movies with one value of a field are sorted by sales the first time they're asked for and kept with the store,
+# after that a top k query is the first k of that list instead of a scan over every movie
+class TopSellers:
+
+    def __init__(self, store):
+        self.store = store
+        # (field, value, sales type) -> row ids of the movies with that value from highest to lowest sales
+        self.sorted_rows = {}
+        self.lock = threading.Lock()
+
+    # row ids of the k movies with the highest sales matching every filter ({field: value}), highest first
+    # first movie in the dataset wins ties, same as the sales search
+    def top(self, sales_type, k, filters):
+        if sales_type not in SALES_TYPES or k <= 0:
+            return np.array([], dtype=np.intp)
+        if not filters:
+            return self.store.sales_order[sales_type][:k]
+
+        # shortest list is walked in sales order, the other filters are checked on its movies a block at a time
+        # until there are k matches, so the movies that can't make the top k are never looked at
+        sorted_lists = sorted(
+            ((self.get_sorted_rows(field, value, sales_type), field, value) for field, value in filters.items()),
+            key=lambda sorted_list: len(sorted_list[0]))
+        rows = sorted_lists[0][0]
+        other_filters = [(field, value) for _, field, value in sorted_lists[1:]]
+        block_size = k * FILTER_BLOCK_FACTOR
+        top_rows = []
+        found = 0
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            matching = np.ones(len(block), dtype=bool)
+            for field, value in other_filters:
+                matching &= get_filter_mask(self.store, field, value, block)
+            top_rows.append(block[matching])
+            found += len(top_rows[-1])
+            if found >= k:
+                break
+        if not top_rows:
+            return np.array([], dtype=np.intp)
+        return np.concatenate(top_rows)[:k]
+
+    # copy for new_store, which is the store these top sellers were made for with the movie in row replaced or added
+    # on the end, sorted lists that movie wasn't and isn't in are kept since none of their movies changed
+    def updated(self, new_store, row):
+        top_sellers = TopSellers(new_store)
+        rows = np.array([row])
+        with self.lock:
+            sorted_rows = list(self.sorted_rows.items())
+        for key, sorted_list in sorted_rows:
+            field, value, _ = key
+            if get_filter_mask(new_store, field, value, rows)[0]:
+                continue
+            if row < self.store.size and get_filter_mask(self.store, field, value, rows)[0]:
+                continue
+            top_sellers.sorted_rows[key] = sorted_list
+        return top_sellers
+
+    def get_sorted_rows(self, field, value, sales_type):
+        # values come straight from requests, only ones that some movie can have get a cached list
+        # so made up values can't grow the cache
+        if not is_known_value(self.store, field, value):
+            return np.array([], dtype=np.intp)
+
+        key = (field, value, sales_type)
+        with self.lock:
+            sorted_rows = self.sorted_rows.get(key)
+        if sorted_rows is not None:
+            return sorted_rows
+
+        # sorted outside the lock, two requests might both sort the same list the first time
+        rows = get_filter_rows(self.store, field, value)
+        # rows are in row order, a stable sort keeps the first movie first on ties
+        sorted_rows = rows[np.argsort(-self.store.sales(sales_type)[rows], kind='stable')]
+        with self.lock:
+            return self.sorted_rows.setdefault(key, sorted_rows)
+
+
+# True if the value is one the store has for the field (a month, genre, rating, distributor or year it knows)
+def is_known_value(store, field, value):
+    if field == 'month':
+        return value in MONTHS
+    if field == 'genre':
+        return value in GENRE_BITS
+    if field == 'rating':
+        return value in store.rating_names
+    if field == 'distributor':
+        return value in store.distributor_names
+    if field == 'year':
+        return isinstance(value, int) and value in store.release_years.tolist()
+    raise ValueError('unknown top sellers filter %s' % field)
+
+
+# sorted row ids of the movies with the value of the field, from the store's indexes where it has one
+def get_filter_rows(store, field, value):
+    if field == 'month':
+        return store.month_rows(value)
+    if field == 'genre':
+        return store.genre_rows([value])
+    if field == 'year':
+        return store.year_rows(value, value)
+    return np.flatnonzero(get_filter_mask(store, field, value, slice(None)))
+
+
+# which of the movies in rows (row ids or a slice) have the value of the field
+def get_filter_mask(store, field, value, rows):
+    if field == 'month':
+        if value not in MONTHS:
+            return np.zeros(len(store.release_months[rows]), dtype=bool)
+        return store.release_months[rows] == MONTHS.index(value) + 1
+    if field == 'genre':
+        if value not in GENRE_BITS:
+            return np.zeros(len(store.genre_masks[rows]), dtype=bool)
+        return (store.genre_masks[rows] & GENRE_BITS[value]) != 0
+    if field == 'rating':
+        if value not in store.rating_names:
+            return np.zeros(len(store.rating_codes[rows]), dtype=bool)
+        return store.rating_codes[rows] == store.rating_names.index(value)
+    if field == 'distributor':
+        if value not in store.distributor_names:
+            return np.zeros(len(store.distributor_codes[rows]), dtype=bool)
+        return store.distributor_codes[rows] == store.distributor_names.index(value)
+    if field == 'year':
+        release_dates = store.release_dates[rows]
+        years = release_dates.astype('datetime64[Y]').astype(np.int64) + 1970
+        return ~np.isnat(release_dates) & (years == value)
+    raise ValueError('unknown top sellers filter %s' % field)